@@ -0,0 +1,244 @@
+# benchmarks/bench_pipeline.py
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+BENCHES = ["clean", "redact_text", "detect_phi_spans", "transform", "write_jsonl", "write_formats", "load_sqlite",
+           "validate_batch", "validate_per_record", "record_memory", "run_messages", "run_messages_validate"]
+DEFAULT_SIZES = [1_000, 10_000]
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baseline.json"
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS; children covers pool workers of run_messages
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / scale, 1)
+
+def _time_each(fn, items) -> Dict[str, Any]:
+    # only the stage call is timed; generating the corpus is not
+    spent = 0.0
+    count = 0
+    for item in items:
+        started = perf_counter()
+        fn(item)
+        spent += perf_counter() - started
+        count += 1
+    return {"items": count, "seconds": round(spent, 4)}
+
+def _chunks(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def run_one(bench: str, size: int, seed: int, workers: int) -> Dict[str, Any]:
+    from benchmarks.corpus import generate_messages
+    from src.etl.ingest import clean, ingest_batch
+    from src.etl.redact import RedactionTimeout, detect_phi_spans, redact_text
+    from src.etl.transform import transform
+    from src.etl.utils import write_jsonl
+
+    messages = generate_messages(size, seed)
+    texts = (msg for msg, _ in messages)
+    if bench == "clean":
+        result = _time_each(clean, texts)
+    elif bench == "redact_text":
+        result = _time_each(lambda t: redact_text(t, budget_ms=0), texts)
+    elif bench == "detect_phi_spans":
+        result = _time_each(lambda t: detect_phi_spans(t, budget_ms=0), texts)
+    elif bench in ("transform", "write_jsonl", "write_formats", "load_sqlite", "validate_batch", "validate_per_record", "record_memory"):
+        def records():
+            batch = []
+            for item in messages:
+                batch.append(item)
+                if len(batch) == 500:
+                    yield from (r for r in ingest_batch(batch, budget_ms=0) if not isinstance(r, RedactionTimeout))
+                    batch = []
+            if batch:
+                yield from (r for r in ingest_batch(batch, budget_ms=0) if not isinstance(r, RedactionTimeout))
+        if bench == "transform":
+            result = _time_each(transform, records())
+        elif bench.startswith("validate"):
+            from src.etl.validate import BatchValidator
+            validator = BatchValidator("auto")
+            processed = (transform(rec) for rec in records())
+            if bench == "validate_per_record":
+                result = _time_each(lambda rec: validator.validate([rec]), processed)
+            else:
+                batches = _chunks(processed, 500)
+                result = _time_each(validator.validate, batches)
+                result["items"] = size
+            result["validator"] = validator.backend
+        elif bench == "record_memory":
+            # bytes held per message once ingest + transform ran: one Message against the raw dict plus
+            # the processed dict transform() used to build from it. Text values are shared either way
+            import gc
+            import tracemalloc
+            held = {}
+            started = perf_counter()
+            # one untraced pass first, so the spell/redaction caches it fills are not charged to either side
+            for rec in records():
+                transform(rec)
+            for kind in ("dict", "message"):
+                messages = generate_messages(size, seed)
+                gc.collect()
+                tracemalloc.start()
+                if kind == "dict":
+                    out = []
+                    for rec in records():
+                        raw = rec.raw_dict()
+                        out.append((raw, transform(raw)))
+                else:
+                    out = [transform(rec) for rec in records()]
+                gc.collect()
+                held[kind] = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                del out
+            result = {"items": size, "seconds": round(perf_counter() - started, 4),
+                      "dict_bytes_per_msg": round(held["dict"] / size), "message_bytes_per_msg": round(held["message"] / size)}
+        elif bench == "write_formats":
+            # batched appends of processed records per serializer x compression; items/seconds are the default
+            # (auto backend, uncompressed), the rest is per variant
+            from src.etl import codec
+            processed = [transform(rec) for rec in records()]
+            backends = ["json"] + (["orjson"] if codec.orjson is not None else [])
+            compressions = ["none", "gzip"] + (["zstd"] if codec.zstandard is not None else [])
+            result = {}
+            with tempfile.TemporaryDirectory() as tmp:
+                for backend in backends:
+                    codec.configure_json(backend)
+                    for compression in compressions:
+                        out = codec.with_suffix(Path(tmp) / f"{backend}.jsonl", compression)
+                        spent = _time_each(lambda batch: write_jsonl(out, batch), _chunks(processed, 500))["seconds"]
+                        result[f"{backend}_{compression}_per_s"] = round(len(processed) / spent) if spent else None
+                        result[f"{backend}_{compression}_bytes_per_msg"] = round(out.stat().st_size / len(processed))
+                        if backend == backends[-1] and compression == "none":
+                            result.update(items=len(processed), seconds=spent)
+        elif bench == "load_sqlite":
+            from src.etl.db_sink import open_db_sink
+            with tempfile.TemporaryDirectory() as tmp:
+                processed = [transform(rec) for rec in records()]
+                started = perf_counter()
+                # the post-load index build in close() is part of the load
+                with open_db_sink(f"sqlite:///{Path(tmp) / 'bench.db'}") as sink:
+                    for batch in _chunks(processed, 500):
+                        sink.write_records(batch)
+                result = {"items": len(processed), "seconds": round(perf_counter() - started, 4)}
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                out = Path(tmp) / "out.jsonl"
+                result = _time_each(lambda rec: write_jsonl(out, [rec]), records())
+    elif bench in ("run_messages", "run_messages_validate"):
+        from cli.ingest_cli import run_messages
+        if bench == "run_messages_validate":
+            # importing pydantic/jsonschema is one-off setup, like loading the corpus; keep it out of the timing
+            from src.etl.validate import BatchValidator
+            BatchValidator("auto")
+        with tempfile.TemporaryDirectory() as tmp:
+            started = perf_counter()
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                run_messages(messages, Path(tmp) / "raw.jsonl", Path(tmp) / "processed", workers=workers,
+                             quarantine_path=Path(tmp) / "quarantine.jsonl", metrics_interval=0,
+                             validate="auto" if bench == "run_messages_validate" else None,
+                             reject_path=Path(tmp) / "rejects.jsonl")
+            result = {"items": size, "seconds": round(perf_counter() - started, 4)}
+    else:
+        raise ValueError(f"unknown benchmark: {bench}")
+    result["items_per_s"] = round(result["items"] / result["seconds"], 1) if result["seconds"] else 0.0
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+def _run_isolated(bench: str, size: int, seed: int, workers: int) -> Dict[str, Any]:
+    # a fresh interpreter per benchmark keeps peak memory and warm caches from leaking between them
+    cmd = [sys.executable, "-m", "benchmarks.bench_pipeline", "--run-one", bench, "--sizes", str(size),
+           "--seed", str(seed), "--workers", str(workers)]
+    out = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    rows = []
+    for key, cur in new["results"].items():
+        prev = old.get("results", {}).get(key)
+        if not prev or "items_per_s" not in prev or "items_per_s" not in cur or not prev["items_per_s"]:
+            continue
+        ratio = cur["items_per_s"] / prev["items_per_s"]
+        rows.append({"bench": key, "old_items_per_s": prev["items_per_s"], "new_items_per_s": cur["items_per_s"],
+                     "ratio": round(ratio, 3), "old_peak_rss_mb": prev.get("peak_rss_mb"),
+                     "new_peak_rss_mb": cur.get("peak_rss_mb"), "regression": ratio < 1.0 - threshold})
+    return rows
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pipeline throughput/memory benchmarks on seeded synthetic corpora")
+    parser.add_argument("--benches", type=str, default=",".join(BENCHES))
+    parser.add_argument("--sizes", type=str, default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated corpus sizes, e.g. 1000,10000,1000000,10000000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="workers for the run_messages benchmark")
+    parser.add_argument("--out", type=str, default=str(DEFAULT_BASELINE))
+    parser.add_argument("--compare", type=str, default=None, help="baseline JSON to diff the new results against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="throughput drop that counts as a regression")
+    parser.add_argument("--run-one", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    if args.run_one:
+        print(json.dumps(run_one(args.run_one, sizes[0], args.seed, args.workers)))
+        return
+    # read before writing: --compare may point at the file --out is about to replace
+    old = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    results = {}
+    for size in sizes:
+        for bench in [b for b in args.benches.split(",") if b]:
+            results[f"{bench}@{size}"] = _run_isolated(bench, size, args.seed, args.workers)
+            print(json.dumps({"level": "info", "msg": "bench_result", "bench": bench, "size": size, **results[f"{bench}@{size}"]}))
+    baseline = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "workers": args.workers,
+        },
+        "results": results,
+    }
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    print(json.dumps({"level": "info", "msg": "baseline_written", "path": str(out)}))
+    if old is not None:
+        rows = compare(old, baseline, args.threshold)
+        for row in rows:
+            print(json.dumps({"level": "warning" if row["regression"] else "info", "msg": "bench_compare", **row}))
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_startup.py
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# each sample runs in a fresh interpreter so module-level work and lazy loads are measured cold
+_PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import src.etl.redact, src.etl.ingest
+t1 = time.perf_counter()
+from src.etl.resources import medical_whitelist, stopwords
+medical_whitelist(); stopwords()
+t2 = time.perf_counter()
+src.etl.ingest.clean("teh patient has diabtes")
+t3 = time.perf_counter()
+src.etl.redact.detect_phi_spans("Call John at 555-010-1234 tomorrow", budget_ms=0)
+t4 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "wordsets_ms": (t2 - t1) * 1000,
+                  "first_clean_ms": (t3 - t2) * 1000, "first_redact_ms": (t4 - t3) * 1000}))
+"""
+
+_WORDSET_PROBE = r"""
+import json, time
+from pathlib import Path
+from src.etl.resources import WORDLIST_PATH, SNAPSHOT_PATH, load_wordset, parse_wordset
+t0 = time.perf_counter()
+parse_wordset(WORDLIST_PATH)
+t1 = time.perf_counter()
+load_wordset("wordlist", WORDLIST_PATH, SNAPSHOT_PATH)
+t2 = time.perf_counter()
+print(json.dumps({"text_parse_ms": (t1 - t0) * 1000, "snapshot_ms": (t2 - t1) * 1000,
+                  "snapshot_present": SNAPSHOT_PATH.exists()}))
+"""
+
+def _sample(code: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def _summarise(samples):
+    keys = [k for k, v in samples[0].items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    return {k: {"median": round(statistics.median(s[k] for s in samples), 2),
+                "max": round(max(s[k] for s in samples), 2)} for k in keys}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold-start timings for the redact/ingest modules")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    startup = [_sample(_PROBE) for _ in range(args.repeat)]
+    wordsets = [_sample(_WORDSET_PROBE) for _ in range(args.repeat)]
+    print(json.dumps({"level": "info", "msg": "bench_startup", "repeat": args.repeat,
+                      "startup": _summarise(startup), "wordsets": _summarise(wordsets),
+                      "snapshot_present": wordsets[0]["snapshot_present"]}))
+
+if __name__ == "__main__":
+    main()
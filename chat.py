@@ -10,7 +10,7 @@ LangCode = constr(pattern=r"^[a-z]{2}$")
 ShortStr = constr(max_length=256)
 TextStr = constr(max_length=4000)
 IntentStr = constr(max_length=100)
-PHIEnum = constr(pattern=r"^(NAME|PHONE|EMAIL|DATE|ID|IP|ADDRESS|SSN|MEDICAL_RECORD|OTHER)$")
+PHIEnum = constr(pattern=r"^(NAME|PHONE|EMAIL|DATE|ID|IP|URL|GPE|ORG|ADDRESS|SSN|MEDICAL_RECORD|OTHER)$")
 
 class AuditEvent(BaseModel):
     event_id: UUIDPattern = Field(...)
@@ -29,6 +29,15 @@ class Entity(BaseModel):
 
     model_config = ConfigDict(extra="forbid")
 
+class PhiSpan(BaseModel):
+    field: constr(max_length=64)
+    type: Optional[constr(max_length=50)]
+    start: int = Field(..., ge=0)
+    end: int = Field(..., ge=0)
+    source: constr(pattern=r"^(regex|ner|regex\+ner)$")
+
+    model_config = ConfigDict(extra="forbid")
+
 class ChatMessage(BaseModel):
     session_id: UUIDPattern = Field(...)
     message_id: UUIDPattern = Field(...)
@@ -39,6 +48,7 @@ class ChatMessage(BaseModel):
     clean_text: TextStr = Field(...)
     language: LangCode = Field(...)
     phi_flags: List[PHIEnum] = Field(..., min_length=0)
+    phi_spans: Optional[List[PhiSpan]] = None
     audit_trail: List[AuditEvent] = Field(..., min_length=1)
 
     intent: Optional[IntentStr] = None
@@ -0,0 +1,94 @@
+# src/etl/checkpoint.py
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+HEAD_BYTES = 4096
+# fixed namespace so a message without an id gets the same uuid5 every time its input line is replayed
+INPUT_NAMESPACE = uuid.UUID("8f6b1c1e-3d5a-4c4b-9a57-0c1f4f2b7e10")
+
+# Resume state for file-driven runs. The checkpoint holds the input byte offset up to which every
+# message has been written (raw, processed, quarantine, rejects) plus a hash of the input's first
+# bytes, so a replaced input file is detected instead of being resumed mid-line. It is rewritten
+# through a temp file + os.replace after each batch, so a crash leaves the previous checkpoint intact.
+
+def head_digest(path: Path, limit: int) -> str:
+    with path.open("rb") as fh:
+        return hashlib.sha256(fh.read(limit)).hexdigest()
+
+def read_state(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def write_state(path: Path, state: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    # no fsync: the output files are not fsynced either, this only has to survive a process crash
+    tmp.write_text(json.dumps(state, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+def input_state(input_path: Path, offset: int) -> Dict[str, Any]:
+    # what checked_offset() needs to trust `offset` again later
+    return {"input": str(input_path), "offset": offset,
+            "head_sha256": head_digest(input_path, min(offset, HEAD_BYTES))}
+
+def checked_offset(state: Dict[str, Any], input_path: Path) -> int:
+    # 0 unless the state belongs to this input and the bytes it covered are unchanged
+    if state.get("input") != str(input_path):
+        return 0
+    offset = int(state.get("offset") or 0)
+    try:
+        if offset > input_path.stat().st_size:
+            return 0
+        if head_digest(input_path, min(offset, HEAD_BYTES)) != state.get("head_sha256"):
+            return 0
+    except OSError:
+        return 0
+    return offset
+
+class Checkpoint:
+    def __init__(self, path: Path, input_path: Path) -> None:
+        self.path = Path(path)
+        self.input_path = Path(input_path).resolve()
+        self.state: Dict[str, Any] = read_state(self.path)
+
+    def resume_offset(self) -> int:
+        return checked_offset(self.state, self.input_path)
+
+    def update(self, offset: int, completed: bool = False, **counts: Any) -> None:
+        self.state = {
+            **input_state(self.input_path, offset),
+            "completed": completed,
+            "updated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            **counts,
+        }
+        write_state(self.path, self.state)
+
+class FileMessageReader:
+    # iterates {"message", "metadata"} JSONL lines from start_offset; .offset is the byte position just
+    # past the last line handed out, which is where a resumed run has to start
+    def __init__(self, path: Path, start_offset: int = 0) -> None:
+        self.path = Path(path)
+        self.offset = start_offset
+        self._source = str(self.path.resolve())
+
+    def __iter__(self) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        with self.path.open("rb") as fh:
+            fh.seek(self.offset)
+            for line in fh:
+                line_offset = self.offset
+                self.offset += len(line)
+                try:
+                    j = json.loads(line)
+                    meta = j.get("metadata") or {}
+                except Exception:
+                    continue
+                if not meta.get("message_id"):
+                    meta["message_id"] = str(uuid.uuid5(INPUT_NAMESPACE, f"{self._source}:{line_offset}"))
+                yield j.get("message"), meta
@@ -0,0 +1,175 @@
+# src/etl/codec.py
+import gzip
+import json
+import os
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterator, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_BACKENDS = ("orjson", "json")
+COMPRESSIONS = ("none", "gzip", "zstd")
+SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+READ_CHUNK = 1 << 20
+
+# Serialization and compression for the JSONL outputs (raw file, partitioned store, rejects).
+# Records are encoded by orjson when it is installed (several times faster than json.dumps) and by the
+# standard library otherwise; ETL_JSON_BACKEND or configure_json() pins one. Both write UTF-8 without
+# \u escapes, so either can read what the other wrote; orjson's lines are just more compact.
+#
+# Compressed files (.jsonl.gz / .jsonl.zst) are a concatenation of complete gzip members or zstd
+# frames, one per append, so writers keep their append-only handles and flock protocol, a crash leaves
+# at most one torn member at the tail, and whole members can be moved around (compaction) as bytes.
+# Readers stream member by member and stop before a torn tail, like they stop before a torn line.
+
+def _json_line(obj: Any) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+def _orjson_line(obj: Any) -> bytes:
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    except TypeError:
+        # ints past 64 bits, non-str keys, ...: the stdlib encoder takes what orjson refuses
+        return _json_line(obj)
+
+_dumps_line: Callable[[Any], bytes] = _json_line
+json_backend = "json"
+
+def configure_json(backend: str = "auto") -> str:
+    global _dumps_line, json_backend
+    if backend == "auto":
+        backend = "orjson" if orjson is not None else "json"
+    if backend == "orjson":
+        if orjson is None:
+            raise RuntimeError("the orjson backend needs the orjson package")
+        _dumps_line = _orjson_line
+    elif backend == "json":
+        _dumps_line = _json_line
+    else:
+        raise ValueError(f"unknown JSON backend: {backend}")
+    json_backend = backend
+    return backend
+
+configure_json(os.getenv("ETL_JSON_BACKEND", "auto"))
+
+def dumps_line(obj: Any) -> bytes:
+    # one JSONL line, newline included
+    return _dumps_line(obj)
+
+def loads(data: Any) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def check_compression(compression: str) -> str:
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unknown compression: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise RuntimeError("zstd output needs the zstandard package")
+    return compression
+
+def compression_of(path: Path) -> str:
+    suffix = Path(path).suffix
+    for name, s in SUFFIXES.items():
+        if s and suffix == s:
+            return name
+    return "none"
+
+def with_suffix(path: Path, compression: str) -> Path:
+    # data/raw/all_messages.jsonl -> data/raw/all_messages.jsonl.gz
+    path = Path(path)
+    if compression == "none" or compression_of(path) == compression:
+        return path
+    return path.with_name(path.name + SUFFIXES[compression])
+
+def base_name(path: Path) -> str:
+    # file name without the compression suffix
+    name = Path(path).name
+    suffix = SUFFIXES[compression_of(path)]
+    return name[:-len(suffix)] if suffix else name
+
+def compress(data: bytes, compression: str, level: Optional[int] = None) -> bytes:
+    # a complete member/frame, ready to be appended to a file of the same compression
+    if compression == "none":
+        return data
+    level = DEFAULT_LEVELS[compression] if level is None else level
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+def _decompressor(compression: str):
+    if compression == "gzip":
+        return zlib.decompressobj(wbits=31)
+    if zstandard is None:
+        raise RuntimeError("reading .zst files needs the zstandard package")
+    return zstandard.ZstdDecompressor().decompressobj()
+
+def iter_members(fh: BinaryIO, compression: str, end: Optional[int] = None) -> Iterator[Tuple[int, int, bytes]]:
+    # (start, end, decompressed bytes) of each complete member from the current position up to `end`;
+    # a trailing partial member is not yielded
+    pos = fh.tell()
+    start = pos
+    d = _decompressor(compression)
+    fed = 0
+    parts = []
+    pending = b""
+    while True:
+        if not pending:
+            size = READ_CHUNK if end is None else min(READ_CHUNK, end - pos)
+            pending = fh.read(size) if size > 0 else b""
+            if not pending:
+                return
+            pos += len(pending)
+        fed += len(pending)
+        parts.append(d.decompress(pending))
+        pending = b""
+        if d.eof:
+            rest = d.unused_data
+            length = fed - len(rest)
+            yield start, start + length, b"".join(parts)
+            start += length
+            d = _decompressor(compression)
+            fed = 0
+            parts = []
+            pending = rest
+
+def decompress(data: bytes, compression: str) -> bytes:
+    # whole members only, as written by compress(); a torn tail raises
+    if compression == "none":
+        return data
+    if compression == "gzip":
+        return gzip.decompress(data)
+    out = []
+    with zstandard.ZstdDecompressor().stream_reader(data, read_across_frames=True) as reader:
+        while True:
+            chunk = reader.read(READ_CHUNK)
+            if not chunk:
+                return b"".join(out)
+            out.append(chunk)
+
+def read_lines(fh: BinaryIO, compression: str) -> Iterator[bytes]:
+    # streaming line reader for plain and compressed JSONL from the current position; stops before a torn tail
+    if compression == "none":
+        for line in fh:
+            if line.endswith(b"\n"):
+                yield line
+        return
+    for _, _, data in iter_members(fh, compression):
+        yield from data.splitlines(keepends=True)
+
+def iter_lines(path: Path, offset: int = 0) -> Iterator[bytes]:
+    with Path(path).open("rb") as fh:
+        fh.seek(offset)
+        yield from read_lines(fh, compression_of(path))
+
+def iter_records(path: Path, offset: int = 0) -> Iterator[Any]:
+    for line in iter_lines(path, offset):
+        yield loads(line)
@@ -0,0 +1,306 @@
+# src/etl/compact.py
+import argparse
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .codec import SUFFIXES, base_name, compression_of, decompress, iter_members, loads, read_lines
+from .store_index import INDEX_FILENAME, StoreIndex
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MANIFEST_FILENAME = "_manifest.json"
+LOCK_FILENAME = "_compact.lock"
+SEGMENT_PREFIX = "_seg-"
+DEFAULT_MAX_FILE_BYTES = 64 * 1024
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_BATCH_FILES = 512
+
+# Compaction of the day-partitioned JSONL store (<base>/YYYY/MM/DD/<session_id>.jsonl). Small session
+# files are appended, whole, to the partition's current segment (_seg-NNNNNN.jsonl, rolled at
+# --segment-bytes) and then unlinked. _manifest.json records each segment's committed length and, per
+# session, the (segment, offset, length) runs holding its lines, so a session is still a few
+# contiguous reads; the store index (when present) is repointed at the segment in the same pass.
+#
+# Ingestion keeps writing during a compaction: PartitionWriter flocks a session file for the whole
+# append + index update, and reopens its handle if the file was unlinked underneath it. The compactor
+# only takes those locks non-blocking, so a file being written is simply left for the next pass.
+# Crash safety: segment bytes are fsynced before the manifest names them, and the manifest lists the
+# files it has consumed (inode, byte count, moves) under "pending" until they are unlinked. A rerun
+# truncates any uncommitted segment tail, replays the index moves of pending files still on disk and
+# compacts only what was appended to them since.
+# Compressed session files (.jsonl.gz / .jsonl.zst) go, member by member, into segments of the same
+# compression (_seg-NNNNNN.jsonl.gz); runs and index offsets then address whole members.
+
+def _empty_manifest() -> Dict[str, Any]:
+    return {"version": 1, "segments": {}, "sessions": {}, "pending": {}}
+
+def load_manifest(part_dir: Path) -> Dict[str, Any]:
+    try:
+        return json.loads((part_dir / MANIFEST_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return _empty_manifest()
+
+def _save_manifest(part_dir: Path, manifest: Dict[str, Any]) -> None:
+    path = part_dir / MANIFEST_FILENAME
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, sort_keys=True)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+def _is_session_file(path: Path) -> bool:
+    return base_name(path).endswith(".jsonl") and not path.name.startswith("_")
+
+def _session_id(path: Path) -> str:
+    return base_name(path)[:-len(".jsonl")]
+
+def iter_partitions(base: Path) -> Iterator[Path]:
+    for part_dir in sorted(base.glob("[0-9][0-9][0-9][0-9]/[0-9][0-9]/[0-9][0-9]")):
+        if part_dir.is_dir():
+            yield part_dir
+
+class _Segment:
+    # the partition's open segment; committed is the length the manifest vouches for
+    def __init__(self, part_dir: Path, manifest: Dict[str, Any], segment_bytes: int, compression: str = "none") -> None:
+        self.part_dir = part_dir
+        self.manifest = manifest
+        self.segment_bytes = segment_bytes
+        self.compression = compression
+        self.suffix = ".jsonl" + SUFFIXES[compression]
+        self.fh = None
+        self.name = None
+        names = [n for n in manifest["segments"] if compression_of(Path(n)) == compression]
+        if names:
+            name = max(names)
+            self._open(name, manifest["segments"][name]["bytes"])
+
+    def _open(self, name: str, committed: int) -> None:
+        if self.fh is not None:
+            # rolled over mid-batch: the full segment must be durable before the manifest commit too
+            self.fh.flush()
+            os.fsync(self.fh.fileno())
+            self.fh.close()
+        self.name = name
+        self.fh = (self.part_dir / name).open("a+b")
+        # drop whatever a crashed run appended past the committed length
+        self.fh.truncate(committed)
+        self.fh.seek(committed)
+
+    def reserve(self, size: int) -> None:
+        current = self.fh.tell() if self.fh is not None else 0
+        if self.name is None or (current and current + size > self.segment_bytes):
+            n = int(self.name[len(SEGMENT_PREFIX):-len(self.suffix)]) + 1 if self.name else 1
+            name = f"{SEGMENT_PREFIX}{n:06d}{self.suffix}"
+            self.manifest["segments"][name] = {"bytes": 0, "records": 0}
+            self._open(name, 0)
+
+    def append(self, data: bytes) -> int:
+        offset = self.fh.tell()
+        self.fh.write(data)
+        return offset
+
+    def commit(self, bytes_added: Dict[str, int], records_added: Dict[str, int]) -> None:
+        self.fh.flush()
+        os.fsync(self.fh.fileno())
+        for name, n in bytes_added.items():
+            self.manifest["segments"][name]["bytes"] += n
+            self.manifest["segments"][name]["records"] += records_added[name]
+
+    def close(self) -> None:
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+def _lock_nb(fh) -> bool:
+    try:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+def compact_partition(part_dir: Path, index: Optional[StoreIndex] = None,
+                      max_file_bytes: int = DEFAULT_MAX_FILE_BYTES, segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                      batch_files: int = DEFAULT_BATCH_FILES) -> Optional[Dict[str, int]]:
+    # None when another compactor holds the partition
+    stats = {"files": 0, "bytes": 0, "records": 0, "skipped_busy": 0}
+    with (part_dir / LOCK_FILENAME).open("a") as guard:
+        if not _lock_nb(guard):
+            return None
+        manifest = load_manifest(part_dir)
+        segments: Dict[str, _Segment] = {}
+        try:
+            pending = manifest["pending"]
+            candidates = [p for p in sorted(part_dir.iterdir()) if _is_session_file(p)
+                          and (p.name in pending or 0 < p.stat().st_size <= max_file_bytes)]
+            # files that vanished since the last run were unlinked after their moves were applied
+            gone = [name for name in pending if not (part_dir / name).exists()]
+            for name in gone:
+                del pending[name]
+            by_compression: Dict[str, List[Path]] = {}
+            for p in candidates:
+                by_compression.setdefault(compression_of(p), []).append(p)
+            for compression, paths in sorted(by_compression.items()):
+                segments[compression] = segment = _Segment(part_dir, manifest, segment_bytes, compression)
+                for start in range(0, len(paths), batch_files):
+                    _compact_files(part_dir, paths[start:start + batch_files], manifest, segment, index, stats)
+            # the last batch's unlinks (or the vanished entries) still have to clear "pending" on disk
+            if stats["files"] or gone:
+                _save_manifest(part_dir, manifest)
+        finally:
+            for segment in segments.values():
+                segment.close()
+    return stats
+
+def _whole_records(data: bytes, compression: str) -> Tuple[int, int]:
+    # (bytes, records) of the complete lines or members at the start of data
+    if compression == "none":
+        cut = data.rfind(b"\n") + 1
+        return cut, data.count(b"\n", 0, cut)
+    cut = records = 0
+    for _, end, member in iter_members(io.BytesIO(data), compression):
+        cut = end
+        records += member.count(b"\n")
+    return cut, records
+
+def _compact_files(part_dir: Path, paths: List[Path], manifest: Dict[str, Any], segment: _Segment,
+                   index: Optional[StoreIndex], stats: Dict[str, int]) -> None:
+    pending = manifest["pending"]
+    locked: List[Tuple[Path, Any, Dict[str, Any]]] = []
+    bytes_added: Dict[str, int] = {}
+    records_added: Dict[str, int] = {}
+    try:
+        for path in paths:
+            try:
+                fh = path.open("rb")
+            except FileNotFoundError:
+                continue
+            if not _lock_nb(fh):
+                fh.close()
+                stats["skipped_busy"] += 1
+                continue
+            st = os.fstat(fh.fileno())
+            if not st.st_nlink:
+                fh.close()
+                continue
+            entry = pending.get(path.name)
+            if entry is not None and entry["ino"] != st.st_ino:
+                # a new file under a name whose old file's moves were already applied
+                entry = None
+            entry = entry or {"ino": st.st_ino, "bytes": 0, "moves": []}
+            fh.seek(entry["bytes"])
+            data = fh.read()
+            # only whole lines (members); a torn tail (crashed writer) stays behind for a later pass
+            cut, records = _whole_records(data, segment.compression)
+            data = data[:cut]
+            if data:
+                segment.reserve(len(data))
+                offset = segment.append(data)
+                entry["moves"].append([entry["bytes"], entry["bytes"] + len(data), segment.name, offset - entry["bytes"]])
+                entry["bytes"] += len(data)
+                bytes_added[segment.name] = bytes_added.get(segment.name, 0) + len(data)
+                records_added[segment.name] = records_added.get(segment.name, 0) + records
+                manifest["sessions"].setdefault(_session_id(path), []).append([segment.name, offset, len(data)])
+                stats["bytes"] += len(data)
+                stats["records"] += records
+            pending[path.name] = entry
+            locked.append((path, fh, entry))
+        if not locked:
+            return
+        segment.commit(bytes_added, records_added)
+        _save_manifest(part_dir, manifest)
+        if index is not None:
+            index.relocate((path, s, e, part_dir / seg, delta)
+                           for path, _, entry in locked for s, e, seg, delta in entry["moves"])
+        for path, fh, entry in locked:
+            # anything past entry["bytes"] is a torn tail; keep the file (and its entry) for next time
+            if os.fstat(fh.fileno()).st_size == entry["bytes"]:
+                path.unlink()
+                del pending[path.name]
+                stats["files"] += 1
+    finally:
+        for _, fh, _ in locked:
+            fh.close()
+
+def read_session(part_dir: Path, session_id: str) -> Iterator[Dict[str, Any]]:
+    # the session's lines in append order: compacted runs first, then whatever is still in its own file
+    manifest = load_manifest(part_dir)
+    for seg, offset, length in manifest["sessions"].get(session_id, []):
+        with (part_dir / seg).open("rb") as fh:
+            fh.seek(offset)
+            for line in decompress(fh.read(length), compression_of(Path(seg))).splitlines():
+                yield loads(line)
+    for compression, suffix in SUFFIXES.items():
+        path = part_dir / f"{session_id}.jsonl{suffix}"
+        try:
+            fh = path.open("rb")
+        except FileNotFoundError:
+            continue
+        with fh:
+            entry = manifest["pending"].get(path.name)
+            if entry is not None and entry["ino"] == os.fstat(fh.fileno()).st_ino:
+                fh.seek(entry["bytes"])
+            for line in read_lines(fh, compression):
+                yield loads(line)
+
+def compact_store(base: Path, day: Optional[str] = None, use_index: bool = True,
+                  max_file_bytes: int = DEFAULT_MAX_FILE_BYTES, segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                  batch_files: int = DEFAULT_BATCH_FILES) -> Dict[str, int]:
+    if fcntl is None:
+        raise RuntimeError("compaction needs flock (fcntl), which this platform does not provide")
+    totals = {"partitions": 0, "files": 0, "bytes": 0, "records": 0}
+    index = StoreIndex(base) if use_index and (base / INDEX_FILENAME).exists() else None
+    try:
+        parts = [base / day] if day else list(iter_partitions(base))
+        for part_dir in parts:
+            if not part_dir.is_dir():
+                continue
+            stats = compact_partition(part_dir, index, max_file_bytes, segment_bytes, batch_files)
+            if stats is None:
+                print(json.dumps({"level": "info", "msg": "compaction_skipped", "partition": str(part_dir), "reason": "locked"}))
+                continue
+            if stats["files"]:
+                totals["partitions"] += 1
+                print(json.dumps({"level": "info", "msg": "partition_compacted", "partition": str(part_dir), **stats}))
+            for k in ("files", "bytes", "records"):
+                totals[k] += stats[k]
+    finally:
+        if index is not None:
+            index.close()
+    return totals
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Merge small per-session JSONL files into partition segments")
+    parser.add_argument("--base", type=str, default="data/processed")
+    parser.add_argument("--day", type=str, default=None, help="only this partition, as YYYY/MM/DD")
+    parser.add_argument("--max-file-bytes", type=int, default=DEFAULT_MAX_FILE_BYTES, help="session files up to this size are compacted")
+    parser.add_argument("--segment-bytes", type=int, default=DEFAULT_SEGMENT_BYTES, help="roll to a new segment past this size")
+    parser.add_argument("--batch-files", type=int, default=DEFAULT_BATCH_FILES, help="files locked and moved per manifest commit")
+    parser.add_argument("--no-index", action="store_true", help="do not repoint the store index")
+    parser.add_argument("--session", type=str, default=None, help="print a session of --day instead of compacting")
+    parser.add_argument("--watch", type=float, default=0.0, help="keep compacting every N seconds")
+    args = parser.parse_args()
+    base = Path(args.base)
+    if args.session:
+        if not args.day:
+            parser.error("--session needs --day")
+        for rec in read_session(base / args.day, args.session):
+            print(json.dumps(rec, ensure_ascii=False))
+        return
+    while True:
+        started = time.perf_counter()
+        totals = compact_store(base, args.day, not args.no_index, args.max_file_bytes, args.segment_bytes, args.batch_files)
+        print(json.dumps({"level": "info", "msg": "compaction_done", **totals, "elapsed_s": round(time.perf_counter() - started, 2)}))
+        if args.watch <= 0:
+            return
+        time.sleep(args.watch)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# tests/conftest.py
+import uuid
+from typing import Any, Dict, Optional
+
+import pytest
+
+def _record(i: int, session: Optional[str] = None, sessions: int = 3, day: int = 6, phi: Optional[bool] = None,
+            uuid_ids: bool = False, **fields: Any) -> Dict[str, Any]:
+    # a processed record as the sinks receive it: session s{i % sessions}, message m{i}, one per minute of
+    # 2025-01-<day> 10:00; odd ones carry a redacted email unless phi says otherwise. uuid_ids gives
+    # schema-valid v4 ids instead; any field can be overridden
+    phi = bool(i % 2) if phi is None else phi
+    ts = f"2025-01-{day:02d}T10:{i % 60:02d}:00Z"
+    ids = ((str(uuid.UUID(int=i + 1, version=4)), str(uuid.UUID(int=i + 1000, version=4)),
+            str(uuid.UUID(int=i + 5000, version=4))) if uuid_ids else (f"s{i % sessions}", f"m{i}", f"e{i}"))
+    rec = {
+        "session_id": session if session is not None else ids[0],
+        "message_id": ids[1],
+        "timestamp": ts,
+        "user_role": "user",
+        "channel": "web",
+        "raw_text": f"raw {i}",
+        "clean_text": f"café note {i}",
+        "language": "en",
+        "phi_flags": ["EMAIL"] if phi else [],
+        "entities": [{"type": "email", "value": "[REDACTED_EMAIL]", "confidence": 0.9}] if phi else [],
+        "audit_trail": [{"event_id": ids[2], "actor": "ingestion-service", "action": "ingest", "timestamp": ts,
+                         "details": {"batch": 1}}],
+        "consent_given": False,
+        "retention_policy": "dev-30d",
+    }
+    rec.update(fields)
+    return rec
+
+@pytest.fixture
+def make_record():
+    return _record
@@ -0,0 +1,164 @@
+# benchmarks/corpus.py
+import argparse
+import json
+import math
+import random
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+# Seeded, streaming generator of chat messages shaped like production traffic: log-normal message
+# length with a long tail up to MAX_TEXT_LEN, a configurable share of messages carrying PHI (several
+# identifier types, sometimes more than one per message), common typos for the spell corrector, and
+# a share of exact repeats of recent messages (copy/paste, bot templates) so caches see realistic
+# reuse. The same (n, seed, knobs) always yields the same corpus, one message at a time.
+
+MAX_TEXT_LEN = 4000
+EPOCH = datetime(2025, 1, 6, 8, 0, 0, tzinfo=timezone.utc)
+
+_SYMPTOMS = [
+    "headache", "nausea", "fever", "chest pain", "shortness of breath", "dizziness", "rash", "cough",
+    "abdominal pain", "back pain", "fatigue", "blurred vision", "swelling in my ankles", "sore throat",
+    "burning urination", "palpitations", "numbness in my left arm", "insomnia", "joint pain",
+]
+_CONDITIONS = ["diabetes", "hypertension", "asthma", "migraine", "arthritis", "anemia", "hypothyroidism",
+               "depression", "copd", "eczema", "gerd", "kidney stones"]
+_MEDS = ["metformin", "lisinopril", "ibuprofen", "amoxicillin", "insulin", "atorvastatin", "albuterol",
+         "omeprazole", "sertraline", "levothyroxine", "prednisone", "acetaminophen"]
+_DURATIONS = ["two days ago", "a week ago", "3 weeks ago", "yesterday", "about a month ago", "last night"]
+_TYPOS = {"the": "teh", "receive": "recieve", "diabetes": "diabtes", "hypertension": "hipertension",
+          "because": "becuase", "medicine": "medecine", "stomach": "stomache", "really": "realy"}
+_FIRST = ["John", "Maria", "Wei", "Aisha", "Carlos", "Emily", "Kwame", "Olga", "Priya", "Liam", "Sofia", "Hiro"]
+_LAST = ["Karlson", "Garcia", "Chen", "Okafor", "Silva", "Novak", "Patel", "Smith", "Tanaka", "Haddad"]
+_CITIES = ["Boston", "Austin", "Denver", "Seattle", "Chicago", "Phoenix", "Atlanta", "Portland"]
+
+_TEMPLATES = [
+    "I have had {symptom} since {duration}. Should I be worried?",
+    "My {condition} has been getting worse and the {med} does not seem to help.",
+    "Can I take {med} together with {med2}? I already take it for my {condition}.",
+    "I am experiencing {symptom} and {symptom2}, it started {duration}.",
+    "What is the normal dose of {med} for an adult with {condition}?",
+    "Is {symptom} a side effect of {med}? I started it {duration}.",
+    "I need to reschedule my follow up appointment about my {condition}.",
+    "thanks, that really helps",
+    "ok",
+    "The pain is about 7 out of 10 and gets worse at night because I cannot sleep.",
+]
+_FILLER = [
+    "I also want to mention that {symptom} has been coming and going.",
+    "My doctor said it could be related to my {condition} but I am not sure.",
+    "I have been taking {med} every morning with food.",
+    "It gets worse after meals and when I lie down.",
+    "I tried resting and drinking more water but nothing changed.",
+    "My family has a history of {condition}.",
+]
+
+_PHI = [
+    ("EMAIL", lambda r: f"{r.choice(_FIRST).lower()}.{r.choice(_LAST).lower()}{r.randint(1, 99)}@example.com"),
+    ("PHONE", lambda r: f"({r.randint(200, 999)}) {r.randint(200, 999)}-{r.randint(1000, 9999)}"),
+    ("SSN", lambda r: f"{r.randint(100, 899)}-{r.randint(10, 99)}-{r.randint(1000, 9999)}"),
+    ("MRN", lambda r: f"MRN{r.randint(100000, 9999999)}"),
+    ("DATE", lambda r: f"{r.randint(1940, 2024)}-{r.randint(1, 12):02d}-{r.randint(1, 28):02d}"),
+    ("NAME", lambda r: f"{r.choice(_FIRST)} {r.choice(_LAST)}"),
+    ("URL", lambda r: f"https://portal.example.org/patients/{r.randint(1000, 99999)}"),
+    ("IP", lambda r: f"10.{r.randint(0, 255)}.{r.randint(0, 255)}.{r.randint(1, 254)}"),
+    ("ID", lambda r: f"AB{r.randint(10, 99)}-{r.randint(1000, 9999)}X"),
+    ("GPE", lambda r: r.choice(_CITIES)),
+]
+_PHI_LEADS = {
+    "EMAIL": "my email is", "PHONE": "call me at", "SSN": "my SSN is", "MRN": "my record number is",
+    "DATE": "I was born on", "NAME": "my name is", "URL": "my chart is at", "IP": "the portal showed",
+    "ID": "my member ID is", "GPE": "I live in",
+}
+
+def _fill(template: str, r: random.Random) -> str:
+    return template.format(
+        symptom=r.choice(_SYMPTOMS), symptom2=r.choice(_SYMPTOMS), condition=r.choice(_CONDITIONS),
+        med=r.choice(_MEDS), med2=r.choice(_MEDS), duration=r.choice(_DURATIONS),
+    )
+
+def _target_length(r: random.Random, median: int) -> int:
+    # log-normal: most messages are one or two sentences, a few are long pasted histories
+    return max(2, min(MAX_TEXT_LEN, int(r.lognormvariate(math.log(median), 1.0))))
+
+def _typos(text: str, r: random.Random, rate: float) -> str:
+    words = text.split(" ")
+    for i, w in enumerate(words):
+        t = _TYPOS.get(w.lower())
+        if t and r.random() < rate:
+            words[i] = t
+    return " ".join(words)
+
+def make_message(r: random.Random, phi_rate: float = 0.3, typo_rate: float = 0.2, median_len: int = 90) -> str:
+    target = _target_length(r, median_len)
+    parts = [_fill(r.choice(_TEMPLATES), r)]
+    length = len(parts[0])
+    while length < target:
+        s = _fill(r.choice(_FILLER), r)
+        parts.append(s)
+        length += len(s) + 1
+    if r.random() < phi_rate:
+        # one identifier most of the time, occasionally a burst of several
+        for _ in range(1 if r.random() < 0.7 else r.randint(2, 4)):
+            typ, make = r.choice(_PHI)
+            parts.insert(r.randint(0, len(parts)), f"{_PHI_LEADS[typ].capitalize()} {make(r)}.")
+    text = _typos(" ".join(parts), r, typo_rate)
+    return text[:MAX_TEXT_LEN]
+
+def generate_messages(n: int, seed: int = 0, phi_rate: float = 0.3, repeat_rate: float = 0.15,
+                      typo_rate: float = 0.2, median_len: int = 90, session_len: int = 8,
+                      entity_rate: float = 0.05) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    r = random.Random(seed)
+    recent: deque = deque(maxlen=512)
+    session_id = None
+    ts = EPOCH
+    for i in range(n):
+        if session_id is None or r.random() < 1.0 / session_len:
+            session_id = str(uuid.UUID(int=r.getrandbits(128), version=4))
+            ts += timedelta(minutes=r.randint(1, 600))
+        ts += timedelta(seconds=r.randint(5, 300))
+        if recent and r.random() < repeat_rate:
+            msg = r.choice(recent)
+        else:
+            msg = make_message(r, phi_rate, typo_rate, median_len)
+            recent.append(msg)
+        meta: Dict[str, Any] = {
+            "session_id": session_id,
+            "message_id": str(uuid.UUID(int=r.getrandbits(128), version=4)),
+            "timestamp": ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "user_role": "user" if r.random() < 0.6 else "bot",
+            "channel": r.choice(("web", "web", "mobile", "api")),
+        }
+        if r.random() < entity_rate:
+            typ, make = r.choice(_PHI)
+            meta["entities"] = [{"type": typ.lower(), "value": make(r)}]
+        yield msg, meta
+
+def write_corpus(path: Path, n: int, seed: int = 0, **knobs: Any) -> int:
+    # the stdin format ingest_cli reads: {"message": ..., "metadata": {...}} per line
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with path.open("w", encoding="utf-8") as fh:
+        for msg, meta in generate_messages(n, seed, **knobs):
+            fh.write(json.dumps({"message": msg, "metadata": meta}, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic chat corpus as JSONL")
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=str, required=True)
+    parser.add_argument("--phi-rate", type=float, default=0.3)
+    parser.add_argument("--repeat-rate", type=float, default=0.15)
+    parser.add_argument("--typo-rate", type=float, default=0.2)
+    parser.add_argument("--median-len", type=int, default=90)
+    args = parser.parse_args()
+    count = write_corpus(Path(args.out), args.n, args.seed, phi_rate=args.phi_rate,
+                         repeat_rate=args.repeat_rate, typo_rate=args.typo_rate, median_len=args.median_len)
+    print(json.dumps({"level": "info", "msg": "corpus_written", "path": args.out, "count": count, "seed": args.seed}))
+
+if __name__ == "__main__":
+    main()
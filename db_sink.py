@@ -0,0 +1,324 @@
+# src/etl/db_sink.py
+import json
+import queue
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import psycopg2
+    import psycopg2.extras
+    import psycopg2.pool
+except ImportError:
+    psycopg2 = None
+
+DEFAULT_BATCH_ROWS = 5_000
+DEFAULT_POOL_SIZE = 4
+
+# Relational sink for processed records, following er_diagram.dbml: sessions, messages, entities and
+# audit_events. Records are buffered and loaded batch_rows at a time, each batch in one transaction
+# with one bulk statement per table (executemany on SQLite, execute_values multi-row VALUES on
+# Postgres). Messages upsert on message_id, so reloading a file replaces rows instead of duplicating
+# them; a message's entities are replaced with it, audit events are immutable and only inserted once,
+# and a session's started_at/ended_at widen to cover every message loaded for it.
+# Secondary indexes are dropped while loading (defer_indexes) and built once in close(); only the
+# entities(message_id) index stays, because the entity replacement on upsert looks rows up by it.
+
+_TABLES = [
+    """CREATE TABLE IF NOT EXISTS sessions (
+        session_id {uuid} PRIMARY KEY,
+        user_id VARCHAR(256),
+        started_at {ts} NOT NULL,
+        ended_at {ts},
+        channel VARCHAR(32) NOT NULL,
+        metadata {json}
+    )""",
+    """CREATE TABLE IF NOT EXISTS messages (
+        message_id {uuid} PRIMARY KEY,
+        session_id {uuid} NOT NULL REFERENCES sessions (session_id),
+        timestamp {ts} NOT NULL,
+        user_role VARCHAR(16) NOT NULL,
+        channel VARCHAR(32) NOT NULL,
+        raw_text TEXT,
+        clean_text TEXT NOT NULL,
+        language VARCHAR(2) NOT NULL,
+        phi_flags {json} NOT NULL,
+        intent VARCHAR(100),
+        urgency VARCHAR(16),
+        confidence NUMERIC(3, 2),
+        consent_given BOOLEAN,
+        retention_policy VARCHAR(64)
+    )""",
+    """CREATE TABLE IF NOT EXISTS entities (
+        entity_id {uuid} PRIMARY KEY,
+        message_id {uuid} NOT NULL REFERENCES messages (message_id),
+        type VARCHAR(32) NOT NULL,
+        value TEXT,
+        confidence NUMERIC(3, 2)
+    )""",
+    """CREATE TABLE IF NOT EXISTS audit_events (
+        event_id {uuid} PRIMARY KEY,
+        message_id {uuid} NOT NULL REFERENCES messages (message_id),
+        actor VARCHAR(256) NOT NULL,
+        action VARCHAR(32) NOT NULL,
+        timestamp {ts} NOT NULL,
+        reason TEXT,
+        details {json}
+    )""",
+    "CREATE INDEX IF NOT EXISTS entities_message_id ON entities (message_id)",
+]
+
+# built after the load; name -> (table, columns)
+SECONDARY_INDEXES = {
+    "sessions_started_at": ("sessions", "started_at"),
+    "messages_session_id": ("messages", "session_id"),
+    "messages_timestamp": ("messages", "timestamp"),
+    "messages_session_id_timestamp": ("messages", "session_id, timestamp"),
+    "audit_events_message_id": ("audit_events", "message_id"),
+    "audit_events_timestamp": ("audit_events", "timestamp"),
+}
+
+_MESSAGE_COLS = ["message_id", "session_id", "timestamp", "user_role", "channel", "raw_text", "clean_text",
+                 "language", "phi_flags", "intent", "urgency", "confidence", "consent_given", "retention_policy"]
+_ENTITY_COLS = ["entity_id", "message_id", "type", "value", "confidence"]
+_AUDIT_COLS = ["event_id", "message_id", "actor", "action", "timestamp", "reason", "details"]
+_SESSION_COLS = ["session_id", "started_at", "ended_at", "channel"]
+
+class SqliteBackend:
+    name = "sqlite"
+    types = {"uuid": "TEXT", "ts": "TEXT", "json": "TEXT"}
+    json_param = "%s"
+
+    def __init__(self, path: Path, pool_size: int = 1) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # sqlite takes one writer at a time, so extra pooled connections only help readers
+        self._pool: "queue.Queue" = queue.Queue()
+        for _ in range(max(1, pool_size)):
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._pool.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                yield cur
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            cur.execute("COMMIT")
+
+    def bulk(self, cur, sql: str, template: str, rows: Sequence[tuple]) -> None:
+        cur.executemany(sql.format(values=template).replace("%s", "?"), rows)
+
+    def in_list(self, cur, sql: str, values: Sequence[Any]) -> None:
+        # sqlite caps bound parameters (999 on old builds), so large IN lists are chunked
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            cur.execute(sql.format(params=",".join("?" * len(chunk))), chunk)
+
+    def widen(self, col: str, fn: str) -> str:
+        return f"{fn.lower()}(sessions.{col}, excluded.{col})"
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get().close()
+
+class PostgresBackend:
+    name = "postgres"
+    types = {"uuid": "UUID", "ts": "TIMESTAMPTZ", "json": "JSONB"}
+    # json values are bound as text and need an explicit cast into jsonb columns
+    json_param = "%s::jsonb"
+
+    def __init__(self, dsn: str, pool_size: int = DEFAULT_POOL_SIZE) -> None:
+        if psycopg2 is None:
+            raise RuntimeError("the postgres sink needs psycopg2 (pip install psycopg2-binary)")
+        self._pool = psycopg2.pool.ThreadedConnectionPool(1, max(1, pool_size), dsn)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        conn = self._pool.getconn()
+        try:
+            yield conn
+        finally:
+            self._pool.putconn(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    yield cur
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def bulk(self, cur, sql: str, template: str, rows: Sequence[tuple]) -> None:
+        # one multi-row INSERT per page instead of a round trip per row
+        psycopg2.extras.execute_values(cur, sql.format(values="%s"), rows, template=template, page_size=1000)
+
+    def in_list(self, cur, sql: str, values: Sequence[Any]) -> None:
+        cur.execute(sql.replace("IN ({params})", "= ANY(%s::uuid[])"), (list(values),))
+
+    def widen(self, col: str, fn: str) -> str:
+        return f"{'LEAST' if fn == 'MIN' else 'GREATEST'}(sessions.{col}, excluded.{col})"
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+def _insert_sql(backend, table: str, cols: List[str], conflict: str, updates: Optional[Dict[str, str]] = None,
+                json_cols: Sequence[str] = ()) -> Tuple[str, str]:
+    # (statement with a {values} slot, row template); each backend expands the slot its own way
+    template = "(" + ", ".join(backend.json_param if c in json_cols else "%s" for c in cols) + ")"
+    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES {{values}} ON CONFLICT ({conflict}) "
+    if not updates:
+        return sql + "DO NOTHING", template
+    return sql + "DO UPDATE SET " + ", ".join(f"{c} = {expr}" for c, expr in updates.items()), template
+
+def _json(v: Any) -> Optional[str]:
+    return None if v is None else json.dumps(v, ensure_ascii=False)
+
+def _entity_id(message_id: str, i: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{message_id}/entities/{i}"))
+
+class DbSink:
+    def __init__(self, backend, batch_rows: int = DEFAULT_BATCH_ROWS, defer_indexes: bool = True) -> None:
+        self.backend = backend
+        self.batch_rows = max(1, batch_rows)
+        self.defer_indexes = defer_indexes
+        self._buffer: List[Dict[str, Any]] = []
+        self.failed: List[Tuple[Dict[str, Any], Exception]] = []
+        self.loaded = 0
+        t = backend.types
+        with backend.transaction() as cur:
+            for ddl in _TABLES:
+                cur.execute(ddl.format(**t))
+            if defer_indexes:
+                for name in SECONDARY_INDEXES:
+                    cur.execute(f"DROP INDEX IF EXISTS {name}")
+        self._sql = {
+            "sessions": _insert_sql(backend, "sessions", _SESSION_COLS, "session_id", {
+                "started_at": backend.widen("started_at", "MIN"), "ended_at": backend.widen("ended_at", "MAX")}),
+            "messages": _insert_sql(backend, "messages", _MESSAGE_COLS, "message_id",
+                                    {c: f"excluded.{c}" for c in _MESSAGE_COLS[1:]}, json_cols=("phi_flags",)),
+            "entities": _insert_sql(backend, "entities", _ENTITY_COLS, "entity_id"),
+            "audit_events": _insert_sql(backend, "audit_events", _AUDIT_COLS, "event_id", json_cols=("details",)),
+        }
+
+    def _rows(self, records: List[Dict[str, Any]]):
+        # one row per key per statement: Postgres refuses an upsert that touches the same row twice,
+        # so a message repeated within the batch keeps its last version
+        sessions: Dict[str, list] = {}
+        latest: Dict[str, Dict[str, Any]] = {}
+        for rec in records:
+            latest[rec["message_id"]] = rec
+            sid, ts = rec["session_id"], rec["timestamp"]
+            s = sessions.get(sid)
+            if s is None:
+                sessions[sid] = [sid, ts, ts, rec.get("channel")]
+            else:
+                s[1], s[2] = min(s[1], ts), max(s[2], ts)
+        messages, entities, audit = [], [], {}
+        for mid, rec in latest.items():
+            messages.append((mid, rec["session_id"], rec["timestamp"], rec.get("user_role"), rec.get("channel"),
+                             rec.get("raw_text"), rec.get("clean_text"), rec.get("language"),
+                             _json(rec.get("phi_flags") or []), rec.get("intent"), rec.get("urgency"),
+                             rec.get("confidence"), rec.get("consent_given"), rec.get("retention_policy")))
+            for i, e in enumerate(rec.get("entities") or []):
+                value = e.get("value")
+                entities.append((_entity_id(mid, i), mid, e.get("type"), None if value is None else str(value), e.get("confidence")))
+            for a in rec.get("audit_trail") or []:
+                audit[a.get("event_id")] = (a.get("event_id"), mid, a.get("actor"), a.get("action"), a.get("timestamp"),
+                                            a.get("reason"), _json(a.get("details")))
+        return [tuple(s) for s in sessions.values()], messages, entities, list(audit.values())
+
+    def _load(self, records: List[Dict[str, Any]]) -> None:
+        sessions, messages, entities, audit = self._rows(records)
+        b = self.backend
+        with b.transaction() as cur:
+            b.bulk(cur, *self._sql["sessions"], sessions)
+            b.bulk(cur, *self._sql["messages"], messages)
+            # upserted messages get exactly the entities of this load
+            b.in_list(cur, "DELETE FROM entities WHERE message_id IN ({params})", [m[0] for m in messages])
+            if entities:
+                b.bulk(cur, *self._sql["entities"], entities)
+            if audit:
+                b.bulk(cur, *self._sql["audit_events"], audit)
+
+    def _flush(self) -> List[Tuple[Dict[str, Any], Exception]]:
+        records, self._buffer = self._buffer, []
+        if not records:
+            return []
+        try:
+            self._load(records)
+            self.loaded += len(records)
+            return []
+        except Exception:
+            pass
+        # isolate the bad rows: each record in its own transaction
+        failed = []
+        for rec in records:
+            try:
+                self._load([rec])
+                self.loaded += 1
+            except Exception as e:
+                failed.append((rec, e))
+        return failed
+
+    def write_records(self, records: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Exception]]:
+        self._buffer.extend(records)
+        if len(self._buffer) < self.batch_rows:
+            return []
+        return self._flush()
+
+    def flush(self) -> None:
+        # failures found here have no caller to return to; close() reports them
+        self.failed.extend(self._flush())
+
+    def create_indexes(self) -> None:
+        with self.backend.transaction() as cur:
+            for name, (table, cols) in SECONDARY_INDEXES.items():
+                cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+
+    def close(self) -> None:
+        try:
+            self.flush()
+            self.create_indexes()
+        finally:
+            self.backend.close()
+        if self.failed:
+            print(json.dumps({"level": "error", "msg": "db_load_failed", "count": len(self.failed),
+                              "error": str(self.failed[0][1])}))
+
+    def __enter__(self) -> "DbSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def open_db_sink(url: str, batch_rows: int = DEFAULT_BATCH_ROWS, pool_size: Optional[int] = None,
+                 defer_indexes: bool = True) -> DbSink:
+    # sqlite:///relative.db, sqlite:////abs/path.db, or a postgresql:// DSN
+    if url.startswith("sqlite:///"):
+        backend = SqliteBackend(Path(url[len("sqlite:///"):]), pool_size or 1)
+    elif url.startswith(("postgresql://", "postgres://")):
+        backend = PostgresBackend(url, pool_size or DEFAULT_POOL_SIZE)
+    else:
+        raise ValueError(f"unsupported database url: {url}")
+    return DbSink(backend, batch_rows=batch_rows, defer_indexes=defer_indexes)
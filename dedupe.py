@@ -0,0 +1,160 @@
+# src/etl/dedupe.py
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import struct
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+DEFAULT_CAPACITY = 10_000_000
+DEFAULT_ERROR_RATE = 0.01
+
+# Seen-message_id tracking that stays small in memory. Every id is reduced to a 16-byte blake2b key.
+# The authoritative set is a WITHOUT ROWID sqlite table of those keys on disk; a Bloom filter in front
+# of it answers "definitely new" for almost every fresh id without touching the table, and only the
+# Bloom hits (true repeats plus ~error_rate false positives) are confirmed with an indexed lookup.
+# 10M ids at 1% cost ~12 MB of filter; the filter is a cache and is rebuilt from the table whenever
+# its saved generation does not match the table's (e.g. after a crash).
+
+_BLOOM_MAGIC = b"BLOOM1\n"
+_BLOOM_HEADER = struct.Struct("<QQQQQ")  # bits, hashes, capacity, count, generation
+
+def id_key(message_id: str) -> bytes:
+    return hashlib.blake2b(str(message_id).encode("utf-8"), digest_size=16).digest()
+
+class BloomFilter:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE,
+                 num_bits: Optional[int] = None, num_hashes: Optional[int] = None) -> None:
+        capacity = max(1, capacity)
+        self.num_bits = num_bits or max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = num_hashes or max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.capacity = capacity
+        self.count = 0
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: bytes):
+        # double hashing (Kirsch-Mitzenmacher) over the two halves of the 16-byte key
+        h1 = int.from_bytes(key[:8], "little")
+        h2 = int.from_bytes(key[8:16], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, key: bytes) -> None:
+        bits = self.bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self.bits
+        for p in self._positions(key):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def save(self, path: Path, generation: int = 0) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as fh:
+            fh.write(_BLOOM_MAGIC)
+            fh.write(_BLOOM_HEADER.pack(self.num_bits, self.num_hashes, self.capacity, self.count, generation))
+            fh.write(self.bits)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path):
+        # returns (filter, generation), or (None, None) when the file is missing or unreadable
+        try:
+            with path.open("rb") as fh:
+                if fh.read(len(_BLOOM_MAGIC)) != _BLOOM_MAGIC:
+                    return None, None
+                num_bits, num_hashes, capacity, count, generation = _BLOOM_HEADER.unpack(fh.read(_BLOOM_HEADER.size))
+                bits = bytearray(fh.read())
+        except (OSError, struct.error):
+            return None, None
+        if len(bits) != (num_bits + 7) // 8:
+            return None, None
+        bf = cls(capacity, num_bits=num_bits, num_hashes=num_hashes)
+        bf.bits = bits
+        bf.count = count
+        return bf, generation
+
+class SeenIds:
+    def __init__(self, path: Path, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.bloom_path = self.path.with_name(self.path.name + ".bloom")
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY) WITHOUT ROWID")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        self.generation = self._generation()
+        self.confirm_lookups = 0
+        self._warned_full = False
+        bloom, saved_generation = BloomFilter.load(self.bloom_path)
+        if bloom is None or saved_generation != self.generation:
+            bloom = self._rebuild_bloom(capacity, error_rate)
+        self.bloom = bloom
+
+    def _generation(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def _rebuild_bloom(self, capacity: int, error_rate: float) -> BloomFilter:
+        count = self._conn.execute("SELECT count(*) FROM seen").fetchone()[0]
+        bloom = BloomFilter(max(capacity, count * 2), error_rate)
+        for (key,) in self._conn.execute("SELECT key FROM seen"):
+            bloom.add(key)
+        if count:
+            print(json.dumps({"level": "info", "msg": "dedupe_filter_rebuilt", "path": str(self.path), "count": count}))
+        return bloom
+
+    def filter_new(self, message_ids: Sequence[str]) -> List[bool]:
+        # True for ids never committed before and not repeated earlier in this call
+        keys = [id_key(m) for m in message_ids]
+        maybe = [k for k in keys if k in self.bloom]
+        known = set()
+        for start in range(0, len(maybe), 500):
+            chunk = maybe[start:start + 500]
+            self.confirm_lookups += len(chunk)
+            known.update(k for (k,) in self._conn.execute(
+                f"SELECT key FROM seen WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+        out = []
+        for k in keys:
+            if k in known:
+                out.append(False)
+            else:
+                known.add(k)
+                out.append(True)
+        return out
+
+    def add(self, message_ids: Iterable[str]) -> None:
+        keys = [id_key(m) for m in message_ids]
+        if not keys:
+            return
+        self.generation += 1
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO seen VALUES (?)", [(k,) for k in keys])
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (self.generation,))
+        for k in keys:
+            self.bloom.add(k)
+        if not self._warned_full and self.bloom.count > self.bloom.capacity:
+            # still correct, just more ids fall through to the table; a larger --dedupe-capacity fixes it
+            self._warned_full = True
+            print(json.dumps({"level": "warning", "msg": "dedupe_filter_over_capacity", "capacity": self.bloom.capacity}))
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT count(*) FROM seen").fetchone()[0]
+
+    def close(self) -> None:
+        self.bloom.save(self.bloom_path, self.generation)
+        self._conn.close()
+
+    def __enter__(self) -> "SeenIds":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,47 +1,93 @@
 #src/etl/ingest.py
+import json
+import os
 import re
 import unicodedata
 from pathlib import Path
-from typing import Any, Dict
-from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 from uuid import uuid4 as make_uuid
+from .message import Message
+from .metrics import METRICS
+from .redact import Redaction, RedactionTimeout, redact_text_batch
+from .resources import medical_whitelist
+from .spell_cache import SpellCache
+from .symspell import SymSpell
+from .timestamps import TIMESTAMPS, utc_now_iso
 
-WORDLIST_PATH = Path("data/resources/wordlist.txt")
+SYMSPELL_INDEX_PATH = Path(os.getenv("SYMSPELL_INDEX_PATH", "data/resources/symspell.idx"))
+# auto | symspell | pyspellchecker; auto prefers the symspell index when it exists. It is not shipped
+# and nothing builds it implicitly (python -m src.etl.symspell, which needs pyspellchecker), so until
+# it is built every engine setting runs pyspellchecker
+SPELL_ENGINE = os.getenv("SPELL_ENGINE", "auto")
 MAX_TEXT_LEN = 4000
 
 _whitespace_re = re.compile(r"\s+")
 _punct_only_re = re.compile(rf"^[{re.escape(re.escape(re.escape(re.escape('!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~'))))}]+$")
 
-try:
-    from spellchecker import SpellChecker
-    spell = SpellChecker()
-except Exception:
-    spell = None
+# the engine is picked from what is on disk at import time, but only loaded on first use
+if SPELL_ENGINE in ("auto", "symspell") and SYMSPELL_INDEX_PATH.exists():
+    SPELL_ENGINE = "symspell"
+else:
+    SPELL_ENGINE = "pyspellchecker"
 
-MEDICAL_WHITELIST = set()
-if WORDLIST_PATH.exists():
-    try:
-        with WORDLIST_PATH.open(encoding="utf-8") as fh:
-            for line in fh:
-                t = line.strip()
-                if not t or t.startswith("#"):
-                    continue
-                MEDICAL_WHITELIST.add(t.lower())
-    except Exception:
-        MEDICAL_WHITELIST = set()
+_spell = None
+_spell_loaded = False
 
-if MEDICAL_WHITELIST and spell is not None:
-    try:
-        spell.word_frequency.load_words(list(MEDICAL_WHITELIST))
-    except Exception:
-        for w in MEDICAL_WHITELIST:
+def get_spell():
+    global _spell, _spell_loaded, SPELL_ENGINE
+    if _spell_loaded:
+        return _spell
+    _spell_loaded = True
+    if SPELL_ENGINE == "symspell":
+        try:
+            _spell = SymSpell.load(SYMSPELL_INDEX_PATH)
+        except Exception:
+            _spell = None
+            SPELL_ENGINE = "pyspellchecker"
+            # corrections cached for the symspell engine must not be served for another one
+            SPELL_CACHE.clear()
+            SPELL_CACHE.namespace = SPELL_ENGINE
+    if _spell is None:
+        try:
+            from spellchecker import SpellChecker
+            _spell = SpellChecker()
+        except Exception:
+            _spell = None
+        whitelist = medical_whitelist()
+        if whitelist and _spell is not None:
             try:
-                spell.word_frequency.add(w)
+                _spell.word_frequency.load_words(list(whitelist))
             except Exception:
-                pass
+                for w in whitelist:
+                    try:
+                        _spell.word_frequency.add(w)
+                    except Exception:
+                        pass
+    return _spell
 
 SPECIAL_TOKENS = {"ssn", "id", "dob"}
 
+SPELL_CACHE_SIZE = int(os.getenv("SPELL_CACHE_SIZE", "100000"))
+SPELL_CACHE = SpellCache(SPELL_CACHE_SIZE, namespace=SPELL_ENGINE)
+METRICS.register_cache("spell", SPELL_CACHE)
+_spell_cache_path: Optional[Path] = None
+
+def configure_spell_cache(path: Optional[Path]) -> None:
+    global _spell_cache_path
+    _spell_cache_path = Path(path) if path else None
+    if _spell_cache_path is not None:
+        SPELL_CACHE.load(_spell_cache_path)
+
+def save_spell_cache() -> None:
+    if _spell_cache_path is None:
+        return
+    try:
+        SPELL_CACHE.save(_spell_cache_path)
+    except Exception:
+        pass
+
+configure_spell_cache(os.getenv("SPELL_CACHE_PATH"))
+
 def _is_token_numeric(token: str) -> bool:
     return any(ch.isdigit() for ch in token)
 
@@ -52,16 +98,27 @@ def _safe_spell_correction(token: str) -> str:
         return token
     if _is_token_numeric(token):
         return token
-    if token in MEDICAL_WHITELIST:
+    if token in medical_whitelist():
         return token
     if token in SPECIAL_TOKENS:
         return token
+    spell = get_spell()
     if spell is None:
         return token
-    corr = spell.correction(token)
-    return corr if corr else token
+    cached = SPELL_CACHE.get(token)
+    if cached is not None:
+        return cached
+    with METRICS.timer("spell"):
+        corr = spell.correction(token)
+    result = corr if corr else token
+    SPELL_CACHE.put(token, result)
+    return result
 
 def clean(raw_text: Any) -> str:
+    with METRICS.timer("clean"):
+        return _clean(raw_text)
+
+def _clean(raw_text: Any) -> str:
     if raw_text is None:
         return ""
     try:
@@ -76,6 +133,7 @@ def clean(raw_text: Any) -> str:
     s = _whitespace_re.sub(" ", s).strip()
     s = re.sub(r"(?<=\d),(?=\d{3}\b)", "", s)
     words = s.split()
+    whitelist = medical_whitelist()
     corrected_tokens = []
     for tok in words:
         if _punct_only_re.match(tok):
@@ -84,7 +142,7 @@ def clean(raw_text: Any) -> str:
         if _is_token_numeric(tok):
             corrected_tokens.append(tok)
             continue
-        if tok in MEDICAL_WHITELIST:
+        if tok in whitelist:
             corrected_tokens.append(tok)
             continue
         if tok in SPECIAL_TOKENS:
@@ -97,46 +155,105 @@ def clean(raw_text: Any) -> str:
         cleaned = cleaned[:MAX_TEXT_LEN]
     return cleaned
 
+_PH_MAP = {
+    "EMAIL": "[REDACTED_EMAIL]",
+    "PHONE": "[REDACTED_PHONE]",
+    "SSN": "[REDACTED_SSN]",
+    "IP": "[REDACTED_IP]",
+    "URL": "[REDACTED_URL]",
+    "MEDICAL RECORD": "[REDACTED_ID]",
+    "DATE": "[REDACTED_DATE]",
+    "ID": "[REDACTED_ID]",
+    "NAME": "[REDACTED_NAME]",
+    "GPE": "[REDACTED_LOCATION]",
+}
+
 def ingest(message: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
-    rec = {}
-    rec["session_id"] = metadata.get("session_id") or str(make_uuid())
-    rec["message_id"] = metadata.get("message_id") or str(make_uuid())
-    rec["timestamp"] = metadata.get("timestamp") or datetime.utcnow().isoformat()
-    rec["user_role"] = metadata.get("user_role", "user")
-    rec["channel"] = metadata.get("channel", "web")
+    # single-message convenience API; the batch path hands Message objects on without a dict
+    rec = ingest_batch([(message, metadata)])[0]
+    if isinstance(rec, RedactionTimeout):
+        raise rec
+    return rec.raw_dict()
+
+def ingest_batch(items: Sequence[Tuple[str, Dict[str, Any]]],
+                 budget_ms: Optional[float] = None) -> List[Union[Message, RedactionTimeout]]:
+    # message texts and entity values of the whole batch go through one redaction (and NER) call;
+    # a message whose text or any entity value ran over budget comes back as its RedactionTimeout
+    texts: List[str] = []
+    slices = []
+    for message, metadata in items:
+        entities = metadata.get("entities", []) or []
+        values = [str(e.get("value")) for e in entities if e.get("value")]
+        slices.append((len(texts), len(values)))
+        texts.append(message or "")
+        texts.extend(values)
+    with METRICS.timer("redact", len(texts)):
+        redacted = redact_text_batch(texts, budget_ms)
+    # timestamps are normalized per batch, with the channel as the format-cache key; an unparseable one
+    # is kept as sent and reported, the partitioner and the validator then refuse the record
+    stamps, bad = TIMESTAMPS.normalize_batch([m.get("timestamp") for _, m in items],
+                                             [m.get("channel", "web") for _, m in items])
+    if bad:
+        METRICS.incr("timestamp_unparseable", len(bad))
+        print(json.dumps({"level": "warning", "msg": "timestamp_unparseable", "count": len(bad),
+                          "sample": [str(items[i][1].get("timestamp"))[:64] for i in bad[:5]]}))
+    now = utc_now_iso()
+    out: List[Union[Message, RedactionTimeout]] = []
+    for (message, metadata), (pos, n_values), stamp in zip(items, slices, stamps):
+        results = redacted[pos:pos + 1 + n_values]
+        timeout = next((r for r in results if isinstance(r, RedactionTimeout)), None)
+        if timeout is not None:
+            out.append(timeout)
+            continue
+        out.append(_build_record(message, metadata, results[0], iter(results[1:]),
+                                 stamp or metadata.get("timestamp") or now, now))
+    return out
+
+def _build_record(message: str, metadata: Dict[str, Any], redacted_message: Redaction,
+                  redacted_values, timestamp: str, now: str) -> Message:
     raw = message or ""
-    rec["raw_text"] = raw
-    redacted_raw = redact_text(raw)
-    phi_flags, cleaned = [], clean(redacted_raw)
-    ph_map = {
-        "EMAIL": "[REDACTED_EMAIL]",
-        "PHONE": "[REDACTED_PHONE]",
-        "SSN": "[REDACTED_SSN]",
-        "IP": "[REDACTED_IP]",
-        "URL": "[REDACTED_URL]",
-        "MEDICAL RECORD": "[REDACTED_ID]",
-        "DATE": "[REDACTED_DATE]",
-        "ID": "[REDACTED_ID]",
-        "NAME": "[REDACTED_NAME]",
-        "GPE": "[REDACTED_LOCATION]",
-    }
+    phi_flags, redacted_raw, text_spans = redacted_message
+    cleaned = clean(redacted_raw)
     for ph in set(phi_flags):
-        cleaned = cleaned.replace(ph_map.get(ph, "[REDACTED]").lower(), ph_map.get(ph, "[REDACTED]"))
-    rec["clean_text"] = cleaned
-    rec["phi_flags"] = sorted(phi_flags)
-    lang = metadata.get("language", "en")
+        cleaned = cleaned.replace(_PH_MAP.get(ph, "[REDACTED]").lower(), _PH_MAP.get(ph, "[REDACTED]"))
+    # the detection result travels with the record, so transform() derives phi_flags from it instead of
+    # scanning again; offsets are into raw_text, or into an entity value as it was sent
+    spans = [{"field": "raw_text", **s} for s in text_spans]
     entities = metadata.get("entities", []) or []
-    redacted_entities, ent_flags = redact_entities(entities)
-    rec["entities"] = redacted_entities
-    if ent_flags:
-        rec["phi_flags"] = sorted(set(rec.get("phi_flags", [])) | set(ent_flags))
+    redacted_entities, ent_flags = [], set()
+    for i, e in enumerate(entities):
+        if e.get("value"):
+            flags, value, value_spans = next(redacted_values)
+            if flags:
+                ent_flags.update(flags)
+                e = {**e, "value": value}
+            spans.extend({"field": f"entities.{i}.value", **s} for s in value_spans)
+        redacted_entities.append(e)
+    # a replayed raw record (replay.py): its entity values were stored redacted, so the spans found when
+    # it was first ingested come along instead; the placeholders themselves scan clean
+    for s in metadata.get("entity_spans") or ():
+        spans.append(s)
+        if s.get("type"):
+            ent_flags.add(s["type"])
+    flags = sorted(set(phi_flags) | ent_flags) if ent_flags else sorted(phi_flags)
     audits = []
-    if rec["phi_flags"]:
-        audits.append({"event_id": str(make_uuid()), "actor": "redaction-service", "action": "redact", "timestamp": datetime.utcnow().isoformat()})
-    rec["audit_trail"] = audits
-    rec["intent"] = metadata.get("intent")
-    rec["urgency"] = metadata.get("urgency")
-    rec["confidence"] = metadata.get("confidence")
-    rec["consent_given"] = bool(metadata.get("consent_given", False))
-    rec["retention_policy"] = metadata.get("retention_policy", "dev-30d")
-    return rec
+    if flags:
+        audits.append({"event_id": str(make_uuid()), "actor": "redaction-service", "action": "redact", "timestamp": now})
+    return Message(
+        session_id=metadata.get("session_id") or str(make_uuid()),
+        message_id=metadata.get("message_id") or str(make_uuid()),
+        timestamp=timestamp,
+        user_role=metadata.get("user_role", "user"),
+        channel=metadata.get("channel", "web"),
+        raw_text=raw,
+        clean_text=cleaned,
+        phi_flags=flags,
+        phi_spans=spans,
+        entities=redacted_entities,
+        audit_trail=audits,
+        intent=metadata.get("intent"),
+        urgency=metadata.get("urgency"),
+        confidence=metadata.get("confidence"),
+        consent_given=bool(metadata.get("consent_given", False)),
+        retention_policy=metadata.get("retention_policy", "dev-30d"),
+    )
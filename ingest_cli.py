@@ -1,20 +1,46 @@
 # cli/ingest_cli.py
 import argparse
+import cProfile
 import json
+import os
 import shutil
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from itertools import islice
+from multiprocessing.util import Finalize
 from pathlib import Path
 from datetime import datetime
-from src.etl.ingest import ingest
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.etl.checkpoint import Checkpoint, FileMessageReader
+from src.etl.db_sink import DEFAULT_BATCH_ROWS, open_db_sink
+from src.etl.dedupe import DEFAULT_CAPACITY, SeenIds
+from src.etl.metrics import METRICS
+from src.etl.ingest import ingest_batch, clean, configure_spell_cache, save_spell_cache
+from src.etl.message import raw_dict
+from src.etl.redact import (RedactionTimeout, configure_redaction_cache, detect_phi_spans, fallback_redact,
+                            set_redact_budget)
 from src.etl.transform import transform
-from src.etl.utils import write_jsonl
+from src.etl.parquet_sink import DEFAULT_ROW_GROUP_SIZE, ParquetPartitionWriter
+from src.etl.sharding import ShardFilter, parse_shard, shard_layout, write_shard_status
+from src.etl.store_index import StoreIndex
+from src.etl.codec import COMPRESSIONS, JSON_BACKENDS, check_compression, configure_json, with_suffix
+from src.etl.utils import MultiWriter, PartitionWriter, partitioned_path, write_jsonl
+from src.etl.validate import BatchValidator, reject_record
 
 DEFAULT_RAW = Path("data/raw/all_messages.jsonl")
 DEFAULT_PROCESSED = Path("data/processed")
-
-def partitioned_path(base: Path, ts_iso: str, session_id: str) -> Path:
-    date_part = ts_iso.split("T")[0]
-    y, m, d = date_part.split("-")
-    return base / y / m / d / f"{session_id}.jsonl"
+DEFAULT_PARQUET = Path("data/processed_parquet")
+SINKS = ("jsonl", "parquet", "both")
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_OPEN_FILES = 256
+DEFAULT_QUARANTINE = Path("data/quarantine/quarantine.jsonl")
+DEFAULT_PROFILE = Path("data/profile/ingest.prof")
+DEFAULT_REJECTS = Path("data/rejects/rejects.jsonl")
+DEFAULT_METRICS_INTERVAL = 10.0
+DEFAULT_CHECKPOINT = Path("data/state/ingest_checkpoint.json")
+DEFAULT_DEDUPE = Path("data/state/seen_ids.sqlite")
 
 def _safe_remove_path(p: Path) -> None:
     try:
@@ -26,31 +52,346 @@ def _safe_remove_path(p: Path) -> None:
     except Exception as e:
         print(json.dumps({"level": "warning", "msg": "remove_failed", "path": str(p), "error": str(e)}))
 
-def run_messages(messages, raw_out_path: Path, processed_base: Path) -> None:
+def iter_stdin_messages(stream) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    for line in stream:
+        try:
+            j = json.loads(line)
+            yield j.get("message"), j.get("metadata", {})
+        except Exception:
+            continue
+
+def iter_batches(items: Iterable, size: int) -> Iterator[List]:
+    size = max(1, int(size))
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+def quarantine_record(msg: Any, meta: Dict[str, Any], exc: RedactionTimeout) -> Dict[str, Any]:
+    # only the fallback-redacted text is kept; the original message never leaves the worker
+    return {
+        "message_id": meta.get("message_id"),
+        "session_id": meta.get("session_id"),
+        "timestamp": meta.get("timestamp"),
+        "reason": "redaction_timeout",
+        "elapsed_ms": round(exc.elapsed_ms, 1),
+        "text_len": exc.text_len,
+        "redacted_text": fallback_redact(str(msg or "")),
+        "quarantined_at": datetime.utcnow().isoformat(),
+    }
+
+_validator: Optional[BatchValidator] = None
+
+def configure_validation(backend: Optional[str]) -> Optional[BatchValidator]:
+    global _validator
+    _validator = BatchValidator(backend) if backend else None
+    return _validator
+
+def process_batch(batch) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int, List[Dict[str, Any]], List[Dict[str, Any]]]:
     raw_out = []
     processed_out = []
+    quarantined = []
     errors = 0
-    for msg, meta in messages:
+    try:
+        with METRICS.timer("ingest_batch", len(batch)):
+            records = ingest_batch(batch)
+    except Exception:
+        # isolate the message that broke the batch call; the rest still get redacted per message
+        records = []
+        for item in batch:
+            try:
+                records.extend(ingest_batch([item]))
+            except Exception as e:
+                records.append(e)
+    for (msg, meta), rec in zip(batch, records):
+        if isinstance(rec, RedactionTimeout):
+            q = quarantine_record(msg, meta, rec)
+            quarantined.append(q)
+            METRICS.incr("quarantined")
+            print(json.dumps({"level": "warning", "msg": "redaction_quarantined", "message_id": q["message_id"], "elapsed_ms": q["elapsed_ms"], "text_len": q["text_len"]}))
+            continue
         try:
-            rec = ingest(msg, meta)
+            if isinstance(rec, Exception):
+                raise rec
             raw_out.append(rec)
-            out = transform(rec)
+            with METRICS.timer("transform"):
+                out = transform(rec)
             processed_out.append(out)
         except Exception as e:
             errors += 1
+            METRICS.incr("errors")
             print(json.dumps({"level": "error", "msg": "ingest_error", "error": str(e), "sample": (msg or "")[:200]}))
+    rejected = []
+    if _validator is not None and processed_out:
+        with METRICS.timer("validate", len(processed_out)):
+            processed_out, invalid = _validator.validate(processed_out)
+        if invalid:
+            now = datetime.utcnow().isoformat()
+            rejected = [reject_record(rec, errs, _validator.backend, now) for rec, errs in invalid]
+            METRICS.incr("rejected", len(rejected))
+    return raw_out, processed_out, errors, quarantined, rejected
+
+def _process_batch_in_worker(batch):
+    # the parent merges each worker's stage samples and cache deltas into its own METRICS
+    return process_batch(batch), METRICS.drain()
+
+def _dump_profile(profiler: cProfile.Profile, path: Path) -> None:
+    profiler.disable()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(str(path))
+
+def _init_worker(config: Dict[str, Any]) -> None:
+    configure_validation(config.get("validate"))
+    if config.get("redact_budget_ms") is not None:
+        set_redact_budget(config["redact_budget_ms"])
+    if config.get("redact_cache_path"):
+        configure_redaction_cache(Path(config["redact_cache_path"]))
+    if config.get("spell_cache_path"):
+        configure_spell_cache(Path(config["spell_cache_path"]))
+        # pool workers exit through multiprocessing, which runs Finalize hooks but not atexit
+        Finalize(None, save_spell_cache, exitpriority=10)
+    METRICS.track_pending()
+    # force per-worker resources (wordlists, spell checker, spaCy model) to load before the first batch
+    clean("warm up")
+    detect_phi_spans("warm up")
+    METRICS.reset()
+    if config.get("profile_path"):
+        profiler = cProfile.Profile()
+        path = Path(f"{config['profile_path']}.{os.getpid()}")
+        Finalize(None, _dump_profile, args=(profiler, path), exitpriority=5)
+        profiler.enable()
+
+def iter_batch_results(batches: Iterable[List], workers: int = 1, ordered: bool = True,
+                       worker_config: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[List, List, int, List]]:
+    if workers <= 1:
+        for batch in batches:
+            yield process_batch(batch)
+        return
+    for result, drained in _iter_pool_results(batches, workers, ordered, worker_config or {}):
+        METRICS.merge(drained)
+        yield result
+
+def _iter_pool_results(batches: Iterable, workers: int, ordered: bool, worker_config: Dict[str, Any],
+                       task=_process_batch_in_worker):
+    max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(worker_config,)) as pool:
+        if ordered:
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.submit(task, batch))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        else:
+            pending = set()
+            for batch in batches:
+                pending.add(pool.submit(task, batch))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        yield fut.result()
+            for fut in as_completed(pending):
+                yield fut.result()
+
+def open_processed_sink(sink: str, processed_base: Path, max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+                        parquet_base: Path = DEFAULT_PARQUET, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                        index: bool = True, db_url: Optional[str] = None, db_batch_rows: int = DEFAULT_BATCH_ROWS,
+                        compression: str = "none", compression_level: Optional[int] = None):
+    if sink not in SINKS:
+        raise ValueError(f"unknown sink: {sink}")
+    writers = []
+    if sink in ("jsonl", "both"):
+        # the writer owns the index and closes it with its file handles
+        store_index = StoreIndex(processed_base) if index else None
+        writers.append(PartitionWriter(processed_base, max_open=max_open_files, index=store_index,
+                                       compression=compression, level=compression_level))
+    if sink in ("parquet", "both"):
+        writers.append(ParquetPartitionWriter(parquet_base, row_group_size=row_group_size))
+    if db_url:
+        writers.append(open_db_sink(db_url, batch_rows=db_batch_rows))
+    return writers[0] if len(writers) == 1 else MultiWriter(writers)
+
+def _follow_raw(recs, raw_out, keep_raw):
+    # processed and rejected records are in raw_out order, minus the ones that failed on the way
+    out = []
+    j = 0
+    for rec in recs:
+        while j < len(raw_out) and raw_out[j]["message_id"] != rec["message_id"]:
+            j += 1
+        if j < len(raw_out) and keep_raw[j]:
+            out.append(rec)
+        j += 1
+    return out
+
+def drop_seen(seen: SeenIds, raw_out, processed_out, quarantined, rejected):
+    # a message counts as written once its raw record (or its quarantine record) is; processed and
+    # rejected records follow their raw record, so a replayed batch writes nothing twice. filter_new
+    # answers per position, so of ids repeated within the batch only the first is kept
+    ids = [r["message_id"] for r in raw_out] + [q["message_id"] for q in quarantined if q.get("message_id")]
+    keep = seen.filter_new(ids)
+    new_ids = {m for m, new in zip(ids, keep) if new}
+    if all(keep):
+        return raw_out, processed_out, quarantined, rejected, new_ids
+    keep_raw = keep[:len(raw_out)]
+    keep_q = iter(keep[len(raw_out):])
+    return ([r for r, k in zip(raw_out, keep_raw) if k], _follow_raw(processed_out, raw_out, keep_raw),
+            [q for q in quarantined if not q.get("message_id") or next(keep_q)],
+            _follow_raw(rejected, raw_out, keep_raw), new_ids)
+
+def write_batch(raw_out, processed_out, raw_out_path: Optional[Path], writer: PartitionWriter,
+                quarantined=None, quarantine_path: Path = DEFAULT_QUARANTINE,
+                rejected=None, reject_path: Path = DEFAULT_REJECTS, compression_level: Optional[int] = None) -> int:
+    errors = 0
     try:
-        write_jsonl(raw_out_path, raw_out)
+        # no raw path: a replay, which reads the raw store instead of adding to it
+        if raw_out_path is not None:
+            with METRICS.timer("write_raw", len(raw_out)):
+                # raw and processed are the same Message objects; the raw sink wants the pre-transform view
+                write_jsonl(raw_out_path, [raw_dict(r) for r in raw_out], compression_level)
     except Exception as e:
         print(json.dumps({"level": "error", "msg": "write_raw_failed", "error": str(e), "path": str(raw_out_path)}))
-    for rec in processed_out:
+    if quarantined:
         try:
-            p = partitioned_path(processed_base, rec["timestamp"], rec["session_id"])
-            write_jsonl(p, [rec])
+            write_jsonl(quarantine_path, quarantined)
         except Exception as e:
-            errors += 1
-            print(json.dumps({"level": "error", "msg": "write_processed_failed", "error": str(e), "session_id": rec.get("session_id")}))
-    print(json.dumps({"level": "info", "msg": "completed_run", "count_raw": len(raw_out), "count_processed": len(processed_out), "errors": errors}))
+            errors += len(quarantined)
+            print(json.dumps({"level": "error", "msg": "write_quarantine_failed", "error": str(e), "path": str(quarantine_path)}))
+    if rejected:
+        try:
+            write_jsonl(reject_path, rejected)
+        except Exception as e:
+            errors += len(rejected)
+            print(json.dumps({"level": "error", "msg": "write_rejects_failed", "error": str(e), "path": str(reject_path)}))
+    with METRICS.timer("write_processed", len(processed_out)):
+        failed = writer.write_records(processed_out)
+    for rec, e in failed:
+        errors += 1
+        print(json.dumps({"level": "error", "msg": "write_processed_failed", "error": str(e), "session_id": rec.get("session_id")}))
+    return errors
+
+def run_messages(messages, raw_out_path: Path, processed_base: Path, batch_size: int = DEFAULT_BATCH_SIZE,
+                 workers: int = 1, ordered: bool = True, max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+                 spell_cache_path: Optional[Path] = None, quarantine_path: Path = DEFAULT_QUARANTINE,
+                 redact_budget_ms: Optional[float] = None, metrics_interval: float = DEFAULT_METRICS_INTERVAL,
+                 profile_path: Optional[Path] = None, validate: Optional[str] = None,
+                 reject_path: Path = DEFAULT_REJECTS, sink: str = "jsonl", parquet_base: Path = DEFAULT_PARQUET,
+                 parquet_row_group_size: int = DEFAULT_ROW_GROUP_SIZE, index: bool = True,
+                 checkpoint_path: Optional[Path] = None, dedupe_path: Optional[Path] = None,
+                 dedupe_capacity: int = DEFAULT_CAPACITY, db_url: Optional[str] = None,
+                 db_batch_rows: int = DEFAULT_BATCH_ROWS, redact_cache_path: Optional[Path] = None,
+                 compression: str = "none", compression_level: Optional[int] = None,
+                 shard: Optional[Tuple[int, int]] = None) -> None:
+    count_raw = 0
+    count_processed = 0
+    count_quarantined = 0
+    count_rejected = 0
+    count_duplicates = 0
+    quarantine_ms = 0.0
+    errors = 0
+    if spell_cache_path and workers <= 1:
+        configure_spell_cache(spell_cache_path)
+    if redact_budget_ms is not None and workers <= 1:
+        set_redact_budget(redact_budget_ms)
+    if redact_cache_path and workers <= 1:
+        configure_redaction_cache(redact_cache_path)
+    if shard is not None:
+        # this instance owns shard K of N: its own output paths, and only the sessions hashing to K
+        raw_out_path, processed_base, quarantine_path, reject_path, parquet_base, checkpoint_path, dedupe_path = \
+            shard_layout(shard, raw_out_path, processed_base, quarantine_path, reject_path, parquet_base,
+                         checkpoint_path, dedupe_path)
+        print(json.dumps({"level": "info", "msg": "shard_enabled", "shard": shard[0], "shards": shard[1],
+                          "processed": str(processed_base)}))
+    # built here even with a pool so a missing backend fails the run before any worker starts
+    validator = configure_validation(validate)
+    if validator is not None:
+        print(json.dumps({"level": "info", "msg": "validation_enabled", "backend": validator.backend}))
+    checkpoint = None
+    if checkpoint_path:
+        if not isinstance(messages, FileMessageReader):
+            raise ValueError("checkpointing needs a file input (--input), stdin cannot be resumed")
+        if sink != "jsonl":
+            # parquet part files only become readable when closed, so buffered rows are not on disk yet
+            raise ValueError("checkpointing is only supported with the jsonl sink")
+        # the database sink buffers across batches; commit each batch so the checkpoint never runs ahead
+        db_batch_rows = 1
+        checkpoint = Checkpoint(checkpoint_path, messages.path)
+        if not ordered:
+            # the checkpoint offset is only meaningful if every batch before it has been written
+            print(json.dumps({"level": "warning", "msg": "checkpoint_forces_ordered"}))
+            ordered = True
+    if shard is not None:
+        messages = ShardFilter(messages, *shard)
+    if dedupe_path:
+        # ids are committed once write_batch returns; a sink still buffering them would lose those
+        # records for good after a crash, because the rerun skips them as already written
+        if sink != "jsonl":
+            raise ValueError("dedupe is only supported with the jsonl sink")
+        db_batch_rows = 1
+    seen = SeenIds(dedupe_path, capacity=dedupe_capacity) if dedupe_path else None
+    # the raw file is compressed (or not) by its name; quarantine and rejects stay plain for operators
+    raw_out_path = with_suffix(raw_out_path, check_compression(compression))
+    METRICS.reset()
+    started = last_emit = perf_counter()
+    worker_config = {
+        "spell_cache_path": str(spell_cache_path) if spell_cache_path else None,
+        "redact_budget_ms": redact_budget_ms,
+        "redact_cache_path": str(redact_cache_path) if redact_cache_path else None,
+        "profile_path": str(profile_path) if profile_path else None,
+        "validate": validator.backend if validator is not None else None,
+    }
+    batch_ends = deque()
+
+    def tracked_batches():
+        # input offset after each batch, consumed in order as its results are written
+        for batch in iter_batches(messages, batch_size):
+            batch_ends.append(getattr(messages, "offset", None))
+            yield batch
+
+    results = iter_batch_results(tracked_batches(), workers, ordered, worker_config)
+    with open_processed_sink(sink, processed_base, max_open_files, parquet_base, parquet_row_group_size, index,
+                             db_url, db_batch_rows, compression, compression_level) as writer:
+        for raw_out, processed_out, batch_errors, quarantined, rejected in results:
+            errors += batch_errors
+            batch_end = batch_ends.popleft()
+            if seen is not None:
+                before = len(raw_out) + len(quarantined)
+                raw_out, processed_out, quarantined, rejected, new_ids = drop_seen(seen, raw_out, processed_out, quarantined, rejected)
+                count_duplicates += before - len(raw_out) - len(quarantined)
+            errors += write_batch(raw_out, processed_out, raw_out_path, writer, quarantined, quarantine_path,
+                                  rejected, reject_path, compression_level)
+            # ids and offset are committed only after the batch is on disk; a crash in between replays it
+            if seen is not None:
+                seen.add(new_ids)
+            count_raw += len(raw_out)
+            count_processed += len(processed_out)
+            count_quarantined += len(quarantined)
+            count_rejected += len(rejected)
+            quarantine_ms += sum(q["elapsed_ms"] for q in quarantined)
+            if checkpoint is not None:
+                checkpoint.update(batch_end, count_raw=count_raw)
+            now = perf_counter()
+            if metrics_interval > 0 and now - last_emit >= metrics_interval:
+                last_emit = now
+                print(json.dumps({"level": "info", "msg": "pipeline_metrics", "elapsed_s": round(now - started, 2),
+                                  "count_raw": count_raw, "msgs_per_s": round(count_raw / (now - started), 1),
+                                  **METRICS.summary()}))
+    elapsed = perf_counter() - started
+    if checkpoint is not None:
+        checkpoint.update(messages.offset, completed=True, count_raw=count_raw)
+    if seen is not None:
+        seen.close()
+    if workers <= 1:
+        # with a pool, each worker persists its own cache on exit
+        save_spell_cache()
+    if shard is not None:
+        write_shard_status(processed_base, shard[0], shard[1], {"raw": count_raw, "processed": count_processed,
+                           "quarantined": count_quarantined, "rejected": count_rejected,
+                           "duplicates": count_duplicates, "errors": errors, "skipped": messages.skipped},
+                           raw_out_path)
+    print(json.dumps({"level": "info", "msg": "completed_run", "count_raw": count_raw, "count_processed": count_processed, "count_quarantined": count_quarantined, "count_rejected": count_rejected, "count_duplicates": count_duplicates, "quarantine_ms": round(quarantine_ms, 1), "errors": errors, "elapsed_s": round(elapsed, 2), "msgs_per_s": round(count_raw / elapsed, 1) if elapsed > 0 else 0.0, "metrics": METRICS.summary()}))
 
 def gen_dummy(n=50):
     typos = ["teh", "recieve", "diabtes", "hipertension"]
@@ -66,7 +407,6 @@ def gen_dummy(n=50):
         "I am experiencing painful, burning urination and a cloudy white discharge from the urethral opening. What could I be suffering from?",
         "I have itching and a burning sensation on the glans of my penis. What could this be?",
     ]
-    msgs = []
     for i in range(n):
         idx = i
         d = i % 10
@@ -89,8 +429,7 @@ def gen_dummy(n=50):
             "user_role": roles[i % len(roles)],
             "channel": channels[i % len(channels)],
         }
-        msgs.append((msg, meta))
-    return msgs
+        yield msg, meta
 
 def main():
     parser = argparse.ArgumentParser(description="Ingest CLI - produce raw + processed JSONL")
@@ -98,25 +437,95 @@ def main():
     parser.add_argument("--n", type=int, default=50)
     parser.add_argument("--output-raw", type=str, default=str(DEFAULT_RAW))
     parser.add_argument("--processed-dir", type=str, default=str(DEFAULT_PROCESSED))
+    parser.add_argument("--sink", choices=SINKS, default="jsonl", help="processed output: per-session JSONL, day-partitioned Parquet, or both")
+    parser.add_argument("--parquet-dir", type=str, default=str(DEFAULT_PARQUET))
+    parser.add_argument("--parquet-row-group", type=int, default=DEFAULT_ROW_GROUP_SIZE, help="rows per Parquet row group")
+    parser.add_argument("--no-index", action="store_true", help="skip the session/time index kept next to the JSONL store")
+    parser.add_argument("--db", type=str, default=None, help="also load processed records into sqlite:///path.db or a postgresql:// DSN")
+    parser.add_argument("--db-batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help="records per database transaction")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none", help="compress the raw file and the session files (.gz / .zst appended to their names)")
+    parser.add_argument("--compression-level", type=int, default=None, help="gzip 1-9 (default 6) or zstd 1-22 (default 3)")
+    parser.add_argument("--json-backend", choices=("auto",) + JSON_BACKENDS, default=None, help="record serializer (default ETL_JSON_BACKEND or auto: orjson when installed)")
+    parser.add_argument("--shard", type=str, default=None, help="K/N: ingest only the sessions hashing to shard K of N, into shard-private outputs")
     parser.add_argument("--overwrite", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--unordered", action="store_true", help="write batches as workers finish instead of in input order")
+    parser.add_argument("--max-open-files", type=int, default=DEFAULT_MAX_OPEN_FILES)
+    parser.add_argument("--spell-cache", type=str, default=None, help="persist the spell-correction cache to this file")
+    parser.add_argument("--quarantine", type=str, default=str(DEFAULT_QUARANTINE), help="where messages over the redaction budget are written")
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_METRICS_INTERVAL, help="seconds between pipeline_metrics lines (0 disables)")
+    parser.add_argument("--profile", nargs="?", const=str(DEFAULT_PROFILE), default=None, help="run under cProfile and dump stats here (pool workers write <path>.<pid>)")
+    parser.add_argument("--validate", nargs="?", const="auto", default=None, choices=["auto", "pydantic", "jsonschema"], help="validate processed records per batch; invalid ones go to --reject-file")
+    parser.add_argument("--reject-file", type=str, default=str(DEFAULT_REJECTS))
+    parser.add_argument("--redact-budget-ms", type=float, default=None, help="per-message PHI detection budget (0 disables; default REDACT_BUDGET_MS or 500)")
+    parser.add_argument("--redact-cache", type=str, default=None, help="sqlite file sharing redaction results across workers and runs (default REDACT_CACHE_PATH)")
+    parser.add_argument("--input", type=str, default=None, help="read {message, metadata} JSONL from this file instead of stdin")
+    parser.add_argument("--checkpoint", nargs="?", const=str(DEFAULT_CHECKPOINT), default=None, help="record the input offset after each written batch (needs --input)")
+    parser.add_argument("--resume", action="store_true", help="continue --input from the offset in --checkpoint")
+    parser.add_argument("--dedupe", nargs="?", const=str(DEFAULT_DEDUPE), default=None, help="skip message_ids already written by earlier runs (seen-id store path)")
+    parser.add_argument("--dedupe-capacity", type=int, default=DEFAULT_CAPACITY, help="ids the dedupe Bloom filter is sized for")
     args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        args.checkpoint = str(DEFAULT_CHECKPOINT)
     raw_path = Path(args.output_raw)
     processed_base = Path(args.processed_dir)
+    shard = parse_shard(args.shard) if args.shard else None
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else None
+    dedupe_path = Path(args.dedupe) if args.dedupe else None
+    own_raw, own_processed, own_parquet = raw_path, processed_base, Path(args.parquet_dir)
+    own_checkpoint, own_dedupe = checkpoint_path, dedupe_path
+    if shard is not None:
+        # the paths this instance will actually use; run_messages applies the same layout itself
+        own_raw, own_processed, _, _, own_parquet, own_checkpoint, own_dedupe = shard_layout(
+            shard, raw_path, processed_base, Path(args.quarantine), Path(args.reject_file), own_parquet,
+            checkpoint_path, dedupe_path)
+    if args.json_backend:
+        configure_json(args.json_backend)
     if args.overwrite:
-        _safe_remove_path(raw_path)
-        _safe_remove_path(processed_base)
+        # with --shard only this shard's outputs go; the other instances may still be writing theirs
+        _safe_remove_path(own_raw)
+        _safe_remove_path(with_suffix(own_raw, args.compression))
+        _safe_remove_path(own_processed)
+        if args.sink != "jsonl":
+            _safe_remove_path(own_parquet)
+        # state about the removed output would otherwise skip or resume past everything
+        for state in (own_checkpoint, own_dedupe):
+            if state:
+                state = str(state)
+                for p in (Path(state), Path(state + ".bloom"), Path(state + "-wal"), Path(state + "-shm")):
+                    _safe_remove_path(p)
     if args.dummy:
         messages = gen_dummy(args.n)
+    elif args.input:
+        start = 0
+        if args.resume:
+            start = Checkpoint(own_checkpoint, Path(args.input)).resume_offset()
+            print(json.dumps({"level": "info", "msg": "resuming", "input": args.input, "offset": start}))
+        messages = FileMessageReader(Path(args.input), start)
     else:
-        import sys
-        messages = []
-        for line in sys.stdin:
-            try:
-                j = json.loads(line)
-                messages.append((j.get("message"), j.get("metadata", {})))
-            except Exception:
-                continue
-    run_messages(messages, raw_path, processed_base)
+        messages = iter_stdin_messages(sys.stdin)
+    profile_path = Path(args.profile) if args.profile else None
+    profiler = cProfile.Profile() if profile_path else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        run_messages(messages, raw_path, processed_base, batch_size=args.batch_size,
+                     workers=args.workers, ordered=not args.unordered, max_open_files=args.max_open_files,
+                     spell_cache_path=Path(args.spell_cache) if args.spell_cache else None,
+                     quarantine_path=Path(args.quarantine), redact_budget_ms=args.redact_budget_ms,
+                     metrics_interval=args.metrics_interval, profile_path=profile_path,
+                     validate=args.validate, reject_path=Path(args.reject_file), sink=args.sink,
+                     parquet_base=Path(args.parquet_dir), parquet_row_group_size=args.parquet_row_group,
+                     index=not args.no_index,
+                     checkpoint_path=checkpoint_path, dedupe_path=dedupe_path, dedupe_capacity=args.dedupe_capacity,
+                     db_url=args.db, db_batch_rows=args.db_batch_rows,
+                     redact_cache_path=Path(args.redact_cache) if args.redact_cache else None,
+                     compression=args.compression, compression_level=args.compression_level, shard=shard)
+    finally:
+        if profiler is not None:
+            _dump_profile(profiler, profile_path)
+            print(json.dumps({"level": "info", "msg": "profile_written", "path": str(profile_path)}))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,390 @@
+# cli/ingest_server.py
+import argparse
+import asyncio
+import json
+import os
+import signal
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+from cli.ingest_cli import (DEFAULT_MAX_OPEN_FILES, DEFAULT_METRICS_INTERVAL, DEFAULT_PROCESSED, DEFAULT_QUARANTINE,
+                            DEFAULT_RAW, DEFAULT_REJECTS, _init_worker, _process_batch_in_worker, configure_validation,
+                            open_processed_sink, process_batch, write_batch)
+from src.etl.codec import COMPRESSIONS, JSON_BACKENDS, check_compression, configure_json, with_suffix
+from src.etl.ingest import configure_spell_cache, save_spell_cache
+from src.etl.metrics import METRICS, StageStats
+from src.etl.redact import configure_redaction_cache, set_redact_budget
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT_MS = 20.0
+DEFAULT_QUEUE_SIZE = 10_000
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+# Local push endpoint for chat front-ends. Requests are HTTP/1.1 (TCP or a Unix socket), so curl and
+# any HTTP client work without extra dependencies:
+#   POST /ingest   one {"message", "metadata"} object, a JSON list of them, or NDJSON
+#   GET  /metrics  request latency percentiles, queue depth and the pipeline METRICS summary
+#   GET  /healthz
+# Accepted messages wait in one bounded queue; a batcher cuts a micro-batch when it reaches max_batch
+# messages or the oldest message has waited max_wait_ms, and hands it to the executor (a process pool
+# with --workers > 1, else one thread). When the queue cannot take the whole request it is refused
+# with 503 + Retry-After instead of buffering without bound. A POST returns once its messages are
+# written, with a status per message_id.
+#
+# All in-process METRICS and sink access goes through the single writer thread, so the pipeline code
+# never sees concurrent callers.
+
+class Overloaded(Exception):
+    pass
+
+class IngestServer:
+    def __init__(self, raw_out_path: Path = DEFAULT_RAW, processed_base: Path = DEFAULT_PROCESSED,
+                 max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, workers: int = 1, validate: Optional[str] = None,
+                 quarantine_path: Path = DEFAULT_QUARANTINE, reject_path: Path = DEFAULT_REJECTS,
+                 spell_cache_path: Optional[Path] = None, redact_budget_ms: Optional[float] = None,
+                 max_open_files: int = DEFAULT_MAX_OPEN_FILES, sink: str = "jsonl", index: bool = True,
+                 metrics_interval: float = DEFAULT_METRICS_INTERVAL, redact_cache_path: Optional[Path] = None,
+                 compression: str = "none", compression_level: Optional[int] = None) -> None:
+        self.raw_out_path = with_suffix(raw_out_path, check_compression(compression))
+        self.compression = compression
+        self.compression_level = compression_level
+        self.processed_base = processed_base
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.queue_size = max(1, queue_size)
+        self.workers = workers
+        self.quarantine_path = quarantine_path
+        self.reject_path = reject_path
+        self.metrics_interval = metrics_interval
+        self.latency = StageStats()
+        self.batch_sizes = StageStats()
+        self.rejected_requests = 0
+        self.queue: "Optional[asyncio.Queue]" = None
+        self._stop: "Optional[asyncio.Event]" = None
+        self._tasks = set()
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-writer")
+        self._pool = None
+        validator = configure_validation(validate)
+        if workers > 1:
+            worker_config = {
+                "spell_cache_path": str(spell_cache_path) if spell_cache_path else None,
+                "redact_budget_ms": redact_budget_ms,
+                "redact_cache_path": str(redact_cache_path) if redact_cache_path else None,
+                "profile_path": None,
+                "validate": validator.backend if validator is not None else None,
+            }
+            self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(worker_config,))
+        else:
+            if spell_cache_path:
+                configure_spell_cache(spell_cache_path)
+            if redact_budget_ms is not None:
+                set_redact_budget(redact_budget_ms)
+            if redact_cache_path:
+                configure_redaction_cache(redact_cache_path)
+        # a couple of batches per worker in flight keeps the pool busy; beyond that the queue absorbs bursts
+        self._inflight = asyncio.Semaphore(max(1, workers) * 2)
+        self._sink_args = (sink, processed_base, max_open_files)
+        self._index = index
+        self.writer = None
+        METRICS.reset()
+
+    async def submit(self, items: List[Tuple[Any, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        # all-or-nothing admission, so a client never has to work out which half of its request got in
+        if self.queue.qsize() + len(items) > self.queue_size:
+            self.rejected_requests += 1
+            raise Overloaded()
+        loop = asyncio.get_running_loop()
+        now = perf_counter()
+        futures = []
+        for msg, meta in items:
+            # ids are fixed up front so each result can be matched back to its caller
+            meta = dict(meta or {})
+            meta.setdefault("message_id", str(uuid.uuid4()))
+            fut = loop.create_future()
+            self.queue.put_nowait((msg, meta, fut, now))
+            futures.append(fut)
+        return list(await asyncio.gather(*futures))
+
+    async def _batcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._inflight.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            for _ in batch:
+                self.queue.task_done()
+
+    async def _run_batch(self, batch) -> None:
+        loop = asyncio.get_running_loop()
+        items = [(msg, meta) for msg, meta, _, _ in batch]
+        try:
+            if self._pool is not None:
+                result, drained = await loop.run_in_executor(self._pool, _process_batch_in_worker, items)
+                await loop.run_in_executor(self._io, METRICS.merge, drained)
+            else:
+                result = await loop.run_in_executor(self._io, process_batch, items)
+            raw_out, processed_out, _, quarantined, rejected = result
+            await loop.run_in_executor(self._io, write_batch, raw_out, processed_out, self.raw_out_path, self.writer,
+                                       quarantined, self.quarantine_path, rejected, self.reject_path,
+                                       self.compression_level)
+            status = {}
+            for recs, name in ((processed_out, "processed"), (rejected, "rejected"), (quarantined, "quarantined")):
+                for rec in recs:
+                    status[rec.get("message_id")] = name
+            self.batch_sizes.add(0.0, len(batch))
+            now = perf_counter()
+            for _, meta, fut, enqueued in batch:
+                self.latency.add((now - enqueued) * 1000.0)
+                if not fut.done():
+                    fut.set_result({"message_id": meta["message_id"], "status": status.get(meta["message_id"], "error")})
+        except Exception as e:
+            print(json.dumps({"level": "error", "msg": "batch_failed", "error": str(e), "count": len(batch)}))
+            for _, _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        finally:
+            self._inflight.release()
+
+    async def metrics(self) -> Dict[str, Any]:
+        pipeline = await asyncio.get_running_loop().run_in_executor(self._io, METRICS.summary)
+        batches = self.batch_sizes.summary()
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue_size,
+            "inflight_batches": len(self._tasks),
+            "rejected_requests": self.rejected_requests,
+            "request_latency": self.latency.summary(),
+            "batches": batches["calls"],
+            "avg_batch_size": round(batches["items"] / batches["calls"], 1) if batches["calls"] else 0.0,
+            **pipeline,
+        }
+
+    async def _emit_metrics(self) -> None:
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            print(json.dumps({"level": "info", "msg": "server_metrics", **(await self.metrics())}))
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                code, payload, extra = await self._route(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                _write_response(writer, code, payload, extra, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except _HttpError as e:
+            _write_response(writer, e.code, {"error": e.message}, {}, False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _route(self, method: str, path: str, body: bytes):
+        path = path.split("?", 1)[0]
+        if path == "/healthz" and method == "GET":
+            return 200, {"status": "ok"}, {}
+        if path == "/metrics" and method == "GET":
+            return 200, await self.metrics(), {}
+        if path == "/ingest" and method == "POST":
+            try:
+                items = parse_payload(body)
+            except ValueError as e:
+                return 400, {"error": str(e)}, {}
+            try:
+                results = await self.submit(items)
+            except Overloaded:
+                return 503, {"error": "ingest queue full", "queue_size": self.queue_size}, {"Retry-After": "1"}
+            except Exception as e:
+                return 500, {"error": str(e)}, {}
+            return 200, {"results": results}, {}
+        return 404, {"error": "not found"}, {}
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_path: Optional[str] = None) -> None:
+        self.queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self._stop = stop = asyncio.Event()
+        # opened on the writer thread: the store index's sqlite connection is bound to its creating thread
+        self.writer = await loop.run_in_executor(self._io, lambda: open_processed_sink(
+            *self._sink_args, index=self._index, compression=self.compression, compression_level=self.compression_level))
+        if self._pool is not None:
+            # fork the workers (and let them warm up) before listening: a worker forked later would inherit
+            # the open client sockets and keep them from closing when the parent is done with them
+            await loop.run_in_executor(self._pool, os.getpid)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        background = [asyncio.create_task(self._batcher())]
+        if self.metrics_interval > 0:
+            background.append(asyncio.create_task(self._emit_metrics()))
+        print(json.dumps({"level": "info", "msg": "server_listening", "address": unix_path or f"{host}:{port}",
+                          "max_batch": self.max_batch, "max_wait_ms": self.max_wait * 1000.0, "workers": self.workers}))
+        try:
+            await stop.wait()
+        finally:
+            # stop accepting, let queued and in-flight batches finish, then close the sinks
+            server.close()
+            await server.wait_closed()
+            await self.queue.join()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            for task in background:
+                task.cancel()
+            summary = await self.metrics()
+            await loop.run_in_executor(self._io, self.close)
+            print(json.dumps({"level": "info", "msg": "server_stopped", **summary}))
+
+    def stop(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+
+    def close(self) -> None:
+        self.writer.close()
+        if self._pool is not None:
+            self._pool.shutdown()
+        else:
+            save_spell_cache()
+
+class _HttpError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 411: "Length Required", 413: "Payload Too Large",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+
+async def _read_request(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise _HttpError(400, "malformed request line")
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = b""
+    if method == "POST":
+        if "content-length" not in headers:
+            raise _HttpError(411, "Content-Length required")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise _HttpError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise _HttpError(413, f"body over {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length)
+    return method, target, headers, body
+
+def _write_response(writer: asyncio.StreamWriter, code: int, payload: Dict[str, Any], extra: Dict[str, str],
+                    keep_alive: bool) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = [f"HTTP/1.1 {code} {_REASONS.get(code, '')}", "Content-Type: application/json",
+            f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    head.extend(f"{k}: {v}" for k, v in extra.items())
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+def parse_payload(body: bytes) -> List[Tuple[Any, Dict[str, Any]]]:
+    # one object, a JSON list, or NDJSON; same {"message", "metadata"} shape ingest_cli reads on stdin
+    text = body.decode("utf-8").strip()
+    if not text:
+        raise ValueError("empty body")
+    try:
+        data = json.loads(text)
+        docs = data if isinstance(data, list) else [data]
+    except json.JSONDecodeError:
+        try:
+            docs = [json.loads(line) for line in text.splitlines() if line.strip()]
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON: {e}")
+    items = []
+    for doc in docs:
+        if not isinstance(doc, dict) or "message" not in doc:
+            raise ValueError("each payload needs a message field")
+        meta = doc.get("metadata") or {}
+        if not isinstance(meta, dict):
+            raise ValueError("metadata must be an object")
+        items.append((doc["message"], meta))
+    return items
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest server - accept {message, metadata} over HTTP and write raw + processed JSONL")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", type=str, default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--output-raw", type=str, default=str(DEFAULT_RAW))
+    parser.add_argument("--processed-dir", type=str, default=str(DEFAULT_PROCESSED))
+    parser.add_argument("--no-index", action="store_true")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="messages per micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS, help="longest a message waits for its batch to fill")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="queued messages before requests get 503")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--max-open-files", type=int, default=DEFAULT_MAX_OPEN_FILES)
+    parser.add_argument("--spell-cache", type=str, default=None)
+    parser.add_argument("--quarantine", type=str, default=str(DEFAULT_QUARANTINE))
+    parser.add_argument("--validate", nargs="?", const="auto", default=None, choices=["auto", "pydantic", "jsonschema"])
+    parser.add_argument("--reject-file", type=str, default=str(DEFAULT_REJECTS))
+    parser.add_argument("--redact-budget-ms", type=float, default=None)
+    parser.add_argument("--redact-cache", type=str, default=None)
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    parser.add_argument("--compression-level", type=int, default=None)
+    parser.add_argument("--json-backend", choices=("auto",) + JSON_BACKENDS, default=None)
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_METRICS_INTERVAL)
+    args = parser.parse_args()
+    if args.json_backend:
+        configure_json(args.json_backend)
+
+    async def run():
+        server = IngestServer(Path(args.output_raw), Path(args.processed_dir), max_batch=args.max_batch,
+                              max_wait_ms=args.max_wait_ms, queue_size=args.queue_size, workers=args.workers,
+                              validate=args.validate, quarantine_path=Path(args.quarantine),
+                              reject_path=Path(args.reject_file),
+                              spell_cache_path=Path(args.spell_cache) if args.spell_cache else None,
+                              redact_budget_ms=args.redact_budget_ms, max_open_files=args.max_open_files,
+                              index=not args.no_index, metrics_interval=args.metrics_interval,
+                              redact_cache_path=Path(args.redact_cache) if args.redact_cache else None,
+                              compression=args.compression, compression_level=args.compression_level)
+        await server.serve(args.host, args.port, args.unix)
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
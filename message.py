@@ -0,0 +1,124 @@
+# src/etl/message.py
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# The record that travels from ingest_batch() through redaction and transform() to the sinks. It is a
+# __slots__ object instead of two ~16-key dicts per message (the raw one from ingest and the processed
+# copy transform built from it): transform() updates it in place and only remembers the three fields
+# whose raw value differs, so raw and processed views share everything else. Dicts are only built at
+# a sink boundary (to_dict / raw_dict, right before json.dumps, validation or a reject record); for
+# code that reads records it behaves like a read-only mapping, so rec["message_id"] / rec.get(...)
+# work on both this and plain dicts.
+
+# key order of each JSON view, as the dict records had it
+RAW_FIELDS = ("session_id", "message_id", "timestamp", "user_role", "channel", "raw_text", "clean_text",
+              "phi_flags", "phi_spans", "entities", "audit_trail", "intent", "urgency", "confidence", "consent_given",
+              "retention_policy")
+PROCESSED_FIELDS = ("session_id", "message_id", "timestamp", "user_role", "channel", "raw_text", "clean_text",
+                    "language", "phi_flags", "phi_spans", "audit_trail", "intent", "entities", "urgency", "confidence",
+                    "consent_given", "retention_policy")
+_FIELD_SET = frozenset(PROCESSED_FIELDS)
+
+class Message:
+    __slots__ = PROCESSED_FIELDS + ("processed", "raw_phi_flags", "raw_entities", "raw_audit_trail")
+
+    def __init__(self, session_id: str, message_id: str, timestamp: str, user_role: Optional[str] = "user",
+                 channel: Optional[str] = "web", raw_text: str = "", clean_text: str = "",
+                 phi_flags: Optional[List[str]] = None, phi_spans: Optional[List[Dict[str, Any]]] = None,
+                 entities: Optional[List[Dict[str, Any]]] = None,
+                 audit_trail: Optional[List[Dict[str, Any]]] = None, intent: Any = None, urgency: Any = None,
+                 confidence: Any = None, consent_given: bool = False, retention_policy: Optional[str] = "dev-30d",
+                 language: Optional[str] = None) -> None:
+        self.session_id = session_id
+        self.message_id = message_id
+        self.timestamp = timestamp
+        self.user_role = user_role
+        self.channel = channel
+        self.raw_text = raw_text
+        self.clean_text = clean_text
+        self.language = language
+        self.phi_flags = phi_flags if phi_flags is not None else []
+        # None: nothing upstream scanned this record, as opposed to [] for a scan that found nothing
+        self.phi_spans = phi_spans
+        self.audit_trail = audit_trail if audit_trail is not None else []
+        self.intent = intent
+        self.entities = entities if entities is not None else []
+        self.urgency = urgency
+        self.confidence = confidence
+        self.consent_given = consent_given
+        self.retention_policy = retention_policy
+        self.processed = False
+        # raw values transform() replaced; None means the processed value is the raw one
+        self.raw_phi_flags = None
+        self.raw_entities = None
+        self.raw_audit_trail = None
+
+    # read-only mapping view of the current stage (raw until transform() ran)
+    def _fields(self) -> Tuple[str, ...]:
+        return PROCESSED_FIELDS if self.processed else RAW_FIELDS
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELD_SET or (key == "language" and not self.processed):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._fields()
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields())
+
+    def __len__(self) -> int:
+        return len(self._fields())
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(k, getattr(self, k)) for k in self._fields()]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self._fields()}
+
+    def raw_dict(self) -> Dict[str, Any]:
+        out = {k: getattr(self, k) for k in RAW_FIELDS}
+        if self.processed:
+            for key, raw in (("phi_flags", self.raw_phi_flags), ("entities", self.raw_entities),
+                             ("audit_trail", self.raw_audit_trail)):
+                if raw is not None:
+                    out[key] = raw
+        return out
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Message):
+            return self.processed == other.processed and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Message({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # a flat tuple pickles smaller and faster than the default per-slot state for pool results
+        return _rebuild, (tuple(getattr(self, k) for k in Message.__slots__),)
+
+def _rebuild(values: Tuple[Any, ...]) -> Message:
+    msg = Message.__new__(Message)
+    for k, v in zip(Message.__slots__, values):
+        setattr(msg, k, v)
+    return msg
+
+def to_dict(rec: Any) -> Dict[str, Any]:
+    # the sink-side conversion: Messages become their current view, dicts pass through
+    return rec.to_dict() if isinstance(rec, Message) else rec
+
+def raw_dict(rec: Any) -> Dict[str, Any]:
+    return rec.raw_dict() if isinstance(rec, Message) else rec
@@ -0,0 +1,140 @@
+# src/etl/metrics.py
+import random
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_RESERVOIR = 20_000
+
+# Per-stage latency for the pipeline. A stage sample is one call (one message for clean/transform,
+# one nlp.pipe batch for ner, one batch write for the sinks); "items" counts what the call handled,
+# so throughput is items per second of time spent in the stage. Percentiles come from a bounded
+# reservoir so a long run keeps constant memory.
+class StageStats:
+    def __init__(self, reservoir: int = DEFAULT_RESERVOIR) -> None:
+        self.calls = 0
+        self.items = 0
+        self.total_ms = 0.0
+        self.reservoir = reservoir
+        self.samples: List[float] = []
+        self._rng = random.Random(0)
+
+    def add(self, ms: float, items: int = 1) -> None:
+        self.calls += 1
+        self.items += items
+        self.total_ms += ms
+        if len(self.samples) < self.reservoir:
+            self.samples.append(ms)
+        else:
+            j = self._rng.randrange(self.calls)
+            if j < self.reservoir:
+                self.samples[j] = ms
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        def pct(q: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+        return {
+            "calls": self.calls,
+            "items": self.items,
+            "total_ms": round(self.total_ms, 1),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "items_per_s": round(self.items / (self.total_ms / 1000.0), 1) if self.total_ms > 0 else 0.0,
+        }
+
+class Metrics:
+    def __init__(self, reservoir: int = DEFAULT_RESERVOIR) -> None:
+        self.reservoir = reservoir
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, int] = {}
+        self._caches: Dict[str, Any] = {}
+        self._cache_marks: Dict[str, tuple] = {}
+        # raw samples since the last drain(); only kept while a pool worker ships them to the parent
+        self._pending: Optional[Dict[str, List[tuple]]] = None
+
+    def stage(self, name: str) -> StageStats:
+        st = self.stages.get(name)
+        if st is None:
+            st = self.stages[name] = StageStats(self.reservoir)
+        return st
+
+    def add(self, name: str, ms: float, items: int = 1) -> None:
+        self.stage(name).add(ms, items)
+        if self._pending is not None:
+            self._pending.setdefault(name, []).append((ms, items))
+
+    @contextmanager
+    def timer(self, name: str, items: int = 1) -> Iterator[None]:
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (perf_counter() - started) * 1000.0, items)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def register_cache(self, name: str, cache: Any) -> None:
+        # anything with hits/misses counters (SpellCache, the redaction cache...)
+        self._caches[name] = cache
+        self._cache_marks[name] = (cache.hits, cache.misses)
+
+    def track_pending(self) -> None:
+        self._pending = {}
+
+    def drain(self) -> Dict[str, Any]:
+        # samples, counters and cache hit/miss deltas since the previous drain, for merge() in another process
+        out = {"samples": self._pending or {}, "counters": dict(self.counters), "caches": {}}
+        self._pending = {} if self._pending is not None else None
+        self.counters.clear()
+        for name, cache in self._caches.items():
+            hits, misses = self._cache_marks[name]
+            out["caches"][name] = (cache.hits - hits, cache.misses - misses)
+            self._cache_marks[name] = (cache.hits, cache.misses)
+        return out
+
+    def merge(self, drained: Dict[str, Any]) -> None:
+        for name, samples in drained.get("samples", {}).items():
+            st = self.stage(name)
+            for ms, items in samples:
+                st.add(ms, items)
+        for name, n in drained.get("counters", {}).items():
+            self.incr(name, n)
+        for name, (hits, misses) in drained.get("caches", {}).items():
+            self.incr(f"cache.{name}.hits", hits)
+            self.incr(f"cache.{name}.misses", misses)
+
+    def cache_rates(self) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        names = set(self._caches) | {k.split(".")[1] for k in self.counters if k.startswith("cache.")}
+        for name in sorted(names):
+            hits = self.counters.get(f"cache.{name}.hits", 0)
+            misses = self.counters.get(f"cache.{name}.misses", 0)
+            if name in self._caches:
+                h0, m0 = self._cache_marks[name]
+                hits += self._caches[name].hits - h0
+                misses += self._caches[name].misses - m0
+            lookups = hits + misses
+            out[name] = {"hits": hits, "misses": misses, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+        return out
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "stages": {name: st.summary() for name, st in sorted(self.stages.items())},
+            "counters": {k: v for k, v in sorted(self.counters.items()) if not k.startswith("cache.")},
+            "caches": self.cache_rates(),
+        }
+
+    def reset(self) -> None:
+        self.stages.clear()
+        self.counters.clear()
+        for name, cache in self._caches.items():
+            self._cache_marks[name] = (cache.hits, cache.misses)
+        if self._pending is not None:
+            self._pending = {}
+
+METRICS = Metrics()
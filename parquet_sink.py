@@ -0,0 +1,221 @@
+# src/etl/parquet_sink.py
+import json
+import os
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from itertools import count
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .timestamps import TIMESTAMPS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+DEFAULT_ROW_GROUP_SIZE = 65_536
+DEFAULT_MAX_OPEN = 16
+PARTITION_PREFIX = "date="
+
+# Columnar sink for processed messages. Files are day-partitioned as <base>/date=YYYY-MM-DD/part-*.parquet
+# (hive-style, so pyarrow.dataset and most engines pick the partition up as a column). Rows are
+# buffered per day and written one full row group at a time; a part file is only renamed into place
+# once its footer is written, so readers never see a half-written file.
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("the parquet sink needs pyarrow (pip install pyarrow)")
+
+def message_schema():
+    # mirrors the messages table in er_diagram.dbml; phi_flags, entities and audit_trail stay nested
+    _require_pyarrow()
+    entity = pa.struct([("type", pa.string()), ("value", pa.string()), ("confidence", pa.float64())])
+    audit = pa.struct([
+        ("event_id", pa.string()), ("actor", pa.string()), ("action", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")), ("reason", pa.string()), ("details", pa.string()),
+    ])
+    return pa.schema([
+        ("message_id", pa.string()),
+        ("session_id", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("user_role", pa.string()),
+        ("channel", pa.string()),
+        ("raw_text", pa.string()),
+        ("clean_text", pa.string()),
+        ("language", pa.string()),
+        ("phi_flags", pa.list_(pa.string())),
+        ("intent", pa.string()),
+        ("entities", pa.list_(entity)),
+        ("urgency", pa.string()),
+        ("confidence", pa.float64()),
+        ("consent_given", pa.bool_()),
+        ("retention_policy", pa.string()),
+        ("audit_trail", pa.list_(audit)),
+    ])
+
+def _parse_ts(ts: Any) -> datetime:
+    return TIMESTAMPS.parse(ts, "parquet").astimezone(timezone.utc)
+
+def _opt_float(v: Any) -> Optional[float]:
+    return None if v is None else float(v)
+
+def to_row(rec: Dict[str, Any]) -> Dict[str, Any]:
+    entities = rec.get("entities")
+    audit = rec.get("audit_trail") or []
+    return {
+        "message_id": rec["message_id"],
+        "session_id": rec["session_id"],
+        "timestamp": _parse_ts(rec["timestamp"]),
+        "user_role": rec.get("user_role"),
+        "channel": rec.get("channel"),
+        "raw_text": rec.get("raw_text"),
+        "clean_text": rec.get("clean_text"),
+        "language": rec.get("language"),
+        "phi_flags": list(rec.get("phi_flags") or []),
+        "intent": rec.get("intent"),
+        "entities": None if entities is None else [
+            {"type": e.get("type"), "value": None if e.get("value") is None else str(e.get("value")),
+             "confidence": _opt_float(e.get("confidence"))}
+            for e in entities
+        ],
+        "urgency": rec.get("urgency"),
+        "confidence": _opt_float(rec.get("confidence")),
+        "consent_given": rec.get("consent_given"),
+        "retention_policy": rec.get("retention_policy"),
+        "audit_trail": [
+            {"event_id": a.get("event_id"), "actor": a.get("actor"), "action": a.get("action"),
+             "timestamp": _parse_ts(a["timestamp"]) if a.get("timestamp") else None, "reason": a.get("reason"),
+             "details": None if a.get("details") is None else json.dumps(a["details"], ensure_ascii=False)}
+            for a in audit
+        ],
+    }
+
+class ParquetPartitionWriter:
+    def __init__(self, base: Path, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 max_open: int = DEFAULT_MAX_OPEN, compression: str = "zstd") -> None:
+        _require_pyarrow()
+        self.base = Path(base)
+        self.row_group_size = max(1, row_group_size)
+        self.max_open = max(1, max_open)
+        self.compression = compression
+        self.schema = message_schema()
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._writers: "OrderedDict[str, Tuple[Any, Path, Path]]" = OrderedDict()
+        self._run_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self._seq = count()
+
+    def _writer(self, day: str):
+        entry = self._writers.get(day)
+        if entry is not None:
+            self._writers.move_to_end(day)
+            return entry[0]
+        while len(self._writers) >= self.max_open:
+            old_day = next(iter(self._writers))
+            self._flush_day(old_day)
+            self._close_day(old_day)
+        part_dir = self.base / f"{PARTITION_PREFIX}{day}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        final = part_dir / f"part-{self._run_id}-{next(self._seq):05d}.parquet"
+        tmp = final.with_name(final.name + ".tmp")
+        writer = pq.ParquetWriter(str(tmp), self.schema, compression=self.compression)
+        self._writers[day] = (writer, tmp, final)
+        return writer
+
+    def _close_day(self, day: str) -> None:
+        writer, tmp, final = self._writers.pop(day)
+        writer.close()
+        tmp.replace(final)
+
+    def _flush_day(self, day: str) -> None:
+        rows = self._buffers.pop(day, None)
+        if not rows:
+            return
+        table = pa.Table.from_pylist(rows, schema=self.schema)
+        self._writer(day).write_table(table, row_group_size=self.row_group_size)
+
+    def write_records(self, records: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Exception]]:
+        failed = []
+        full = set()
+        for rec in records:
+            try:
+                row = to_row(rec)
+            except Exception as e:
+                failed.append((rec, e))
+                continue
+            day = row["timestamp"].date().isoformat()
+            buf = self._buffers.setdefault(day, [])
+            buf.append(row)
+            if len(buf) >= self.row_group_size:
+                full.add(day)
+        for day in full:
+            rows = self._buffers.get(day, [])
+            try:
+                self._flush_day(day)
+            except Exception as e:
+                failed.extend((row, e) for row in rows)
+        return failed
+
+    def flush(self) -> None:
+        # buffered rows stay in memory until a row group fills up or the sink is closed
+        pass
+
+    def close(self) -> None:
+        for day in list(self._buffers):
+            self._flush_day(day)
+        while self._writers:
+            self._close_day(next(iter(self._writers)))
+
+    def __enter__(self) -> "ParquetPartitionWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+DateLike = Union[str, date, None]
+
+def _as_date(d: DateLike) -> Optional[date]:
+    if d is None or isinstance(d, date):
+        return d
+    return date.fromisoformat(d)
+
+def partition_files(base: Path, start: DateLike = None, end: DateLike = None) -> List[Path]:
+    # pruning happens on directory names only; no file outside [start, end] is opened
+    start, end = _as_date(start), _as_date(end)
+    files = []
+    base = Path(base)
+    if not base.exists():
+        return files
+    for part_dir in sorted(base.iterdir()):
+        if not part_dir.is_dir() or not part_dir.name.startswith(PARTITION_PREFIX):
+            continue
+        try:
+            day = date.fromisoformat(part_dir.name[len(PARTITION_PREFIX):])
+        except ValueError:
+            continue
+        if (start and day < start) or (end and day > end):
+            continue
+        files.extend(sorted(part_dir.glob("*.parquet")))
+    return files
+
+def read_messages(base: Path, start: DateLike = None, end: DateLike = None,
+                  columns: Optional[Sequence[str]] = None, filters=None):
+    # columns projects at read time, so unselected columns are never decoded; filters use row group stats
+    _require_pyarrow()
+    files = partition_files(base, start, end)
+    if not files:
+        schema = message_schema()
+        if columns:
+            schema = pa.schema([schema.field(c) for c in columns])
+        return schema.empty_table()
+    return pq.read_table([str(f) for f in files], columns=list(columns) if columns else None,
+                         filters=filters, schema=message_schema(), partitioning=None)
+
+def iter_message_batches(base: Path, start: DateLike = None, end: DateLike = None,
+                         columns: Optional[Sequence[str]] = None, batch_size: int = DEFAULT_ROW_GROUP_SIZE) -> Iterator[Any]:
+    _require_pyarrow()
+    for f in partition_files(base, start, end):
+        pf = pq.ParquetFile(str(f))
+        yield from pf.iter_batches(batch_size=batch_size, columns=list(columns) if columns else None)
@@ -0,0 +1,133 @@
+# src/etl/phi_scanner.py
+import re
+from bisect import bisect_left
+from time import perf_counter
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+Guard = Callable[[str, int, Dict[str, Any]], bool]
+
+class ScanTimeout(TimeoutError):
+    pass
+
+# Runs a list of (type, pattern) pairs over a text in one combined pass. finditer() yields exactly
+# the matches each pattern's own finditer() would (same spans, same non-overlap rules per type),
+# so callers keep their per-type semantics while the text is only walked once.
+# A guard is a cheap per-position precondition for a type (e.g. "7 digits left on this line");
+# a position where it fails is treated as no match for that type, like a failed lookahead.
+# Guards share a per-call state dict so per-text precomputation happens at most once.
+# A trigger is a cheap, bounded necessary condition used in the combined alternation instead of a
+# pattern whose match can run to the end of a long token; the real pattern is then only tried at
+# positions the trigger accepts and that are not inside that type's previous match.
+class PhiScanner:
+    def __init__(self, patterns: List[Tuple[str, Pattern]], guards: Optional[Dict[str, Guard]] = None,
+                 triggers: Optional[Dict[str, Pattern]] = None) -> None:
+        self.patterns = list(patterns)
+        guards = guards or {}
+        triggers = triggers or {}
+        self._guards = [guards.get(typ) for typ, _ in self.patterns]
+        self._triggers = [triggers.get(typ) for typ, _ in self.patterns]
+        self._group_to_index = {f"p{i}": i for i in range(len(self.patterns))}
+        self._combined = self._compile(range(len(self.patterns)))
+        self._remaining: Dict[FrozenSet[str], "re.Pattern"] = {}
+
+    def _compile(self, indexes: Iterable[int]) -> "re.Pattern":
+        parts = []
+        for i in indexes:
+            patt = self._triggers[i] or self.patterns[i][1]
+            src = patt.pattern
+            if patt.flags & re.IGNORECASE:
+                src = f"(?i:{src})"
+            parts.append(f"(?P<p{i}>{src})")
+        return re.compile("|".join(parts))
+
+    def _remaining_regex(self, found: FrozenSet[str]) -> "re.Pattern":
+        # presence checks drop a type from the alternation once it has been seen
+        regex = self._remaining.get(found)
+        if regex is None:
+            regex = self._compile(i for i, (typ, _) in enumerate(self.patterns) if typ not in found)
+            self._remaining[found] = regex
+        return regex
+
+    def finditer(self, text: str, deadline: Optional[float] = None) -> Iterator[Tuple[str, "re.Match"]]:
+        # deadline is a time.perf_counter() value; it is checked between hits, so a single
+        # pattern attempt must stay cheap (no unbounded backtracking) for it to be honoured
+        patterns = self.patterns
+        n = len(patterns)
+        cursors = [0] * n
+        guards = self._guards
+        state: Dict[str, Any] = {}
+        search = self._combined.search
+        pos = 0
+        while pos <= len(text):
+            if deadline is not None and perf_counter() > deadline:
+                raise ScanTimeout(f"PHI scan exceeded its deadline at offset {pos} of {len(text)}")
+            m = search(text, pos)
+            if m is None:
+                return
+            p = m.start()
+            # alternatives before the one that matched already failed at p
+            first = self._group_to_index[m.lastgroup]
+            for i in range(first, n):
+                if cursors[i] > p:
+                    continue
+                if guards[i] is not None and not guards[i](text, p, state):
+                    continue
+                # the combined match spans the same text as the winning alternative's own match
+                mt = m if i == first and self._triggers[i] is None else patterns[i][1].match(text, p)
+                if mt is None:
+                    continue
+                cursors[i] = mt.end() if mt.end() > p else p + 1
+                yield patterns[i][0], mt
+            pos = p + 1
+
+    def types_present(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        patterns = self.patterns
+        n = len(patterns)
+        guards = self._guards
+        state: Dict[str, Any] = {}
+        regex = self._combined
+        pos = 0
+        while pos <= len(text):
+            m = regex.search(text, pos)
+            if m is None:
+                break
+            p = m.start()
+            first = self._group_to_index[m.lastgroup]
+            for i in range(first, n):
+                typ, patt = patterns[i]
+                if typ in found:
+                    continue
+                if guards[i] is not None and not guards[i](text, p, state):
+                    continue
+                if (i == first and self._triggers[i] is None) or patt.match(text, p):
+                    found.add(typ)
+            if all(typ in found for typ, _ in patterns):
+                break
+            regex = self._remaining_regex(frozenset(found))
+            pos = p + 1
+        return found
+
+_NEWLINE_RE = re.compile(r"\n")
+
+def _positions(text: str, patt: Pattern, state: Dict[str, Any]) -> List[int]:
+    key = ("positions", patt.pattern, patt.flags)
+    found = state.get(key)
+    if found is None:
+        found = [m.start() for m in patt.finditer(text)]
+        state[key] = found
+    return found
+
+def rest_of_line_guard(*requirements: Tuple[Pattern, int]) -> Guard:
+    # linear replacement for leading (?=(?:.*X){n}) lookaheads: at least n matches of X between the
+    # position and the end of its line, answered by bisecting position lists built once per text
+    def guard(text: str, pos: int, state: Dict[str, Any]) -> bool:
+        newlines = _positions(text, _NEWLINE_RE, state)
+        i = bisect_left(newlines, pos)
+        eol = newlines[i] if i < len(newlines) else len(text)
+        for patt, count in requirements:
+            hits = _positions(text, patt, state)
+            if bisect_left(hits, eol) - bisect_left(hits, pos) < count:
+                return False
+        return True
+    return guard
@@ -1,58 +1,74 @@
 # src/etl/redact.py
 from __future__ import annotations
+import hashlib
 import re
-from typing import Tuple, List, Dict
 from pathlib import Path
+from time import perf_counter
+from typing import Any, Tuple, List, Dict, Optional, Sequence, Union
 import os
+from .phi_scanner import PhiScanner, ScanTimeout, rest_of_line_guard
+from .metrics import METRICS
+from .redact_cache import DEFAULT_SHARED_ROWS, RedactionCache
+from .resources import medical_whitelist, stopwords
 
-WORDLIST_PATH = Path("data/resources/wordlist.txt")
-STOPWORDS_PATH = Path("data/resources/stopwords.txt")
-
-def _load_wordset(p: Path) -> set:
-    s = set()
-    if not p.exists():
-        return s
-    try:
-        with p.open(encoding="utf-8") as fh:
-            for line in fh:
-                t = line.strip()
-                if not t or t.startswith("#"):
-                    continue
-                s.add(t.lower())
-    except Exception:
-        return set()
-    return s
-
-MEDICAL_WHITELIST = _load_wordset(WORDLIST_PATH)
-STOPWORDS = _load_wordset(STOPWORDS_PATH)
-
-NER_ENABLED = False
+NER_ENABLED: Optional[bool] = None
 _spacy_nlp = None
 _spacy_model = os.getenv("SPACY_MODEL", "en_core_web_sm")
-try:
-    import spacy
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "64"))
+
+def _trim_pipeline(nlp) -> List[str]:
+    # only doc.ents is used: keep "ner" and any shared tok2vec/transformer it listens to
+    keep = ["ner"]
+    for name, pipe in nlp.pipeline:
+        if "ner" in (getattr(pipe, "listening_components", None) or []):
+            keep.append(name)
+    disable = [name for name in nlp.pipe_names if name not in keep]
+    if disable:
+        nlp.select_pipes(disable=disable)
+    return nlp.pipe_names
+
+def _get_nlp():
+    # spaCy (and the model download fallback) is only touched on the first NER call, so importing
+    # this module or running regex-only redaction stays cheap
+    global NER_ENABLED, _spacy_nlp
+    if NER_ENABLED is not None:
+        return _spacy_nlp
+    NER_ENABLED = False
     try:
-        _spacy_nlp = spacy.load(_spacy_model)
-        NER_ENABLED = True
-    except Exception:
+        import spacy
         try:
-            spacy.cli.download(_spacy_model)
             _spacy_nlp = spacy.load(_spacy_model)
-            NER_ENABLED = True
         except Exception:
-            NER_ENABLED = False
-except Exception:
-    NER_ENABLED = False
+            spacy.cli.download(_spacy_model)
+            _spacy_nlp = spacy.load(_spacy_model)
+        NER_ENABLED = True
+    except Exception:
+        _spacy_nlp = None
+        return None
+    try:
+        _trim_pipeline(_spacy_nlp)
+    except Exception:
+        pass
+    return _spacy_nlp
 
-EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+# EMAIL only starts at the beginning of a local-part run, so a run without "@" is scanned once instead
+# of once per character; addresses glued on with "_" / "+" (which used to be a second, adjacent match
+# that the span merge joined) are absorbed by the trailing repetition instead
+EMAIL_RE = re.compile(r"(?<![a-zA-Z0-9_.+-])[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+(?:[_+][a-zA-Z0-9_.+-]*@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+)*")
 SSN_RE = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
-PHONE_RE = re.compile(r"\b(?=(?:.*\d){7,})[+\d\-\.\s()]{7,20}\b")
+# PHONE and ID used to start with lookaheads that rescan the rest of the line from every position
+# ("7+ digits left", "a digit and a letter left"); those are now scanner guards, see _SCANNER
+PHONE_RE = re.compile(r"\b[+\d\-\.\s()]{7,20}\b")
 IP_V4_RE = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
 MRN_RE = re.compile(r"\b(?:MRN|mrn|MedicalRecord|medicalrecord|MRN[-\s]?)\d+\b", re.IGNORECASE)
-GENERIC_ID_RE = re.compile(r"(?<![@.])\b(?=.*\d)(?=.*[A-Za-z])[A-Za-z0-9\-]{6,}\b(?!@)", re.IGNORECASE)
+GENERIC_ID_RE = re.compile(r"(?<![@.])\b[A-Za-z0-9\-]{6,}\b(?!@)", re.IGNORECASE)
 URL_RE = re.compile(r"https?:\/\/[^\s]+", re.IGNORECASE)
 DATE_RE = re.compile(r"\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}[\/.\-]\d{1,2}[\/.\-]\d{2,4}|\d{1,2}\s(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec))\b", re.IGNORECASE)
 
+_NON_WORD_RE = re.compile(r"\W")
+_DIGIT_RE = re.compile(r"\d")
+_ALPHA_RE = re.compile(r"[A-Za-z]")
+
 _PATTERNS = [
     ("EMAIL", EMAIL_RE),
     ("SSN", SSN_RE),
@@ -64,6 +80,34 @@ _PATTERNS = [
     ("DATE", DATE_RE),
 ]
 
+# ID and URL can match to the end of a long token; inside the combined alternation they are replaced by
+# bounded triggers so positions within an earlier match are not rescanned to the token's end
+_SCANNER = PhiScanner(_PATTERNS, guards={
+    "PHONE": rest_of_line_guard((_DIGIT_RE, 7)),
+    "ID": rest_of_line_guard((_DIGIT_RE, 1), (_ALPHA_RE, 1)),
+}, triggers={
+    "ID": re.compile(r"(?<![@.])\b(?=[A-Za-z0-9\-]{6})", re.IGNORECASE),
+    "URL": re.compile(r"https?:\/\/", re.IGNORECASE),
+})
+
+_CONTEXT_CHARS = 40
+_DURATION_RE = re.compile(r"^\d+\s*(day|days|week|weeks|month|months|year|years)\b")
+_RELATIVE_DATES = ("yesterday", "today", "tomorrow", "last week", "next month")
+_SCHEDULING_CTX_RE = re.compile(r"\b(appointment|schedule|book|booking|visit|meeting|checkup|follow[- ]?up)\b")
+_CLINICAL_CTX_RE = re.compile(r"\b(birth|dob|born|admit|admitted|discharge|hospital|surgery|diagnos)\b")
+
+REDACT_BUDGET_MS = float(os.getenv("REDACT_BUDGET_MS", "500"))
+
+class RedactionTimeout(TimeoutError):
+    def __init__(self, elapsed_ms: float, text_len: int) -> None:
+        super().__init__(f"PHI detection took {elapsed_ms:.0f}ms for {text_len} chars")
+        self.elapsed_ms = elapsed_ms
+        self.text_len = text_len
+
+def set_redact_budget(budget_ms: Optional[float]) -> None:
+    global REDACT_BUDGET_MS
+    REDACT_BUDGET_MS = float(budget_ms or 0)
+
 _PLACEHOLDER = {
     "EMAIL": "[REDACTED_EMAIL]",
     "PHONE": "[REDACTED_PHONE]",
@@ -99,46 +143,48 @@ def _should_skip_phi_tag(typ: str, match_text: str, context_text: str = "") -> b
     if typ == "DATE":
         ctx = (context_text or "").lower()
         lower = match_text.lower().strip()
-        if re.match(r"^\d+\s*(day|days|week|weeks|month|months|year|years)\b", lower):
+        if _DURATION_RE.match(lower):
             return True
-        if lower in ("yesterday", "today", "tomorrow", "last week", "next month"):
+        if lower in _RELATIVE_DATES:
             return True
-        if re.search(r"\b(appointment|schedule|book|booking|visit|meeting|checkup|follow[- ]?up)\b", ctx):
+        if _SCHEDULING_CTX_RE.search(ctx):
             return True
-        if re.search(r"\b(birth|dob|born|admit|admitted|discharge|hospital|surgery|diagnos)\b", ctx):
+        if _CLINICAL_CTX_RE.search(ctx):
             return False
         return False
-    if lower in MEDICAL_WHITELIST or lower in STOPWORDS:
+    if lower in medical_whitelist() or lower in stopwords():
         return True
     if typ in ("ID", "MEDICAL_RECORD"):
-        core = re.sub(r"\W", "", match_text)
-        if re.search(r"\d", match_text) and re.search(r"[A-Za-z]", match_text) and len(core) >= 6:
+        core = _NON_WORD_RE.sub("", match_text)
+        if _DIGIT_RE.search(match_text) and _ALPHA_RE.search(match_text) and len(core) >= 6:
             return False
         return True
     return False
 
-def _detect_regex_spans(text: str) -> List[Dict]:
+def _detect_regex_spans(text: str, deadline: Optional[float] = None) -> List[Dict]:
     spans = []
-    for typ, patt in _PATTERNS:
-        for m in patt.finditer(text):
-            match_text = m.group(0)
-            if typ == "PHONE":
-                digits = re.sub(r"\D", "", match_text)
-                if len(digits) < 7:
-                    continue
-            start = max(0, m.start() - 40)
-            end = min(len(text), m.end() + 40)
-            context_window = text[start:end]
-            if _should_skip_phi_tag(typ, match_text, context_text=context_window):
+    for typ, m in _SCANNER.finditer(text, deadline):
+        match_text = m.group(0)
+        if typ == "PHONE":
+            if sum(ch.isdecimal() for ch in match_text) < 7:
                 continue
-            spans.append({"type": typ, "start": m.start(), "end": m.end(), "match": match_text})
+        # only DATE looks at the surrounding context, so skip the slice for everything else
+        context_window = ""
+        if typ == "DATE":
+            context_window = text[max(0, m.start() - _CONTEXT_CHARS):m.end() + _CONTEXT_CHARS]
+        if _should_skip_phi_tag(typ, match_text, context_text=context_window):
+            continue
+        spans.append({"type": typ, "start": m.start(), "end": m.end(), "match": match_text, "source": "regex"})
     spans.sort(key=lambda s: (s["start"], -(s["end"] - s["start"])))
     return _merge_overlapping_spans(spans)
 
 def _detect_ner_spans(text: str) -> List[Dict]:
-    if not NER_ENABLED or not _spacy_nlp:
+    nlp = _get_nlp()
+    if nlp is None:
         return []
-    doc = _spacy_nlp(text)
+    return _ner_spans_from_doc(text, nlp(text))
+
+def _ner_spans_from_doc(text: str, doc) -> List[Dict]:
     spans = []
     for ent in doc.ents:
         label = ent.label_
@@ -155,7 +201,7 @@ def _detect_ner_spans(text: str) -> List[Dict]:
             continue
         match_text = ent.text
         lower = match_text.lower().strip(" .,:;\"'()[]{}")
-        if lower in MEDICAL_WHITELIST or lower in STOPWORDS:
+        if lower in medical_whitelist() or lower in stopwords():
             continue
         if typ == "DATE":
             lower = match_text.lower().strip()
@@ -171,7 +217,7 @@ def _detect_ner_spans(text: str) -> List[Dict]:
         context_window = text[start:end]
         if _should_skip_phi_tag(typ, match_text, context_text=context_window):
             continue
-        spans.append({"type": typ, "start": ent.start_char, "end": ent.end_char, "match": match_text})
+        spans.append({"type": typ, "start": ent.start_char, "end": ent.end_char, "match": match_text, "source": "ner"})
     spans.sort(key=lambda s: (s["start"], -(s["end"] - s["start"])))
     return _merge_overlapping_spans(spans)
 
@@ -186,6 +232,8 @@ def _merge_overlapping_spans(spans: List[Dict]) -> List[Dict]:
         last = merged[-1]
         if s["start"] <= last["end"]:
             last["end"] = max(last["end"], s["end"])
+            if s.get("source") != last.get("source"):
+                last["source"] = "regex+ner"
             a = last.get("type")
             b = s.get("type")
             if isinstance(a, list):
@@ -214,23 +262,167 @@ def _merge_overlapping_spans(spans: List[Dict]) -> List[Dict]:
             merged.append(s.copy())
     return merged
 
-def detect_phi_spans(text: str) -> List[Dict]:
+def detect_phi_spans(text: str, budget_ms: Optional[float] = None) -> List[Dict]:
     if not text:
         return []
-    regex_spans = _detect_regex_spans(text)
-    ner_spans = _detect_ner_spans(text)
+    budget_ms = REDACT_BUDGET_MS if budget_ms is None else budget_ms
+    started = perf_counter()
+    deadline = started + budget_ms / 1000.0 if budget_ms > 0 else None
+    try:
+        with METRICS.timer("redact_regex"):
+            regex_spans = _detect_regex_spans(text, deadline)
+    except ScanTimeout:
+        raise RedactionTimeout((perf_counter() - started) * 1000.0, len(text)) from None
+    if deadline is not None and perf_counter() > deadline:
+        raise RedactionTimeout((perf_counter() - started) * 1000.0, len(text))
+    with METRICS.timer("ner"):
+        ner_spans = _detect_ner_spans(text)
+    # NER cannot be interrupted; a message that blew the budget inside it is still quarantined
+    if deadline is not None and perf_counter() > deadline:
+        raise RedactionTimeout((perf_counter() - started) * 1000.0, len(text))
     all_spans = sorted(regex_spans + ner_spans, key=lambda s: (s["start"], -(s["end"] - s["start"])))
     return _merge_overlapping_spans(all_spans)
 
-def redact_text(text: str) -> Tuple[List[str], str]:
+def detect_phi_spans_batch(texts: Sequence[str], budget_ms: Optional[float] = None,
+                           batch_size: Optional[int] = None) -> List[Union[List[Dict], RedactionTimeout]]:
+    # same spans as detect_phi_spans per text, but NER runs once over the whole batch through nlp.pipe;
+    # a text that runs over budget gets its RedactionTimeout in its slot instead of failing the batch
+    budget_ms = REDACT_BUDGET_MS if budget_ms is None else budget_ms
+    results: List[Union[List[Dict], RedactionTimeout]] = [[] for _ in texts]
+    regex_ms: List[float] = [0.0] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        started = perf_counter()
+        deadline = started + budget_ms / 1000.0 if budget_ms > 0 else None
+        try:
+            results[i] = _detect_regex_spans(text, deadline)
+        except ScanTimeout:
+            results[i] = RedactionTimeout((perf_counter() - started) * 1000.0, len(text))
+            METRICS.add("redact_regex", results[i].elapsed_ms)
+            continue
+        regex_ms[i] = (perf_counter() - started) * 1000.0
+        METRICS.add("redact_regex", regex_ms[i])
+        if deadline is not None and regex_ms[i] > budget_ms:
+            results[i] = RedactionTimeout(regex_ms[i], len(text))
+            continue
+        pending.append(i)
+    nlp = _get_nlp() if pending else None
+    if nlp is not None:
+        size = batch_size or NER_BATCH_SIZE
+        started = last = perf_counter()
+        docs = nlp.pipe((texts[i] for i in pending), batch_size=size)
+        # spaCy runs the model over a whole minibatch of `size` texts before it yields the first doc, so
+        # one doc's time is not observable; each text is charged its minibatch's time by its share of
+        # the characters, so a long text pays for itself instead of the one that happens to come first
+        for start in range(0, len(pending), size):
+            chunk = pending[start:start + size]
+            for i, doc in zip(chunk, docs):
+                results[i] = results[i] + _ner_spans_from_doc(texts[i], doc)
+            now = perf_counter()
+            chunk_ms = (now - last) * 1000.0
+            last = now
+            if budget_ms > 0:
+                chars = sum(len(texts[i]) for i in chunk)
+                for i in chunk:
+                    ner_ms = chunk_ms * len(texts[i]) / chars
+                    if regex_ms[i] + ner_ms > budget_ms:
+                        results[i] = RedactionTimeout(regex_ms[i] + ner_ms, len(texts[i]))
+        METRICS.add("ner", (last - started) * 1000.0, len(pending))
+    for i in pending:
+        if not isinstance(results[i], RedactionTimeout):
+            spans = sorted(results[i], key=lambda s: (s["start"], -(s["end"] - s["start"])))
+            results[i] = _merge_overlapping_spans(spans)
+    return results
+
+# bump when a change to the code (not the patterns, lists or model, which are hashed) alters redaction output
+REDACT_LOGIC_VERSION = 2
+
+def redaction_fingerprint() -> bytes:
+    # everything a cached (flags, redacted text, spans) depends on; see redact_cache.py
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"logic={REDACT_LOGIC_VERSION}\n".encode())
+    for typ, pattern in _PATTERNS:
+        h.update(f"{typ}\0{pattern.pattern}\0{pattern.flags}\n".encode())
+    # the scanner's alternation carries the triggers; guards are code and covered by the logic version
+    h.update(_SCANNER._combined.pattern.encode())
+    h.update(repr(sorted(_PLACEHOLDER.items())).encode())
+    h.update(repr(_TYPE_PRIORITY).encode())
+    h.update("\0".join(sorted(medical_whitelist())).encode())
+    h.update(b"\1")
+    h.update("\0".join(sorted(stopwords())).encode())
+    nlp = _get_nlp()
+    if nlp is None:
+        h.update(b"ner=off")
+    else:
+        import spacy
+        meta = getattr(nlp, "meta", {}) or {}
+        h.update(f"ner={meta.get('lang')}_{meta.get('name')}@{meta.get('version')};spacy={spacy.__version__};"
+                 f"pipes={','.join(nlp.pipe_names)}".encode())
+    return h.digest()
+
+REDACT_CACHE = RedactionCache(int(os.getenv("REDACT_CACHE_SIZE", "50000")), fingerprint=redaction_fingerprint)
+METRICS.register_cache("redact", REDACT_CACHE)
+
+def configure_redaction_cache(path: Optional[Path], max_rows: int = DEFAULT_SHARED_ROWS) -> None:
+    # an sqlite file shared by every process (pool workers, the server, later runs) that is pointed at it
+    REDACT_CACHE.attach(Path(path) if path else None, max_rows)
+
+configure_redaction_cache(os.getenv("REDACT_CACHE_PATH"))
+
+Redaction = Tuple[List[str], str, List[Dict[str, Any]]]
+
+def redact_text(text: str, budget_ms: Optional[float] = None) -> Tuple[List[str], str]:
     if not text:
         return [], ""
-    spans = detect_phi_spans(text)
+    result = redact_text_batch([text], budget_ms)[0]
+    if isinstance(result, RedactionTimeout):
+        raise result
+    return result[0], result[1]
+
+def redact_text_batch(texts: Sequence[str], budget_ms: Optional[float] = None,
+                      batch_size: Optional[int] = None) -> List[Union[Redaction, RedactionTimeout]]:
+    # (flags, redacted text, spans) per text, the spans being what _apply_spans replaced
+    # cache hits skip detection entirely; the distinct misses of the batch go through one detection
+    # pass and are cached unless they ran over budget (a timeout depends on the budget, not the text)
+    out: List[Union[Redaction, RedactionTimeout, None]] = [None] * len(texts)
+    todo: Dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        if text:
+            todo.setdefault(text, []).append(i)
+        else:
+            out[i] = ([], "", [])
+    cache = REDACT_CACHE if REDACT_CACHE.enabled and todo else None
+    keys: Dict[str, bytes] = {}
+    if cache is not None:
+        keys = {text: cache.key(text) for text in todo}
+        for text, cached in zip(list(todo), cache.get_many(list(keys.values()))):
+            if cached is not None:
+                for i in todo.pop(text):
+                    out[i] = (list(cached[0]), cached[1], cached[2])
+    misses = list(todo)
+    fresh = []
+    for text, result in zip(misses, detect_phi_spans_batch(misses, budget_ms, batch_size) if misses else []):
+        if not isinstance(result, RedactionTimeout):
+            result = _apply_spans(text, result)
+            if cache is not None:
+                fresh.append((keys[text], result))
+        for i in todo[text]:
+            # callers get their own flags list; the span list is shared and must be treated as read-only
+            out[i] = result if isinstance(result, RedactionTimeout) else (list(result[0]), result[1], result[2])
+    if fresh:
+        cache.put_many(fresh)
+    return out
+
+def _apply_spans(text: str, spans: List[Dict]) -> Redaction:
     if not spans:
-        return [], text
+        return [], text, []
     out_parts = []
     last = 0
     flags = set()
+    # what was redacted and by which detector, as offsets into the input; the matched text is not kept
+    applied = []
     for s in spans:
         out_parts.append(text[last:s["start"]])
         typ_field = s["type"]
@@ -245,15 +437,18 @@ def redact_text(text: str) -> Tuple[List[str], str]:
             out_parts.append(" ")
         if chosen:
             flags.add(chosen)
+        applied.append({"type": chosen, "start": s["start"], "end": s["end"], "source": s.get("source", "regex")})
         last = s["end"]
     out_parts.append(text[last:])
     out_text = "".join(out_parts)
     out_text = re.sub(r"\s+", " ", out_text).strip()
-    return sorted(flags), out_text
+    return sorted(flags), out_text, applied
 
 def redact_entities(entities: List[Dict]):
     if not entities:
         return [], []
+    values = [str(e.get("value")) for e in entities if e.get("value")]
+    redacted_values = iter(redact_text_batch(values))
     added = set()
     out = []
     for e in entities:
@@ -261,9 +456,21 @@ def redact_entities(entities: List[Dict]):
         if not v:
             out.append(e)
             continue
-        flags, redacted = redact_text(str(v))
+        result = next(redacted_values)
+        if isinstance(result, RedactionTimeout):
+            raise result
+        flags, redacted, _ = result
         if flags:
             added.update(flags)
             e = {**e, "value": redacted}
         out.append(e)
     return out, sorted(added)
+
+_UNSAFE_TOKEN_RE = re.compile(r"[\d@]|://|^[A-Z]")
+
+def fallback_redact(text: str) -> str:
+    # single linear pass used for quarantined messages: masks every token that has a digit, an "@",
+    # a URL scheme or a capital letter up front, which over-redacts but never needs the PHI patterns
+    if not text:
+        return ""
+    return " ".join("[REDACTED]" if _UNSAFE_TOKEN_RE.search(tok) else tok for tok in text.split())
@@ -0,0 +1,191 @@
+# src/etl/redact_cache.py
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_MAXSIZE = 50_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SHARED_ROWS = 1_000_000
+
+Result = Tuple[List[str], str, List[Dict[str, Any]]]
+
+# Content-addressed cache of redaction results: a 16-byte keyed blake2b of the text maps to its
+# (flags, redacted text, spans). The hash key is the fingerprint of everything that decides the result
+# (patterns, skip word lists, placeholders, NER model), so entries made under other patterns or
+# another model can never be served; changing any of them simply starts a fresh key space.
+# The in-process layer is an LRU bounded by entries and by redacted-text bytes. An optional sqlite
+# file behind it (WAL, FIFO-trimmed to max_rows) is shared by every process that points at it, so pool
+# workers and later runs reuse each other's work; rows from another fingerprint are dropped on open.
+
+def _size(value: Result) -> int:
+    # the redacted text plus a rough per-span charge, enough to keep max_bytes meaningful
+    return len(value[1]) + 64 * len(value[2])
+
+class _SharedStore:
+    def __init__(self, path: Path, fingerprint: bytes, max_rows: int) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max(1, max_rows)
+        self._inserted = 0
+        self._conn = sqlite3.connect(str(self.path), timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        with self._conn:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+            if row is None or bytes(row[0]) != fingerprint:
+                # recreated rather than emptied, so a table from older code gets the current columns
+                self._conn.execute("DROP TABLE IF EXISTS redactions")
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+            self._conn.execute("CREATE TABLE IF NOT EXISTS redactions (id INTEGER PRIMARY KEY, key BLOB NOT NULL UNIQUE, "
+                               "flags TEXT NOT NULL, redacted TEXT NOT NULL, spans TEXT NOT NULL)")
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, Result]:
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            for key, flags, redacted, spans in self._conn.execute(
+                    f"SELECT key, flags, redacted, spans FROM redactions WHERE key IN ({','.join('?' * len(chunk))})", chunk):
+                found[bytes(key)] = (flags.split(",") if flags else [], redacted, json.loads(spans))
+        return found
+
+    def put_many(self, items: Sequence[Tuple[bytes, Result]]) -> None:
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO redactions (key, flags, redacted, spans) VALUES (?, ?, ?, ?)",
+                                   [(k, ",".join(flags), redacted, json.dumps(spans, separators=(",", ":")))
+                                    for k, (flags, redacted, spans) in items])
+            self._inserted += len(items)
+            # trim oldest-first every so often instead of counting rows on each insert
+            if self._inserted >= max(1000, self.max_rows // 100):
+                self._inserted = 0
+                self._conn.execute("DELETE FROM redactions WHERE id <= (SELECT max(id) FROM redactions) - ?", (self.max_rows,))
+
+    def close(self) -> None:
+        self._conn.close()
+
+class RedactionCache:
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, fingerprint: Optional[Callable[[], bytes]] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.maxsize = max(0, maxsize)
+        self.max_bytes = max_bytes
+        # computed on first use: it may need the NER model, which is loaded lazily
+        self._fingerprint_fn = fingerprint or (lambda: b"")
+        self._fingerprint: Optional[bytes] = None
+        self._data: "OrderedDict[bytes, Result]" = OrderedDict()
+        self._bytes = 0
+        self._shared: Optional[_SharedStore] = None
+        self._shared_config: Optional[Tuple[Path, int]] = None
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 or self._shared_config is not None
+
+    @property
+    def fingerprint(self) -> bytes:
+        if self._fingerprint is None:
+            self._fingerprint = self._fingerprint_fn()
+        return self._fingerprint
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16, key=self.fingerprint).digest()
+
+    def attach(self, path: Optional[Path], max_rows: int = DEFAULT_SHARED_ROWS) -> None:
+        # the sqlite layer is opened lazily too, so configuring it does not compute the fingerprint
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+        self._shared_config = (Path(path), max_rows) if path else None
+
+    def _store(self) -> Optional[_SharedStore]:
+        if self._shared is None and self._shared_config is not None:
+            path, max_rows = self._shared_config
+            self._shared = _SharedStore(path, self.fingerprint, max_rows)
+        return self._shared
+
+    def invalidate(self) -> None:
+        # for a pattern/model change inside a running process; the next lookup re-fingerprints
+        self._data.clear()
+        self._bytes = 0
+        self._fingerprint = None
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[Result]]:
+        out: List[Optional[Result]] = []
+        missing = []
+        for i, k in enumerate(keys):
+            value = self._data.get(k)
+            if value is None:
+                missing.append(i)
+            else:
+                self._data.move_to_end(k)
+            out.append(value)
+        store = self._store() if missing else None
+        if store is not None:
+            try:
+                found = store.get_many([keys[i] for i in missing])
+            except sqlite3.Error as e:
+                found = {}
+                print(json.dumps({"level": "warning", "msg": "redact_cache_shared_error", "error": str(e)}))
+            for i in missing:
+                value = found.get(keys[i])
+                if value is not None:
+                    out[i] = value
+                    self.shared_hits += 1
+                    self._remember(keys[i], value)
+        misses = sum(1 for v in out if v is None)
+        self.misses += misses
+        self.hits += len(out) - misses
+        return out
+
+    def put_many(self, items: Sequence[Tuple[bytes, Result]]) -> None:
+        for k, value in items:
+            self._remember(k, value)
+        store = self._store() if items else None
+        if store is not None:
+            try:
+                store.put_many(items)
+            except sqlite3.Error as e:
+                print(json.dumps({"level": "warning", "msg": "redact_cache_shared_error", "error": str(e)}))
+
+    def _remember(self, k: bytes, value: Result) -> None:
+        if self.maxsize == 0:
+            return
+        old = self._data.pop(k, None)
+        if old is not None:
+            self._bytes -= _size(old)
+        self._data[k] = value
+        self._bytes += _size(value)
+        while len(self._data) > self.maxsize or self._bytes > self.max_bytes:
+            _, dropped = self._data.popitem(last=False)
+            self._bytes -= _size(dropped)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
@@ -0,0 +1,128 @@
+# src/etl/replay.py
+import mmap
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .checkpoint import checked_offset, input_state, read_state, write_state
+from .codec import compression_of, iter_members, loads
+
+DEFAULT_RANGE_BYTES = 4 << 20
+# raw fields that were the message's metadata at ingest time
+META_FIELDS = ("session_id", "message_id", "timestamp", "user_role", "channel", "entities", "intent", "urgency",
+               "confidence", "consent_given", "retention_policy")
+
+# Reprocessing history from the raw store, e.g. after a redaction rule change. Each raw file is
+# memory-mapped and cut at newline boundaries into byte ranges of about DEFAULT_RANGE_BYTES; a worker
+# gets (path, start, end) and maps the file itself, so the data never goes through a pipe, only the
+# processed records come back. raw_text is the message as it was sent, so it is redacted again from
+# scratch; entity values were stored redacted and keep their placeholders and recorded spans.
+# Compressed raw files cannot be cut without decompressing them, so each is a single range.
+# Ranges end at the last newline: a torn tail left by a crashed writer is not replayed or skipped over.
+
+Range = Tuple[str, int, int]
+
+def _mapped(fh) -> Optional[mmap.mmap]:
+    # mmap refuses empty files
+    size = os.fstat(fh.fileno()).st_size
+    return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+def split_ranges(path: Path, range_bytes: int = DEFAULT_RANGE_BYTES, start: int = 0) -> List[Range]:
+    path = Path(path)
+    if compression_of(path) != "none":
+        # one range from the resume offset, which is always a member boundary
+        size = path.stat().st_size
+        return [(str(path), start, size)] if size > start else []
+    range_bytes = max(1, int(range_bytes))
+    ranges = []
+    with path.open("rb") as fh:
+        mm = _mapped(fh)
+        if mm is None:
+            return []
+        with mm:
+            end = mm.rfind(b"\n") + 1
+            pos = start
+            while pos < end:
+                cut = min(pos + range_bytes, end)
+                if cut < end:
+                    # extend to the end of the line the cut falls in
+                    cut = mm.find(b"\n", cut - 1, end) + 1
+                ranges.append((str(path), pos, cut))
+                pos = cut
+    return ranges
+
+def range_lines(path: Path, start: int, end: int) -> Iterator[bytes]:
+    path = Path(path)
+    compression = compression_of(path)
+    with path.open("rb") as fh:
+        if compression != "none":
+            fh.seek(start)
+            for _, _, data in iter_members(fh, compression, end):
+                yield from data.splitlines(keepends=True)
+            return
+        mm = _mapped(fh)
+        if mm is None:
+            return
+        with mm:
+            pos = start
+            while pos < end:
+                nl = mm.find(b"\n", pos, end)
+                if nl < 0:
+                    return
+                yield mm[pos:nl + 1]
+                pos = nl + 1
+
+def raw_item(rec: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    # a raw record back into the (message, metadata) it was ingested from, plus the spans recorded for
+    # its (already redacted) entity values, which ingest keeps instead of rescanning the placeholders
+    meta = {k: rec[k] for k in META_FIELDS if rec.get(k) is not None}
+    entity_spans = [s for s in rec.get("phi_spans") or () if str(s.get("field", "")).startswith("entities.")]
+    if entity_spans:
+        meta["entity_spans"] = entity_spans
+    return rec.get("raw_text") or "", meta
+
+def range_items(path: Path, start: int, end: int) -> Tuple[List[Tuple[str, Dict[str, Any]]], int]:
+    # (items, unreadable lines)
+    items, bad = [], 0
+    for line in range_lines(path, start, end):
+        try:
+            items.append(raw_item(loads(line)))
+        except Exception:
+            bad += 1
+    return items, bad
+
+class ReplayCheckpoint:
+    # a Checkpoint per raw file, kept in one state file keyed by path. The redaction fingerprint is
+    # kept too: a resume under other rules would mix two rule sets in one output
+    def __init__(self, path: Path, fingerprint: str = "") -> None:
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.state = read_state(self.path)
+        self.stale = self.state.get("fingerprint") != fingerprint and bool(self.state.get("files"))
+        if self.state.get("fingerprint") != fingerprint:
+            self.state = {}
+        self.state.setdefault("files", {})
+        self.state["fingerprint"] = fingerprint
+
+    def resume_offset(self, input_path: Path) -> int:
+        input_path = Path(input_path).resolve()
+        return checked_offset(self.state["files"].get(str(input_path), {}), input_path)
+
+    def update(self, input_path: Path, offset: int, **counts: Any) -> None:
+        input_path = Path(input_path).resolve()
+        self.state["files"][str(input_path)] = input_state(input_path, offset)
+        self.state.update(counts, updated_at=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+        write_state(self.path, self.state)
+
+def plan(paths: Sequence[Path], range_bytes: int = DEFAULT_RANGE_BYTES,
+         checkpoint: Optional[ReplayCheckpoint] = None) -> Tuple[List[Range], int, int]:
+    # (ranges still to do, bytes already done, total bytes), files in the order given
+    ranges, done, total = [], 0, 0
+    for path in paths:
+        start = checkpoint.resume_offset(path) if checkpoint is not None else 0
+        todo = split_ranges(path, range_bytes, start)
+        ranges.extend(todo)
+        done += start
+        total += start + sum(end - begin for _, begin, end in todo)
+    return ranges, done, total
@@ -0,0 +1,175 @@
+# cli/replay_cli.py
+import argparse
+import json
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from cli.ingest_cli import (DEFAULT_BATCH_SIZE, DEFAULT_MAX_OPEN_FILES, DEFAULT_METRICS_INTERVAL, DEFAULT_PARQUET,
+                            DEFAULT_RAW, SINKS, _iter_pool_results, _safe_remove_path, configure_validation,
+                            iter_batches, open_processed_sink, process_batch, write_batch)
+from src.etl.codec import COMPRESSIONS, JSON_BACKENDS, check_compression, configure_json
+from src.etl.ingest import configure_spell_cache, save_spell_cache
+from src.etl.metrics import METRICS
+from src.etl.redact import configure_redaction_cache, redaction_fingerprint, set_redact_budget
+from src.etl.replay import DEFAULT_RANGE_BYTES, Range, ReplayCheckpoint, plan, range_items
+from src.etl.parquet_sink import DEFAULT_ROW_GROUP_SIZE
+
+DEFAULT_REPLAY_PROCESSED = Path("data/processed_replay")
+DEFAULT_REPLAY_QUARANTINE = Path("data/quarantine/replay_quarantine.jsonl")
+DEFAULT_REPLAY_REJECTS = Path("data/rejects/replay_rejects.jsonl")
+DEFAULT_REPLAY_CHECKPOINT = Path("data/state/replay_checkpoint.json")
+
+RangeResult = Tuple[str, int, int, List[Dict[str, Any]], int, List[Dict[str, Any]], List[Dict[str, Any]]]
+
+def replay_range(task: Tuple[str, int, int, int]) -> RangeResult:
+    # runs where the range is read: in a pool worker, which maps the raw file itself
+    path, start, end, batch_size = task
+    items, unreadable = range_items(Path(path), start, end)
+    if unreadable:
+        METRICS.incr("replay_unreadable", unreadable)
+    processed, quarantined, rejected, errors = [], [], [], 0
+    for batch in iter_batches(items, batch_size):
+        # the raw records already exist, only the processed view is kept
+        _, batch_processed, batch_errors, batch_quarantined, batch_rejected = process_batch(batch)
+        processed.extend(batch_processed)
+        quarantined.extend(batch_quarantined)
+        rejected.extend(batch_rejected)
+        errors += batch_errors
+    return path, start, end, processed, errors, quarantined, rejected
+
+def _replay_range_in_worker(task):
+    return replay_range(task), METRICS.drain()
+
+def iter_range_results(ranges: Iterable[Range], batch_size: int, workers: int = 1,
+                       worker_config: Optional[Dict[str, Any]] = None) -> Iterator[RangeResult]:
+    # always in range order, so a checkpoint offset never runs ahead of a range still in flight
+    tasks = ((path, start, end, batch_size) for path, start, end in ranges)
+    if workers <= 1:
+        for task in tasks:
+            yield replay_range(task)
+        return
+    for result, drained in _iter_pool_results(tasks, workers, True, worker_config or {}, _replay_range_in_worker):
+        METRICS.merge(drained)
+        yield result
+
+def run_replay(raw_paths: Sequence[Path], processed_base: Path = DEFAULT_REPLAY_PROCESSED, workers: int = 1,
+               batch_size: int = DEFAULT_BATCH_SIZE, range_bytes: int = DEFAULT_RANGE_BYTES,
+               quarantine_path: Path = DEFAULT_REPLAY_QUARANTINE, reject_path: Path = DEFAULT_REPLAY_REJECTS,
+               validate: Optional[str] = None, redact_budget_ms: Optional[float] = None,
+               redact_cache_path: Optional[Path] = None, spell_cache_path: Optional[Path] = None,
+               metrics_interval: float = DEFAULT_METRICS_INTERVAL, checkpoint_path: Optional[Path] = None,
+               resume: bool = False, sink: str = "jsonl", parquet_base: Path = DEFAULT_PARQUET,
+               parquet_row_group_size: int = DEFAULT_ROW_GROUP_SIZE, index: bool = True,
+               max_open_files: int = DEFAULT_MAX_OPEN_FILES, compression: str = "none",
+               compression_level: Optional[int] = None) -> Dict[str, Any]:
+    if checkpoint_path and sink != "jsonl":
+        raise ValueError("checkpointing is only supported with the jsonl sink")
+    check_compression(compression)
+    if spell_cache_path and workers <= 1:
+        configure_spell_cache(spell_cache_path)
+    if redact_budget_ms is not None and workers <= 1:
+        set_redact_budget(redact_budget_ms)
+    if redact_cache_path and workers <= 1:
+        configure_redaction_cache(redact_cache_path)
+    validator = configure_validation(validate)
+    checkpoint = None
+    if checkpoint_path:
+        checkpoint = ReplayCheckpoint(checkpoint_path, redaction_fingerprint().hex())
+        if not resume:
+            checkpoint.state["files"] = {}
+        elif checkpoint.stale:
+            print(json.dumps({"level": "warning", "msg": "replay_rules_changed", "checkpoint": str(checkpoint_path),
+                              "detail": "redaction rules differ from the checkpointed run, replaying from the start"}))
+    ranges, bytes_done, bytes_total = plan([Path(p) for p in raw_paths], range_bytes, checkpoint if resume else None)
+    bytes_resumed = bytes_done
+    print(json.dumps({"level": "info", "msg": "replay_started", "files": [str(p) for p in raw_paths],
+                      "ranges": len(ranges), "bytes_total": bytes_total, "bytes_resumed": bytes_resumed}))
+    worker_config = {
+        "spell_cache_path": str(spell_cache_path) if spell_cache_path else None,
+        "redact_budget_ms": redact_budget_ms,
+        "redact_cache_path": str(redact_cache_path) if redact_cache_path else None,
+        "validate": validator.backend if validator is not None else None,
+    }
+    counts = {"count_processed": 0, "count_quarantined": 0, "count_rejected": 0, "errors": 0}
+    METRICS.reset()
+    started = last_emit = perf_counter()
+
+    def progress(msg: str) -> Dict[str, Any]:
+        elapsed = perf_counter() - started
+        return {"level": "info", "msg": msg, "bytes_done": bytes_done, "bytes_total": bytes_total,
+                "pct": round(100.0 * bytes_done / bytes_total, 1) if bytes_total else 100.0,
+                "mb_per_s": round((bytes_done - bytes_resumed) / elapsed / 1e6, 2) if elapsed > 0 else 0.0,
+                "elapsed_s": round(elapsed, 2), **counts}
+
+    with open_processed_sink(sink, processed_base, max_open_files, parquet_base, parquet_row_group_size, index,
+                             compression=compression, compression_level=compression_level) as writer:
+        for path, start, end, processed, errors, quarantined, rejected in iter_range_results(ranges, batch_size, workers, worker_config):
+            errors += write_batch([], processed, None, writer, quarantined, quarantine_path, rejected, reject_path)
+            counts["count_processed"] += len(processed)
+            counts["count_quarantined"] += len(quarantined)
+            counts["count_rejected"] += len(rejected)
+            counts["errors"] += errors
+            bytes_done += end - start
+            # the range is on disk; a crash from here on resumes after it
+            if checkpoint is not None:
+                checkpoint.update(Path(path), end, bytes_done=bytes_done, bytes_total=bytes_total)
+            now = perf_counter()
+            if metrics_interval > 0 and now - last_emit >= metrics_interval:
+                last_emit = now
+                print(json.dumps(progress("replay_progress")))
+    if workers <= 1:
+        save_spell_cache()
+    summary = progress("completed_replay")
+    print(json.dumps({**summary, "metrics": METRICS.summary()}))
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the raw JSONL store through redaction and transform")
+    parser.add_argument("raw", nargs="*", default=[str(DEFAULT_RAW)], help="raw files to replay, in order (default the ingest raw file)")
+    parser.add_argument("--processed-dir", type=str, default=str(DEFAULT_REPLAY_PROCESSED))
+    parser.add_argument("--sink", choices=SINKS, default="jsonl")
+    parser.add_argument("--parquet-dir", type=str, default=str(DEFAULT_PARQUET))
+    parser.add_argument("--parquet-row-group", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument("--no-index", action="store_true")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none", help="compress the replayed session files")
+    parser.add_argument("--compression-level", type=int, default=None)
+    parser.add_argument("--json-backend", choices=("auto",) + JSON_BACKENDS, default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--range-mb", type=float, default=DEFAULT_RANGE_BYTES / (1 << 20), help="bytes of raw file per worker task")
+    parser.add_argument("--max-open-files", type=int, default=DEFAULT_MAX_OPEN_FILES)
+    parser.add_argument("--quarantine", type=str, default=str(DEFAULT_REPLAY_QUARANTINE))
+    parser.add_argument("--reject-file", type=str, default=str(DEFAULT_REPLAY_REJECTS))
+    parser.add_argument("--validate", nargs="?", const="auto", default=None, choices=["auto", "pydantic", "jsonschema"])
+    parser.add_argument("--redact-budget-ms", type=float, default=None)
+    parser.add_argument("--redact-cache", type=str, default=None)
+    parser.add_argument("--spell-cache", type=str, default=None)
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_METRICS_INTERVAL, help="seconds between replay_progress lines (0 disables)")
+    parser.add_argument("--checkpoint", nargs="?", const=str(DEFAULT_REPLAY_CHECKPOINT), default=None, help="record the replayed byte offset of each raw file after each range")
+    parser.add_argument("--resume", action="store_true", help="skip what --checkpoint says was already replayed")
+    parser.add_argument("--overwrite", action="store_true", help="start over: remove the replay output and checkpoint")
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        args.checkpoint = str(DEFAULT_REPLAY_CHECKPOINT)
+    processed_base = Path(args.processed_dir)
+    if args.json_backend:
+        configure_json(args.json_backend)
+    if args.overwrite:
+        _safe_remove_path(processed_base)
+        if args.sink != "jsonl":
+            _safe_remove_path(Path(args.parquet_dir))
+        if args.checkpoint:
+            _safe_remove_path(Path(args.checkpoint))
+    run_replay([Path(p) for p in args.raw], processed_base, workers=args.workers, batch_size=args.batch_size,
+               range_bytes=int(args.range_mb * (1 << 20)), quarantine_path=Path(args.quarantine),
+               reject_path=Path(args.reject_file), validate=args.validate, redact_budget_ms=args.redact_budget_ms,
+               redact_cache_path=Path(args.redact_cache) if args.redact_cache else None,
+               spell_cache_path=Path(args.spell_cache) if args.spell_cache else None,
+               metrics_interval=args.metrics_interval,
+               checkpoint_path=Path(args.checkpoint) if args.checkpoint else None, resume=args.resume, sink=args.sink,
+               parquet_base=Path(args.parquet_dir), parquet_row_group_size=args.parquet_row_group,
+               index=not args.no_index, max_open_files=args.max_open_files, compression=args.compression,
+               compression_level=args.compression_level)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# src/etl/resources.py
+import argparse
+import hashlib
+import json
+import os
+import struct
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional, Tuple
+
+RESOURCE_DIR = Path("data/resources")
+WORDLIST_PATH = RESOURCE_DIR / "wordlist.txt"
+STOPWORDS_PATH = RESOURCE_DIR / "stopwords.txt"
+SNAPSHOT_PATH = Path(os.getenv("WORDSET_SNAPSHOT_PATH", str(RESOURCE_DIR / "wordsets.snap")))
+MAGIC = b"WORDSETS1"
+
+# Snapshot layout: MAGIC, u32 header length, JSON header {name: {sha256, offset, length}}, then one
+# newline-joined, already lowercased word blob per set. An entry is only used while the sha256 of
+# its source text file still matches, so editing wordlist.txt without rebuilding falls back to parsing.
+
+def _sha256(path: Path) -> Optional[str]:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+def parse_wordset(path: Path) -> FrozenSet[str]:
+    s = set()
+    if not path.exists():
+        return frozenset()
+    try:
+        with path.open(encoding="utf-8") as fh:
+            for line in fh:
+                t = line.strip()
+                if not t or t.startswith("#"):
+                    continue
+                s.add(t.lower())
+    except Exception:
+        return frozenset()
+    return frozenset(s)
+
+def _read_snapshot_entry(path: Path, name: str) -> Optional[Tuple[str, bytes]]:
+    with path.open("rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"not a wordset snapshot: {path}")
+        (header_len,) = struct.unpack("<I", fh.read(4))
+        header = json.loads(fh.read(header_len))
+        meta = header.get(name)
+        if meta is None:
+            return None
+        fh.seek(len(MAGIC) + 4 + header_len + meta["offset"])
+        return meta["sha256"], fh.read(meta["length"])
+
+def load_wordset(name: str, source: Path, snapshot: Path = SNAPSHOT_PATH) -> FrozenSet[str]:
+    if snapshot.exists():
+        try:
+            entry = _read_snapshot_entry(snapshot, name)
+        except Exception:
+            entry = None
+        if entry is not None:
+            sha, blob = entry
+            # a shipped snapshot without its text source is still usable
+            if not source.exists() or _sha256(source) == sha:
+                return frozenset(blob.decode("utf-8").split("\n")) if blob else frozenset()
+    return parse_wordset(source)
+
+def build_snapshot(sources: Dict[str, Path], out: Path = SNAPSHOT_PATH) -> Dict[str, int]:
+    header = {}
+    blobs = []
+    offset = 0
+    counts = {}
+    for name, source in sources.items():
+        words = parse_wordset(source)
+        blob = "\n".join(sorted(words)).encode("utf-8")
+        header[name] = {"sha256": _sha256(source), "offset": offset, "length": len(blob)}
+        blobs.append(blob)
+        offset += len(blob)
+        counts[name] = len(words)
+    raw_header = json.dumps(header).encode("utf-8")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    with tmp.open("wb") as fh:
+        fh.write(MAGIC)
+        fh.write(struct.pack("<I", len(raw_header)))
+        fh.write(raw_header)
+        for blob in blobs:
+            fh.write(blob)
+    tmp.replace(out)
+    return counts
+
+# one shared, immutable copy per process for redact, ingest and the spell engines
+@lru_cache(maxsize=None)
+def medical_whitelist() -> FrozenSet[str]:
+    return load_wordset("wordlist", WORDLIST_PATH)
+
+@lru_cache(maxsize=None)
+def stopwords() -> FrozenSet[str]:
+    return load_wordset("stopwords", STOPWORDS_PATH)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the binary wordlist/stopwords snapshot")
+    parser.add_argument("--out", type=str, default=str(SNAPSHOT_PATH))
+    parser.add_argument("--wordlist", type=str, default=str(WORDLIST_PATH))
+    parser.add_argument("--stopwords", type=str, default=str(STOPWORDS_PATH))
+    args = parser.parse_args()
+    counts = build_snapshot({"wordlist": Path(args.wordlist), "stopwords": Path(args.stopwords)}, Path(args.out))
+    print(json.dumps({"level": "info", "msg": "wordset_snapshot_built", "path": args.out, "counts": counts}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# src/etl/sharding.py
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .store_index import INDEX_FILENAME, StoreIndex
+from .utils import to_iso_utc
+
+SHARDS_MANIFEST = "_shards.json"
+SHARD_STATUS = "_shard.json"
+HASH_SPEC = "blake2b-64(session_id) mod shards"
+_SHARD_DIR_RE = re.compile(r"^shard-(\d+)-of-(\d+)$")
+
+# Multi-node ingestion against one input stream. Every instance reads the whole stream and keeps the
+# messages whose session_id hashes to its shard (--shard K/N), so the N instances own disjoint sessions.
+# Each writes its own store under <processed>/shard-KK-of-NN/ (with its own index and compaction
+# manifests) and its own raw, quarantine, reject, checkpoint and dedupe files; nothing is appended to by
+# two instances. merge_shards() then writes <processed>/_shards.json, the global view: which shards
+# exist and finished, and per day partition the record count and time bounds across all of them.
+# Messages without a session_id are routed by their text; ingest gives them a fresh session of their own.
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    # "K/N", 0-based: 0/4 .. 3/4
+    try:
+        k, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must look like K/N, got {spec!r}") from None
+    if n < 1 or not 0 <= k < n:
+        raise ValueError(f"shard {k} out of range for {n} shards")
+    return k, n
+
+def shard_of(key: str, shards: int) -> int:
+    # stable across processes and machines, unlike hash()
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big") % shards
+
+def routing_key(message: Any, metadata: Dict[str, Any]) -> str:
+    session_id = (metadata or {}).get("session_id")
+    return str(session_id) if session_id else "text:" + str(message or "")
+
+def shard_dir_name(shard: int, shards: int) -> str:
+    return f"shard-{shard:02d}-of-{shards:02d}"
+
+def shard_path(path: Path, shard: int, shards: int) -> Path:
+    # data/raw/all_messages.jsonl -> data/raw/all_messages.shard-00-of-04.jsonl
+    path = Path(path)
+    return path.with_name(f"{path.stem}.{shard_dir_name(shard, shards)}{path.suffix}")
+
+def shard_layout(shard: Tuple[int, int], raw_out_path: Path, processed_base: Path, quarantine_path: Path,
+                 reject_path: Path, parquet_base: Path, checkpoint_path: Optional[Path] = None,
+                 dedupe_path: Optional[Path] = None) -> Tuple[Path, Path, Path, Path, Path, Optional[Path], Optional[Path]]:
+    # the same paths, made private to one shard: a directory per shard for stores, a name infix for files
+    k, n = shard
+    own = lambda p: shard_path(p, k, n) if p else p
+    return (own(raw_out_path), Path(processed_base) / shard_dir_name(k, n), own(quarantine_path), own(reject_path),
+            Path(parquet_base) / shard_dir_name(k, n), own(checkpoint_path), own(dedupe_path))
+
+class ShardFilter:
+    # passes on this shard's messages; .offset is the wrapped reader's, so checkpoints work per shard
+    def __init__(self, messages: Iterable, shard: int, shards: int) -> None:
+        self.messages = messages
+        self.shard = shard
+        self.shards = shards
+        self.routed = 0
+        self.skipped = 0
+
+    @property
+    def offset(self) -> Optional[int]:
+        return getattr(self.messages, "offset", None)
+
+    def __iter__(self) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        for message, metadata in self.messages:
+            if shard_of(routing_key(message, metadata), self.shards) == self.shard:
+                self.routed += 1
+                yield message, metadata
+            else:
+                self.skipped += 1
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def write_shard_status(shard_base: Path, shard: int, shards: int, counts: Dict[str, int], raw_out_path: Path) -> None:
+    # written by an instance when its run completes; counts add up over resumed/repeated runs
+    path = Path(shard_base) / SHARD_STATUS
+    try:
+        status = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        status = {"runs": 0, "counts": {}}
+    status.update(shard=shard, shards=shards, raw=str(raw_out_path), finished_at=_now(), runs=status["runs"] + 1)
+    for key, n in counts.items():
+        status["counts"][key] = status["counts"].get(key, 0) + n
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write_json(path, status)
+
+def _shard_dirs(base: Path) -> Dict[int, Tuple[int, Path]]:
+    found = {}
+    for d in sorted(Path(base).iterdir()) if Path(base).is_dir() else []:
+        m = _SHARD_DIR_RE.match(d.name)
+        if m and d.is_dir():
+            found[int(m.group(1))] = (int(m.group(2)), d)
+    return found
+
+def merge_shards(base: Path) -> Dict[str, Any]:
+    dirs = _shard_dirs(base)
+    counts = {n for n, _ in dirs.values()}
+    if len(counts) > 1:
+        raise ValueError(f"{base} mixes shard counts {sorted(counts)}; merge them separately")
+    shards = counts.pop() if counts else 0
+    members = []
+    partitions: Dict[str, Dict[str, Any]] = {}
+    for k in range(shards):
+        if k not in dirs:
+            continue
+        d = dirs[k][1]
+        try:
+            status = json.loads((d / SHARD_STATUS).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            status = None
+        member = {"shard": k, "dir": d.name, "finished": status is not None, "records": None}
+        if status is not None:
+            member.update(raw=status.get("raw"), runs=status.get("runs"), finished_at=status.get("finished_at"),
+                          counts=status.get("counts", {}))
+            member["records"] = status.get("counts", {}).get("processed")
+        if (d / INDEX_FILENAME).exists():
+            with StoreIndex(d) as index:
+                parts = index.partitions()
+            # the index counts what is actually in the store, across every run
+            member["records"] = sum(p["records"] for p in parts)
+            for p in parts:
+                g = partitions.setdefault(p["partition"], {"partition": p["partition"], "min_ts": p["min_ts"],
+                                                           "max_ts": p["max_ts"], "records": 0, "shards": []})
+                g["min_ts"] = min(g["min_ts"], p["min_ts"])
+                g["max_ts"] = max(g["max_ts"], p["max_ts"])
+                g["records"] += p["records"]
+                g["shards"].append(k)
+        members.append(member)
+    missing = [k for k in range(shards) if k not in dirs]
+    manifest = {
+        "version": 1,
+        "hash": HASH_SPEC,
+        "shards": shards,
+        "complete": bool(shards) and not missing and all(m["finished"] for m in members),
+        "missing": missing,
+        "members": members,
+        "partitions": [partitions[p] for p in sorted(partitions)],
+        "records": sum(m["records"] or 0 for m in members),
+        "merged_at": _now(),
+    }
+    _write_json(Path(base) / SHARDS_MANIFEST, manifest)
+    return manifest
+
+def load_shards_manifest(base: Path) -> Dict[str, Any]:
+    return json.loads((Path(base) / SHARDS_MANIFEST).read_text(encoding="utf-8"))
+
+class ShardedStore:
+    # read side of a sharded store: sessions go to their shard's index, everything else fans out
+    def __init__(self, base: Path) -> None:
+        self.base = Path(base)
+        self.shards = load_shards_manifest(self.base)["shards"]
+        self._indexes: Dict[int, StoreIndex] = {}
+        for k, (_, d) in _shard_dirs(self.base).items():
+            if (d / INDEX_FILENAME).exists():
+                self._indexes[k] = StoreIndex(d)
+
+    def get_session(self, session_id: str) -> List[Dict[str, Any]]:
+        home = self._indexes.get(shard_of(session_id, self.shards))
+        records = home.get_session(session_id) if home is not None else []
+        if records:
+            return records
+        # sessions ingest made up for messages without one were routed by text, so look everywhere
+        for index in self._indexes.values():
+            if index is not home:
+                records = index.get_session(session_id)
+                if records:
+                    return records
+        return []
+
+    def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        for index in self._indexes.values():
+            rec = index.get_message(message_id)
+            if rec is not None:
+                return rec
+        return None
+
+    def get_time_range(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        # each shard yields in timestamp order; merge them into one ordered stream
+        streams = [index.get_time_range(start, end) for _, index in sorted(self._indexes.items())]
+        return heapq.merge(*streams, key=lambda rec: to_iso_utc(rec.get("timestamp")))
+
+    def close(self) -> None:
+        for index in self._indexes.values():
+            index.close()
+        self._indexes = {}
+
+    def __enter__(self) -> "ShardedStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Merge or query a store written by --shard K/N instances")
+    parser.add_argument("--base", type=str, default="data/processed")
+    parser.add_argument("--merge", action="store_true", help="write <base>/_shards.json from the shard directories")
+    parser.add_argument("--session", type=str, default=None)
+    parser.add_argument("--message", type=str, default=None)
+    parser.add_argument("--start", type=str, default=None)
+    parser.add_argument("--end", type=str, default=None)
+    args = parser.parse_args()
+    base = Path(args.base)
+    if args.merge:
+        manifest = merge_shards(base)
+        level = "info" if manifest["complete"] else "warning"
+        print(json.dumps({"level": level, "msg": "shards_merged", "path": str(base / SHARDS_MANIFEST),
+                          "shards": manifest["shards"], "complete": manifest["complete"], "missing": manifest["missing"],
+                          "records": manifest["records"]}))
+        return
+    with ShardedStore(base) as store:
+        if args.message:
+            rec = store.get_message(args.message)
+            records = [rec] if rec else []
+        elif args.session:
+            records = store.get_session(args.session)
+        else:
+            records = store.get_time_range(args.start, args.end)
+        for rec in records:
+            print(json.dumps(rec, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# src/etl/spell_cache.py
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict
+
+_MISSING = object()
+
+class SpellCache:
+    def __init__(self, maxsize: int = 100_000, namespace: str = "") -> None:
+        self.maxsize = max(0, maxsize)
+        self.namespace = namespace
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, token: str, default: Any = None) -> Any:
+        value = self._data.get(token, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._data.move_to_end(token)
+        return value
+
+    def put(self, token: str, correction: str) -> None:
+        if self.maxsize == 0:
+            return
+        self._data[token] = correction
+        self._data.move_to_end(token)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def load(self, path: Path) -> int:
+        if not path.exists():
+            return 0
+        try:
+            with path.open(encoding="utf-8") as fh:
+                payload = json.load(fh)
+        except Exception:
+            return 0
+        if payload.get("namespace", "") != self.namespace:
+            return 0
+        loaded = 0
+        for token, correction in payload.get("entries", []):
+            self.put(token, correction)
+            loaded += 1
+        return loaded
+
+    def save(self, path: Path) -> None:
+        # entries are written oldest-first so a reload restores the LRU order
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp.open("w", encoding="utf-8") as fh:
+            json.dump({"namespace": self.namespace, "entries": list(self._data.items())}, fh, ensure_ascii=False)
+        os.replace(tmp, path)
@@ -0,0 +1,256 @@
+# src/etl/store_index.py
+import argparse
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .codec import compression_of, decompress, iter_members, loads
+from .utils import to_iso_utc
+
+INDEX_FILENAME = "_index.sqlite"
+
+# On-disk index over the JSONL processed store. PartitionWriter reports (record, byte offset, length)
+# for every line it appends, and each batch lands in one transaction after the data has been flushed,
+# so the index never points past what is on disk. Paths are stored relative to the store base.
+# In a compressed file (.jsonl.gz / .jsonl.zst) offset and length are those of the gzip member / zstd
+# frame holding the record and line is its position in the decompressed member; plain files use 0.
+# Timestamps are normalised to YYYY-MM-DDTHH:MM:SSZ, which sorts correctly as text.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    message_id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    line INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS messages_session_ts ON messages (session_id, ts);
+CREATE INDEX IF NOT EXISTS messages_ts ON messages (ts);
+CREATE INDEX IF NOT EXISTS messages_path ON messages (path, offset);
+CREATE TABLE IF NOT EXISTS partitions (
+    partition TEXT PRIMARY KEY,
+    min_ts TEXT NOT NULL,
+    max_ts TEXT NOT NULL,
+    records INTEGER NOT NULL
+);
+"""
+
+Location = Tuple[str, int, int, int]
+_DATA_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst")
+
+class StoreIndex:
+    def __init__(self, base: Path, path: Optional[Path] = None) -> None:
+        self.base = Path(base)
+        self.path = Path(path) if path else self.base / INDEX_FILENAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        if "line" not in {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}:
+            # index files from before compressed stores
+            self._conn.execute("ALTER TABLE messages ADD COLUMN line INTEGER NOT NULL DEFAULT 0")
+
+    def _rel(self, file_path: Path) -> str:
+        try:
+            return Path(file_path).relative_to(self.base).as_posix()
+        except ValueError:
+            return Path(file_path).as_posix()
+
+    @staticmethod
+    def _partition(rel: str) -> str:
+        # the day partition is the file's directory (YYYY/MM/DD)
+        return rel.rsplit("/", 1)[0] if "/" in rel else ""
+
+    def add(self, entries: Iterable[Tuple[Path, Dict[str, Any], int, int, int]]) -> int:
+        rows = []
+        bounds: Dict[str, List] = {}
+        part_of: Dict[str, str] = {}
+        for file_path, rec, offset, length, line in entries:
+            ts = to_iso_utc(rec.get("timestamp"))
+            rel = self._rel(file_path)
+            rows.append((rec["message_id"], rec["session_id"], ts, rel, offset, length, line))
+            part = part_of[rec["message_id"]] = self._partition(rel)
+            b = bounds.get(part)
+            if b is None:
+                bounds[part] = [ts, ts, 0]
+            else:
+                b[0] = min(b[0], ts)
+                b[1] = max(b[1], ts)
+        if not rows:
+            return 0
+        with self._conn:
+            # rows replace any earlier row for their id (a re-index, or a rerun without --overwrite), so
+            # only ids new to a partition add to its count, and one that moved leaves its old partition
+            ids = list(part_of)
+            old: Dict[str, str] = {}
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                old.update(self._conn.execute(
+                    f"SELECT message_id, path FROM messages WHERE message_id IN ({','.join('?' * len(chunk))})", chunk))
+            left: Dict[str, int] = {}
+            for message_id, part in part_of.items():
+                prev = self._partition(old[message_id]) if message_id in old else None
+                if prev != part:
+                    bounds[part][2] += 1
+                    if prev is not None:
+                        left[prev] = left.get(prev, 0) + 1
+            self._conn.executemany("INSERT OR REPLACE INTO messages (message_id, session_id, ts, path, offset, length, line) "
+                                   "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.executemany(
+                "INSERT INTO partitions VALUES (?, ?, ?, ?) ON CONFLICT(partition) DO UPDATE SET "
+                "min_ts = min(min_ts, excluded.min_ts), max_ts = max(max_ts, excluded.max_ts), "
+                "records = records + excluded.records",
+                [(part, lo, hi, n) for part, (lo, hi, n) in bounds.items()],
+            )
+            self._conn.executemany("UPDATE partitions SET records = records - ? WHERE partition = ?",
+                                   [(n, part) for part, n in left.items()])
+        return len(rows)
+
+    def relocate(self, moves: Iterable[Tuple[Path, int, int, Path, int]]) -> int:
+        # (old file, start, end, new file, delta): lines at [start, end) of the old file now live at
+        # offset + delta in the new one. Used by compaction; rows already moved no longer match, so
+        # replaying a move is harmless
+        rows = [(self._rel(new), delta, self._rel(old), start, end) for old, start, end, new, delta in moves]
+        with self._conn:
+            cur = self._conn.executemany(
+                "UPDATE messages SET path = ?, offset = offset + ? WHERE path = ? AND offset >= ? AND offset < ?", rows)
+        return cur.rowcount
+
+    def message(self, message_id: str) -> Optional[Location]:
+        row = self._conn.execute("SELECT path, offset, length, line FROM messages WHERE message_id = ?", (message_id,)).fetchone()
+        return tuple(row) if row else None
+
+    def session(self, session_id: str) -> List[Location]:
+        return [tuple(r) for r in self._conn.execute(
+            "SELECT path, offset, length, line FROM messages WHERE session_id = ? ORDER BY ts, path, offset", (session_id,))]
+
+    def time_range(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Location]:
+        # half-open [start, end) on the normalised timestamp
+        sql = "SELECT path, offset, length, line FROM messages"
+        clauses, args = [], []
+        if start:
+            clauses.append("ts >= ?")
+            args.append(to_iso_utc(start))
+        if end:
+            clauses.append("ts < ?")
+            args.append(to_iso_utc(end))
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return [tuple(r) for r in self._conn.execute(sql + " ORDER BY ts, path, offset", args)]
+
+    def partitions(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        # partitions whose [min_ts, max_ts] overlaps [start, end)
+        sql = "SELECT partition, min_ts, max_ts, records FROM partitions"
+        clauses, args = [], []
+        if start:
+            clauses.append("max_ts >= ?")
+            args.append(to_iso_utc(start))
+        if end:
+            clauses.append("min_ts < ?")
+            args.append(to_iso_utc(end))
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return [{"partition": p, "min_ts": lo, "max_ts": hi, "records": n}
+                for p, lo, hi, n in self._conn.execute(sql + " ORDER BY partition", args)]
+
+    def read(self, locations: Sequence[Location]) -> Iterator[Dict[str, Any]]:
+        # seeks straight to each line; locations in the same file are read in offset order, one open per file
+        # (compressed files: each member is decompressed once for all the lines wanted from it)
+        by_file: Dict[str, List[Tuple[int, int, int, int]]] = {}
+        for i, (rel, offset, length, line) in enumerate(locations):
+            by_file.setdefault(rel, []).append((offset, length, line, i))
+        out: List[Optional[Dict[str, Any]]] = [None] * len(locations)
+        for rel, spans in by_file.items():
+            compression = compression_of(rel)
+            with (self.base / rel).open("rb") as fh:
+                member_at, lines = None, []
+                for offset, length, line, i in sorted(spans):
+                    if compression == "none":
+                        fh.seek(offset)
+                        out[i] = loads(fh.read(length))
+                        continue
+                    if offset != member_at:
+                        fh.seek(offset)
+                        member_at, lines = offset, decompress(fh.read(length), compression).splitlines()
+                    out[i] = loads(lines[line])
+        return (rec for rec in out if rec is not None)
+
+    def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        loc = self.message(message_id)
+        return next(self.read([loc]), None) if loc else None
+
+    def get_session(self, session_id: str) -> List[Dict[str, Any]]:
+        return list(self.read(self.session(session_id)))
+
+    def get_time_range(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        return self.read(self.time_range(start, end))
+
+    def rebuild(self, batch_size: int = 10_000) -> int:
+        # re-derives the index from the JSONL files, for stores written before indexing was enabled
+        with self._conn:
+            self._conn.execute("DELETE FROM messages")
+            self._conn.execute("DELETE FROM partitions")
+        total = 0
+        pending = []
+        for file_path in sorted(p for p in self.base.rglob("*.jsonl*") if p.name.endswith(_DATA_SUFFIXES)):
+            compression = compression_of(file_path)
+            with file_path.open("rb") as fh:
+                if compression == "none":
+                    offset = 0
+                    for line in fh:
+                        try:
+                            pending.append((file_path, loads(line), offset, len(line), 0))
+                        except Exception:
+                            pass
+                        offset += len(line)
+                else:
+                    for start, end, data in iter_members(fh, compression):
+                        for n, line in enumerate(data.splitlines()):
+                            try:
+                                pending.append((file_path, loads(line), start, end - start, n))
+                            except Exception:
+                                pass
+                if len(pending) >= batch_size:
+                    total += self.add(pending)
+                    pending = []
+        total += self.add(pending)
+        return total
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "StoreIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query or rebuild the processed-store index")
+    parser.add_argument("--base", type=str, default="data/processed")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--session", type=str, default=None)
+    parser.add_argument("--message", type=str, default=None)
+    parser.add_argument("--start", type=str, default=None)
+    parser.add_argument("--end", type=str, default=None)
+    args = parser.parse_args()
+    with StoreIndex(Path(args.base)) as index:
+        if args.rebuild:
+            n = index.rebuild()
+            print(json.dumps({"level": "info", "msg": "index_rebuilt", "path": str(index.path), "records": n}))
+            return
+        if args.message:
+            rec = index.get_message(args.message)
+            records = [rec] if rec else []
+        elif args.session:
+            records = index.get_session(args.session)
+        else:
+            records = index.get_time_range(args.start, args.end)
+        for rec in records:
+            print(json.dumps(rec, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
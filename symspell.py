@@ -0,0 +1,204 @@
+# src/etl/symspell.py
+import argparse
+import json
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+MAGIC = b"SYMSPELL1"
+DEFAULT_MAX_EDIT_DISTANCE = 2
+DEFAULT_PREFIX_LENGTH = 7
+
+def _key(s: str) -> int:
+    return zlib.crc32(s.encode("utf-8"))
+
+def _deletes_by_level(word: str, max_distance: int) -> List[List[str]]:
+    levels = [[word]]
+    seen = {word}
+    for _ in range(max_distance):
+        nxt = []
+        for w in levels[-1]:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                d = w[:i] + w[i + 1:]
+                if d not in seen:
+                    seen.add(d)
+                    nxt.append(d)
+        levels.append(nxt)
+    return levels
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    return {d for level in _deletes_by_level(word, max_distance) for d in level}
+
+def osa_distance(a: str, b: str, max_distance: int) -> int:
+    # optimal string alignment (Damerau-Levenshtein without repeated edits), the same edit set
+    # pyspellchecker uses; returns max_distance + 1 as soon as the bound is exceeded
+    if a == b:
+        return 0
+    la, lb = len(a), len(b)
+    if abs(la - lb) > max_distance:
+        return max_distance + 1
+    prev2 = None
+    prev = list(range(lb + 1))
+    for i in range(1, la + 1):
+        cur = [i] + [0] * lb
+        row_min = cur[0]
+        ca = a[i - 1]
+        for j in range(1, lb + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            if v < row_min:
+                row_min = v
+        if row_min > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[lb]
+
+class SymSpell:
+    def __init__(self, words: List[str], freqs: array, keys: array, postings: array,
+                 max_edit_distance: int = DEFAULT_MAX_EDIT_DISTANCE,
+                 prefix_length: int = DEFAULT_PREFIX_LENGTH) -> None:
+        self.words = words
+        self.freqs = freqs
+        self.keys = keys
+        self.postings = postings
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self._index = {w: i for i, w in enumerate(words)}
+
+    @classmethod
+    def build(cls, frequencies: Dict[str, int], max_edit_distance: int = DEFAULT_MAX_EDIT_DISTANCE,
+              prefix_length: int = DEFAULT_PREFIX_LENGTH) -> "SymSpell":
+        words = sorted(w for w in frequencies if w)
+        freqs = array("I", (min(int(frequencies[w]), 0xFFFFFFFF) for w in words))
+        pairs = []
+        for idx, w in enumerate(words):
+            for d in _deletes(w[:prefix_length], max_edit_distance):
+                pairs.append((_key(d), idx))
+        pairs.sort()
+        keys = array("I", (k for k, _ in pairs))
+        postings = array("I", (i for _, i in pairs))
+        return cls(words, freqs, keys, postings, max_edit_distance, prefix_length)
+
+    @classmethod
+    def load(cls, path: Path) -> "SymSpell":
+        with Path(path).open("rb") as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"not a symspell index: {path}")
+            (meta_len,) = struct.unpack("<I", fh.read(4))
+            meta = json.loads(fh.read(meta_len))
+            words = fh.read(meta["words_bytes"]).decode("utf-8").split("\n") if meta["n_words"] else []
+            freqs = array("I")
+            freqs.frombytes(fh.read(meta["n_words"] * 4))
+            keys = array("I")
+            keys.frombytes(fh.read(meta["n_pairs"] * 4))
+            postings = array("I")
+            postings.frombytes(fh.read(meta["n_pairs"] * 4))
+        return cls(words, freqs, keys, postings, meta["max_edit_distance"], meta["prefix_length"])
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        words_blob = "\n".join(self.words).encode("utf-8")
+        meta = json.dumps({
+            "max_edit_distance": self.max_edit_distance,
+            "prefix_length": self.prefix_length,
+            "n_words": len(self.words),
+            "n_pairs": len(self.keys),
+            "words_bytes": len(words_blob),
+        }).encode("utf-8")
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as fh:
+            fh.write(MAGIC)
+            fh.write(struct.pack("<I", len(meta)))
+            fh.write(meta)
+            fh.write(words_blob)
+            fh.write(self.freqs.tobytes())
+            fh.write(self.keys.tobytes())
+            fh.write(self.postings.tobytes())
+        tmp.replace(path)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._index
+
+    def _candidates(self, key: int) -> array:
+        lo = bisect_left(self.keys, key)
+        hi = bisect_left(self.keys, key + 1, lo)
+        return self.postings[lo:hi]
+
+    def correction(self, word: str) -> Optional[str]:
+        if not word:
+            return None
+        w = word.lower()
+        if w in self._index:
+            return w
+        max_d = self.max_edit_distance
+        wlen = len(w)
+        words = self.words
+        best = None
+        best_rank = None
+        seen = set()
+        # a word first found at input-delete level k is at distance >= k, so levels below the best
+        # distance so far can still produce a tie that wins on frequency; stop only past it
+        for level, deletes in enumerate(_deletes_by_level(w[:self.prefix_length], max_d)):
+            if best_rank is not None and best_rank[0] < level:
+                break
+            for d in deletes:
+                for idx in self._candidates(_key(d)):
+                    if idx in seen:
+                        continue
+                    seen.add(idx)
+                    cand = words[idx]
+                    if abs(len(cand) - wlen) > max_d:
+                        continue
+                    dist = osa_distance(w, cand, max_d)
+                    if dist > max_d:
+                        continue
+                    # closest edit distance wins, then the most frequent word, then alphabetical order
+                    rank = (dist, -self.freqs[idx], cand)
+                    if best_rank is None or rank < best_rank:
+                        best, best_rank = cand, rank
+        return best
+
+def load_frequencies(wordlist: Optional[Path] = None, use_base_dictionary: bool = True) -> Dict[str, int]:
+    freqs: Dict[str, int] = {}
+    if use_base_dictionary:
+        # a wordlist-only index "corrects" everyday English into medical terms, so never fall back silently
+        try:
+            from spellchecker import SpellChecker
+        except ImportError:
+            raise RuntimeError("the base English dictionary comes from pyspellchecker; install it or pass --no-base-dictionary")
+        freqs.update(SpellChecker().word_frequency.dictionary)
+    if wordlist is not None and wordlist.exists():
+        with wordlist.open(encoding="utf-8") as fh:
+            for line in fh:
+                t = line.strip()
+                if not t or t.startswith("#"):
+                    continue
+                t = t.lower()
+                freqs[t] = freqs.get(t, 0) + 1
+    return freqs
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a symmetric-delete spelling index")
+    parser.add_argument("--out", type=str, default="data/resources/symspell.idx")
+    parser.add_argument("--wordlist", type=str, default="data/resources/wordlist.txt")
+    parser.add_argument("--no-base-dictionary", action="store_true")
+    parser.add_argument("--max-edit-distance", type=int, default=DEFAULT_MAX_EDIT_DISTANCE)
+    parser.add_argument("--prefix-length", type=int, default=DEFAULT_PREFIX_LENGTH)
+    args = parser.parse_args()
+    freqs = load_frequencies(Path(args.wordlist), use_base_dictionary=not args.no_base_dictionary)
+    index = SymSpell.build(freqs, args.max_edit_distance, args.prefix_length)
+    index.save(Path(args.out))
+    print(json.dumps({"level": "info", "msg": "symspell_index_built", "path": args.out,
+                      "words": len(index.words), "deletes": len(index.keys)}))
+
+if __name__ == "__main__":
+    main()
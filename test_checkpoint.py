@@ -0,0 +1,37 @@
+import json
+import sys
+from itertools import islice
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from etl.checkpoint import Checkpoint, FileMessageReader
+
+def _input(path, n):
+    with path.open("w", encoding="utf-8") as fh:
+        for i in range(n):
+            meta = {"session_id": "s1"} if i % 2 else {"session_id": "s1", "message_id": f"m{i}"}
+            fh.write(json.dumps({"message": f"héllo {i}", "metadata": meta}) + "\n")
+        fh.write("not json\n")
+    return path
+
+def test_reader_offset_resumes_at_the_next_line(tmp_path):
+    src = _input(tmp_path / "in.jsonl", 10)
+    reader = FileMessageReader(src)
+    first = list(islice(iter(reader), 4))
+    rest = list(FileMessageReader(src, reader.offset))
+    assert [m for m, _ in first + rest] == [f"héllo {i}" for i in range(10)]
+    # generated ids are stable across replays of the same line
+    again = dict((m, meta["message_id"]) for m, meta in FileMessageReader(src))
+    assert again["héllo 1"] == first[1][1]["message_id"]
+    assert again["héllo 0"] == "m0"
+
+def test_checkpoint_only_resumes_the_same_unchanged_input(tmp_path):
+    src = _input(tmp_path / "in.jsonl", 10)
+    ckpt_path = tmp_path / "ckpt.json"
+    reader = FileMessageReader(src)
+    list(islice(iter(reader), 3))
+    Checkpoint(ckpt_path, src).update(reader.offset, count_raw=3)
+    assert Checkpoint(ckpt_path, src).resume_offset() == reader.offset
+    assert Checkpoint(ckpt_path, tmp_path / "other.jsonl").resume_offset() == 0
+    src.write_text("rewritten\n" * 20, encoding="utf-8")
+    assert Checkpoint(ckpt_path, src).resume_offset() == 0
@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import pytest
+
+from etl import codec
+from etl.compact import compact_store, read_session
+from etl.store_index import StoreIndex
+from etl.utils import PartitionWriter, write_jsonl
+
+DAY = "2025/01/06"
+
+@pytest.fixture(params=["json", "orjson"])
+def backend(request):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    previous = codec.json_backend
+    codec.configure_json(request.param)
+    yield request.param
+    codec.configure_json(previous)
+
+def test_backends_write_the_same_records(backend):
+    rec = {"text": "café ☕", "n": 2 ** 70, "nested": {"x": [1.5, None, True]}}
+    line = codec.dumps_line(rec)
+    # orjson refuses ints past 64 bits; those records go through the stdlib encoder instead
+    assert line.endswith(b"\n") and codec.loads(line) == rec
+    assert "café".encode() in line
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_compressed_appends_stream_back_and_skip_a_torn_tail(tmp_path, compression, make_record):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    path = codec.with_suffix(tmp_path / "raw.jsonl", compression)
+    records = [make_record(i) for i in range(30)]
+    for start in range(0, 30, 10):
+        write_jsonl(path, records[start:start + 10], level=1)
+    assert list(codec.iter_records(path)) == records
+    with path.open("ab") as fh:
+        fh.write(codec.compress(b'{"message_id": "torn"}\n', compression)[:-6])
+    assert list(codec.iter_records(path)) == records
+
+def test_compressed_store_keeps_index_compaction_and_rebuild(tmp_path, make_record):
+    records = [make_record(i) for i in range(30)]
+    with PartitionWriter(tmp_path, index=StoreIndex(tmp_path), compression="gzip") as w:
+        for start in range(0, 20, 5):
+            assert w.write_records(records[start:start + 5]) == []
+    part = tmp_path / DAY
+    assert sorted(p.name for p in part.iterdir()) == ["s0.jsonl.gz", "s1.jsonl.gz", "s2.jsonl.gz"]
+    with StoreIndex(tmp_path) as index:
+        assert index.get_message("m13") == records[13]
+        live = index.session("s1")
+        assert index.rebuild() == 20 and index.session("s1") == live
+    assert compact_store(tmp_path)["records"] == 20
+    with PartitionWriter(tmp_path, index=StoreIndex(tmp_path), compression="gzip") as w:
+        w.write_records(records[20:])
+    assert sorted(p.name for p in part.glob("*.gz")) == ["_seg-000001.jsonl.gz", "s0.jsonl.gz", "s1.jsonl.gz", "s2.jsonl.gz"]
+    expected = [r for r in records if r["session_id"] == "s2"]
+    assert list(read_session(part, "s2")) == expected
+    with StoreIndex(tmp_path) as index:
+        assert index.get_session("s2") == expected
@@ -0,0 +1,91 @@
+import fcntl
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import pytest
+
+from etl.compact import compact_partition, compact_store, load_manifest, read_session
+from etl.store_index import StoreIndex
+from etl.utils import PartitionWriter
+
+DAY = "2025/01/06"
+
+def _session_ids(records, sid):
+    return [r["message_id"] for r in records if r["session_id"] == sid]
+
+def test_compaction_merges_files_and_keeps_lookups(tmp_path, make_record):
+    records = [make_record(i, sessions=4) for i in range(40)]
+    with PartitionWriter(tmp_path, index=StoreIndex(tmp_path)) as w:
+        for start in range(0, 40, 10):
+            assert w.write_records(records[start:start + 10]) == []
+    totals = compact_store(tmp_path)
+    part = tmp_path / DAY
+    assert totals["files"] == 4 and totals["records"] == 40
+    assert sorted(p.name for p in part.glob("*.jsonl")) == ["_seg-000001.jsonl"]
+    assert load_manifest(part)["pending"] == {}
+    assert [r["message_id"] for r in read_session(part, "s1")] == _session_ids(records, "s1")
+    with StoreIndex(tmp_path) as index:
+        assert [r["message_id"] for r in index.get_session("s2")] == _session_ids(records, "s2")
+        assert index.get_message("m17") == records[17]
+
+def test_writer_keeps_appending_across_compactions(tmp_path, make_record):
+    records = [make_record(i, sessions=4) for i in range(30)]
+    with PartitionWriter(tmp_path, index=StoreIndex(tmp_path)) as w:
+        w.write_records(records[:10])
+        compact_store(tmp_path)
+        # the writer's cached handles now point at unlinked files and must be reopened
+        w.write_records(records[10:20])
+        compact_store(tmp_path, segment_bytes=1)
+        w.write_records(records[20:])
+    part = tmp_path / DAY
+    assert [r["message_id"] for r in read_session(part, "s3")] == _session_ids(records, "s3")
+    assert len(load_manifest(part)["segments"]) > 1
+    with StoreIndex(tmp_path) as index:
+        assert [r["message_id"] for r in index.get_session("s0")] == _session_ids(records, "s0")
+
+def test_locked_session_file_is_left_alone(tmp_path, make_record):
+    with PartitionWriter(tmp_path) as w:
+        w.write_records([make_record(i, sessions=4) for i in range(8)])
+    busy = tmp_path / DAY / "s0.jsonl"
+    with busy.open("rb") as fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        totals = compact_store(tmp_path)
+    assert totals["files"] == 3 and busy.exists()
+
+def test_batch_wider_than_the_handle_pool_keeps_its_locks_until_indexed(tmp_path, make_record):
+    records = [make_record(i, sessions=4) for i in range(8)]
+    index = StoreIndex(tmp_path)
+    add = index.add
+
+    def compact_then_add(entries):
+        # a compaction sneaking in between the appends and the index update
+        compact_partition(tmp_path / DAY, index)
+        return add(entries)
+
+    index.add = compact_then_add
+    with PartitionWriter(tmp_path, max_open=2, index=index) as w:
+        assert w.write_records(records) == []
+    with StoreIndex(tmp_path) as index:
+        for rec in records:
+            assert index.get_message(rec["message_id"]) == rec
+
+def test_interrupted_compaction_is_finished_without_duplicates(tmp_path, monkeypatch, make_record):
+    records = [make_record(i, sessions=4) for i in range(20)]
+    with PartitionWriter(tmp_path, index=StoreIndex(tmp_path)) as w:
+        w.write_records(records[:10])
+        real_unlink = Path.unlink
+        def crash(self, *a, **kw):
+            raise OSError("crashed before unlink")
+        monkeypatch.setattr(Path, "unlink", crash)
+        with pytest.raises(OSError):
+            compact_store(tmp_path)
+        monkeypatch.setattr(Path, "unlink", real_unlink)
+        assert load_manifest(tmp_path / DAY)["pending"]
+        w.write_records(records[10:])
+    compact_store(tmp_path)
+    part = tmp_path / DAY
+    assert load_manifest(part)["pending"] == {}
+    assert [r["message_id"] for r in read_session(part, "s2")] == _session_ids(records, "s2")
+    with StoreIndex(tmp_path) as index:
+        assert [r["message_id"] for r in index.get_session("s1")] == _session_ids(records, "s1")
@@ -0,0 +1,36 @@
+import sqlite3
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from etl.db_sink import SECONDARY_INDEXES, open_db_sink
+
+def _count(db, table):
+    with sqlite3.connect(db) as conn:
+        return conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+def test_bulk_load_then_reload_upserts_instead_of_duplicating(tmp_path, make_record):
+    db = tmp_path / "chat.db"
+    with open_db_sink(f"sqlite:///{db}", batch_rows=4) as sink:
+        assert sink.write_records([make_record(i, session="s1", phi=True) for i in range(10)]) == []
+    with open_db_sink(f"sqlite:///{db}") as sink:
+        sink.write_records([make_record(3, session="s1", phi=True, clean_text="edited", entities=[]),
+                            make_record(11, session="s1", phi=True)])
+    assert (_count(db, "messages"), _count(db, "audit_events"), _count(db, "sessions")) == (11, 11, 1)
+    # the reloaded message lost its entity, the others kept theirs
+    assert _count(db, "entities") == 10
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT clean_text FROM messages WHERE message_id = 'm3'").fetchone() == ("edited",)
+        assert conn.execute("SELECT started_at, ended_at FROM sessions").fetchone() == ("2025-01-06T10:00:00Z", "2025-01-06T10:11:00Z")
+        names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert set(SECONDARY_INDEXES) <= names
+
+def test_bad_record_is_isolated_from_its_batch(tmp_path, make_record):
+    db = tmp_path / "chat.db"
+    bad = make_record(5, session="s1", phi=True)
+    bad["clean_text"] = None
+    with open_db_sink(f"sqlite:///{db}", batch_rows=100) as sink:
+        sink.write_records([make_record(i, session="s1", phi=True) for i in range(5)] + [bad])
+        sink.flush()
+        assert [rec["message_id"] for rec, _ in sink.failed] == ["m5"]
+    assert _count(db, "messages") == 5
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from etl.dedupe import BloomFilter, SeenIds, id_key
+
+def test_bloom_has_no_false_negatives_and_bounded_false_positives():
+    bf = BloomFilter(capacity=5000, error_rate=0.01)
+    for i in range(5000):
+        bf.add(id_key(f"in-{i}"))
+    assert all(id_key(f"in-{i}") in bf for i in range(5000))
+    false_positives = sum(id_key(f"out-{i}") in bf for i in range(20000))
+    assert false_positives / 20000 < 0.03
+
+def test_seen_ids_filters_repeats_within_and_across_runs(tmp_path):
+    path = tmp_path / "seen.sqlite"
+    with SeenIds(path, capacity=1000) as seen:
+        assert seen.filter_new(["a", "b", "a"]) == [True, True, False]
+        seen.add(["a", "b"])
+        assert seen.filter_new(["b", "c"]) == [False, True]
+    with SeenIds(path, capacity=1000) as seen:
+        assert seen.filter_new(["a", "c"]) == [False, True]
+        assert len(seen) == 2
+
+def test_stale_filter_is_rebuilt_from_the_table(tmp_path):
+    path = tmp_path / "seen.sqlite"
+    with SeenIds(path, capacity=1000) as seen:
+        seen.add(["a"])
+    # simulate a crash: ids committed to the table but the filter file never rewritten
+    crashed = SeenIds(path, capacity=1000)
+    crashed.add(["b"])
+    crashed._conn.close()
+    with SeenIds(path, capacity=1000) as seen:
+        assert seen.filter_new(["a", "b", "c"]) == [False, False, True]
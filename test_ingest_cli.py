@@ -0,0 +1,101 @@
+import io
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+from cli.ingest_cli import iter_batch_results, iter_batches, iter_stdin_messages, process_batch, run_messages
+
+def _messages(n):
+    return [(f"note {i}", {"session_id": f"s{i % 4}", "message_id": f"m{i}",
+                           "timestamp": f"2025-01-06T10:{i % 60:02d}:00Z"}) for i in range(n)]
+
+def test_iter_batches_keeps_order_and_a_final_partial_batch():
+    assert [len(b) for b in iter_batches(range(23), 10)] == [10, 10, 3]
+    assert [x for b in iter_batches(iter(range(23)), 10) for x in b] == list(range(23))
+    assert list(iter_batches(range(20), 10))[-1] == list(range(10, 20))
+    assert list(iter_batches([], 10)) == []
+    # a size below one still makes progress
+    assert list(iter_batches("ab", 0)) == [["a"], ["b"]]
+
+def test_stdin_batches_end_to_end(tmp_path):
+    lines = [json.dumps({"message": m, "metadata": meta}) for m, meta in _messages(23)]
+    stream = io.StringIO("\n".join(lines[:5] + ["not json"] + lines[5:]) + "\n")
+    batch = list(iter_stdin_messages(io.StringIO("\n".join(lines[:3]))))
+    raw_out, processed_out, errors, quarantined, rejected = process_batch(batch)
+    assert [r["message_id"] for r in processed_out] == ["m0", "m1", "m2"] and errors == 0
+    assert (quarantined, rejected) == ([], [])
+    run_messages(iter_stdin_messages(stream), tmp_path / "raw.jsonl", tmp_path / "processed", batch_size=10,
+                 quarantine_path=tmp_path / "q.jsonl", metrics_interval=0)
+    raw = [json.loads(line) for line in (tmp_path / "raw.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [r["message_id"] for r in raw] == [f"m{i}" for i in range(23)]
+    assert sum(len(f.read_text(encoding="utf-8").splitlines()) for f in (tmp_path / "processed").rglob("*.jsonl")) == 23
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_pool_results_ordered_and_unordered(ordered):
+    batches = list(iter_batches(_messages(45), 5))
+    results = list(iter_batch_results(iter(batches), workers=2, ordered=ordered))
+    got = [[r["message_id"] for r in processed] for _, processed, _, _, _ in results]
+    expected = [[meta["message_id"] for _, meta in batch] for batch in batches]
+    if ordered:
+        assert got == expected
+    else:
+        # handed back as workers finish, but every batch comes back whole exactly once
+        assert sorted(got) == sorted(expected)
+    assert sum(errors for _, _, errors, _, _ in results) == 0
+
+def _run(tmp_path, messages, **kw):
+    run_messages(messages, tmp_path / "raw.jsonl", tmp_path / "processed", batch_size=10,
+                 quarantine_path=tmp_path / "q.jsonl", reject_path=tmp_path / "rejects.jsonl", metrics_interval=0,
+                 dedupe_path=tmp_path / "seen.sqlite", **kw)
+
+def _crash_at(messages, n):
+    for i, item in enumerate(messages):
+        if i == n:
+            # no unwinding: buffered sink rows that were not committed are gone
+            os._exit(1)
+        yield item
+
+def test_dedupe_rerun_after_a_crash_loses_nothing_in_the_db_sink(tmp_path):
+    db = f"sqlite:///{tmp_path / 'etl.db'}"
+    pid = os.fork()
+    if pid == 0:
+        _run(tmp_path, _crash_at(_messages(40), 30), db_url=db)
+    os.waitpid(pid, 0)
+    _run(tmp_path, _messages(40), db_url=db)
+    with sqlite3.connect(tmp_path / "etl.db") as conn:
+        assert conn.execute("SELECT count(*) FROM messages").fetchone()[0] == 40
+    lines = (tmp_path / "raw.jsonl").read_text(encoding="utf-8").splitlines()
+    assert sorted(json.loads(line)["message_id"] for line in lines) == sorted(f"m{i}" for i in range(40))
+
+def test_dedupe_refuses_a_buffering_sink(tmp_path):
+    with pytest.raises(ValueError):
+        _run(tmp_path, _messages(5), sink="parquet", parquet_base=tmp_path / "parquet")
+
+def test_dedupe_keeps_only_the_first_of_an_id_repeated_within_a_batch(tmp_path, capsys):
+    messages = _messages(6)
+    messages[2] = (messages[2][0], {**messages[2][1], "message_id": "m0"})
+    messages[4] = (messages[4][0], {**messages[4][1], "message_id": "m0"})
+    _run(tmp_path, messages)
+    raw = [json.loads(line) for line in (tmp_path / "raw.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [r["message_id"] for r in raw] == ["m0", "m1", "m3", "m5"] and raw[0]["raw_text"] == "note 0"
+    processed = [json.loads(line)["message_id"] for f in (tmp_path / "processed").rglob("*.jsonl")
+                 for line in f.read_text(encoding="utf-8").splitlines()]
+    assert sorted(processed) == ["m0", "m1", "m3", "m5"]
+    done = [json.loads(line) for line in capsys.readouterr().out.splitlines() if "completed_run" in line]
+    assert done[0]["count_duplicates"] == 2
+
+@pytest.mark.parametrize("backend", ["pydantic", "jsonschema"])
+def test_validation_accepts_the_pipelines_own_output(tmp_path, backend, capsys):
+    pytest.importorskip(backend)
+    texts = ["see https://example.com/results before 2024-03-05", "mail a.b@example.com or call 555-010-1234",
+             "ssn 123-45-6789 from 10.0.0.1", "MRN AB123456 refill", "plain note"]
+    run_messages([(t, {}) for t in texts * 4], tmp_path / "raw.jsonl", tmp_path / "processed", batch_size=10,
+                 quarantine_path=tmp_path / "q.jsonl", reject_path=tmp_path / "rejects.jsonl", metrics_interval=0,
+                 validate=backend)
+    done = [json.loads(line) for line in capsys.readouterr().out.splitlines() if "completed_run" in line]
+    assert (done[0]["count_processed"], done[0]["count_rejected"]) == (20, 0)
+    assert not (tmp_path / "rejects.jsonl").exists()
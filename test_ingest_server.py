@@ -0,0 +1,98 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+from cli.ingest_server import IngestServer, parse_payload
+
+def test_parse_payload_accepts_object_list_and_ndjson():
+    one = {"message": "hi", "metadata": {"session_id": "s1"}}
+    assert parse_payload(json.dumps(one).encode()) == [("hi", {"session_id": "s1"})]
+    assert len(parse_payload(json.dumps([one, one]).encode())) == 2
+    assert len(parse_payload((json.dumps(one) + "\n" + json.dumps(one) + "\n").encode())) == 2
+    with pytest.raises(ValueError):
+        parse_payload(b'{"metadata": {}}')
+
+async def _post(sock, payload):
+    reader, writer = await asyncio.open_unix_connection(sock)
+    body = json.dumps(payload).encode()
+    writer.write(b"POST /ingest HTTP/1.1\r\nHost: x\r\nConnection: close\r\nContent-Length: "
+                 + str(len(body)).encode() + b"\r\n\r\n" + body)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, body = data.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+def _server(tmp_path, **kw):
+    return IngestServer(tmp_path / "raw.jsonl", tmp_path / "processed", quarantine_path=tmp_path / "q.jsonl",
+                        reject_path=tmp_path / "rejects.jsonl", metrics_interval=0, redact_budget_ms=0, **kw)
+
+def test_micro_batches_requests_and_reports_status_per_message(tmp_path):
+    sock = str(tmp_path / "ingest.sock")
+
+    async def scenario():
+        server = _server(tmp_path, max_batch=8, max_wait_ms=20)
+        serving = asyncio.create_task(server.serve(unix_path=sock))
+        while not Path(sock).exists():
+            await asyncio.sleep(0.01)
+        payloads = [{"message": f"email me at user{i}@example.com", "metadata": {"session_id": f"s{i % 3}",
+                     "message_id": f"m{i}", "timestamp": "2025-01-06T10:00:00Z"}} for i in range(20)]
+        responses = await asyncio.gather(*(_post(sock, p) for p in payloads))
+        metrics = await server.metrics()
+        server.stop()
+        await serving
+        return responses, metrics
+
+    responses, metrics = asyncio.run(scenario())
+    assert all(code == 200 for code, _ in responses)
+    assert sorted(r["results"][0]["message_id"] for _, r in responses) == sorted(f"m{i}" for i in range(20))
+    assert {r["results"][0]["status"] for _, r in responses} == {"processed"}
+    assert metrics["request_latency"]["calls"] == 20
+    assert metrics["batches"] < 20
+    raw = [json.loads(l) for l in (tmp_path / "raw.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert len(raw) == 20 and all("@example.com" not in r["clean_text"] for r in raw)
+
+def test_full_queue_pushes_back_with_503(tmp_path):
+    sock = str(tmp_path / "ingest.sock")
+
+    async def scenario():
+        server = _server(tmp_path, queue_size=2)
+        serving = asyncio.create_task(server.serve(unix_path=sock))
+        while not Path(sock).exists():
+            await asyncio.sleep(0.01)
+        too_many = [{"message": "hello", "metadata": {}} for _ in range(3)]
+        result = await _post(sock, too_many)
+        ok = await _post(sock, too_many[:2])
+        server.stop()
+        await serving
+        return result, ok
+
+    (code, body), (ok_code, _) = asyncio.run(scenario())
+    assert code == 503 and body["queue_size"] == 2
+    assert ok_code == 200
+
+def test_bad_content_length_gets_a_400(tmp_path):
+    sock = str(tmp_path / "ingest.sock")
+
+    async def send(head):
+        reader, writer = await asyncio.open_unix_connection(sock)
+        writer.write(b"POST /ingest HTTP/1.1\r\nHost: x\r\n" + head + b"\r\n\r\n{}")
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+        return int(data.split()[1])
+
+    async def scenario():
+        server = _server(tmp_path)
+        serving = asyncio.create_task(server.serve(unix_path=sock))
+        while not Path(sock).exists():
+            await asyncio.sleep(0.01)
+        codes = [await send(b"Content-Length: " + v) for v in (b"abc", b"-5")]
+        server.stop()
+        await serving
+        return codes
+
+    assert asyncio.run(scenario()) == [400, 400]
@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import json
+import pickle
+import uuid
+import pytest
+import etl.transform
+from etl.ingest import ingest_batch
+from etl.message import PROCESSED_FIELDS, RAW_FIELDS, Message
+from etl.transform import transform
+from etl.validate import BatchValidator
+
+def _message(i=0, **kw):
+    fields = dict(
+        session_id=str(uuid.UUID(int=i + 1, version=4)),
+        message_id=str(uuid.UUID(int=i + 1000, version=4)),
+        timestamp="2025-01-06T08:00:00Z",
+        raw_text="mail me at a@b.io",
+        clean_text="mail me at [REDACTED_EMAIL]",
+        phi_flags=["EMAIL"],
+    )
+    fields.update(kw)
+    return Message(**fields)
+
+def test_transform_works_in_place_and_keeps_the_raw_view():
+    msg = _message(entities=[{"type": "CONTACT", "value": "call 555-010-1234"}])
+    raw_before = msg.raw_dict()
+    assert list(msg.keys()) == list(RAW_FIELDS) and "language" not in msg
+    out = transform(msg)
+    assert out is msg and list(msg.to_dict()) == list(PROCESSED_FIELDS)
+    # the dict path is the reference: both must agree on the processed record and the raw one survives
+    assert msg.to_dict() == transform(dict(raw_before))
+    assert msg.raw_dict() == raw_before
+    assert msg["language"] == "en" and msg.get("missing", 1) == 1
+
+def test_pickle_round_trip_keeps_stage_and_raw_values():
+    msg = transform(_message())
+    back = pickle.loads(pickle.dumps(msg))
+    assert back == msg and back.processed
+    assert back.raw_dict() == msg.raw_dict()
+    assert json.loads(json.dumps(back.to_dict())) == msg.to_dict()
+
+@pytest.mark.parametrize("backend", ["pydantic", "jsonschema"])
+def test_validator_takes_messages(backend):
+    pytest.importorskip(backend)
+    # the JSON schema has no nulls for the optional fields, so fill them in
+    spans = [{"field": "raw_text", "type": "EMAIL", "start": 11, "end": 17, "source": "regex"}]
+    records = [transform(_message(i, intent="ask", urgency="low", confidence=0.5, phi_spans=spans)) for i in range(4)]
+    records[2].channel = "ivr"
+    valid, rejected = BatchValidator(backend).validate(records)
+    assert valid == [records[0], records[1], records[3]]
+    assert [r for r, _ in rejected] == [records[2]]
+
+def test_transform_reuses_the_spans_found_at_ingest(monkeypatch):
+    text = "mail me at a@b.io or call 555-010-1234"
+    meta = {"session_id": str(uuid.UUID(int=1, version=4)), "message_id": str(uuid.UUID(int=2, version=4)),
+            "timestamp": "2025-01-06T08:00:00Z", "entities": [{"type": "CONTACT", "value": "ssn 123-45-6789"}]}
+    msg = ingest_batch([(text, meta)], budget_ms=0)[0]
+    spans = msg.phi_spans
+    assert [(s["field"], s["type"], s["source"]) for s in spans] == [
+        ("raw_text", "EMAIL", "regex"), ("raw_text", "PHONE", "regex"), ("entities.0.value", "SSN", "regex")]
+    assert text[spans[0]["start"]:spans[0]["end"]] == "a@b.io"
+    def rescan(*a):
+        raise AssertionError("transform scanned again")
+    monkeypatch.setattr(etl.transform, "detect_phi_basic", rescan)
+    monkeypatch.setattr(etl.transform, "redact_entities", rescan)
+    out = transform(msg)
+    assert out.phi_flags == ["EMAIL", "PHONE", "SSN"] and out.phi_spans is spans
+    assert transform(out.raw_dict())["phi_flags"] == out.phi_flags
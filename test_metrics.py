@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from etl.metrics import Metrics, StageStats
+from etl.spell_cache import SpellCache
+
+def test_stage_percentiles_and_throughput():
+    st = StageStats()
+    for ms in range(1, 101):
+        st.add(float(ms), items=2)
+    s = st.summary()
+    assert (s["calls"], s["items"]) == (100, 200)
+    assert (s["p50_ms"], s["p95_ms"], s["p99_ms"]) == (51.0, 96.0, 100.0)
+    assert s["items_per_s"] == round(200 / 5.05, 1)
+
+def test_reservoir_stays_bounded():
+    st = StageStats(reservoir=10)
+    for ms in range(1000):
+        st.add(float(ms))
+    assert len(st.samples) == 10 and st.calls == 1000
+
+def test_drain_and_merge_carry_samples_counters_and_cache_deltas():
+    worker, parent = Metrics(), Metrics()
+    cache = SpellCache(10)
+    worker.register_cache("spell", cache)
+    worker.track_pending()
+    cache.put("teh", "the")
+    cache.get("teh")
+    cache.get("recieve")
+    worker.add("clean", 2.0)
+    worker.incr("quarantined")
+    parent.merge(worker.drain())
+    summary = parent.summary()
+    assert summary["stages"]["clean"]["calls"] == 1
+    assert summary["counters"] == {"quarantined": 1}
+    assert summary["caches"]["spell"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    # a second drain only carries what happened since the first
+    assert worker.drain() == {"samples": {}, "counters": {}, "caches": {"spell": (0, 0)}}
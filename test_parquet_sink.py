@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import pytest
+pytest.importorskip("pyarrow")
+from etl.parquet_sink import ParquetPartitionWriter, partition_files, read_messages
+
+def test_day_partitions_round_trip_with_nested_columns(tmp_path, make_record):
+    records = [make_record(i, day=6 + i % 3) for i in range(30)]
+    with ParquetPartitionWriter(tmp_path, row_group_size=4) as w:
+        assert w.write_records(records) == []
+    assert [f.parent.name for f in partition_files(tmp_path)] == ["date=2025-01-06", "date=2025-01-07", "date=2025-01-08"]
+    rows = {r["message_id"]: r for r in read_messages(tmp_path).to_pylist()}
+    assert len(rows) == 30
+    assert rows["m1"]["phi_flags"] == ["EMAIL"]
+    assert rows["m1"]["entities"] == [{"type": "email", "value": "[REDACTED_EMAIL]", "confidence": 0.9}]
+    assert rows["m2"]["audit_trail"][0]["details"] == '{"batch": 1}'
+    assert rows["m2"]["intent"] is None
+
+def test_reader_prunes_partitions_and_projects_columns(tmp_path, make_record):
+    with ParquetPartitionWriter(tmp_path) as w:
+        w.write_records([make_record(i, day=6 + i % 3) for i in range(30)])
+    assert len(partition_files(tmp_path, start="2025-01-07")) == 2
+    table = read_messages(tmp_path, start="2025-01-07", end="2025-01-07", columns=["message_id", "phi_flags"])
+    assert table.column_names == ["message_id", "phi_flags"]
+    assert sorted(table.column("message_id").to_pylist()) == sorted(f"m{i}" for i in range(30) if i % 3 == 1)
+
+def test_bad_timestamp_is_reported_not_written(tmp_path, make_record):
+    bad = make_record(1)
+    bad["timestamp"] = "not a date"
+    with ParquetPartitionWriter(tmp_path) as w:
+        failed = w.write_records([bad, make_record(2)])
+    assert [r["message_id"] for r, _ in failed] == ["m1"]
+    assert read_messages(tmp_path).num_rows == 1
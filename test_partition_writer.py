@@ -0,0 +1,49 @@
+import json
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from etl.utils import MultiWriter, PartitionWriter
+
+DAY = "2025/01/06"
+
+def _lines(path):
+    return [json.loads(line)["message_id"] for line in path.read_text(encoding="utf-8").splitlines()]
+
+def test_evicted_handles_are_reopened_and_keep_appending(tmp_path, make_record):
+    records = [make_record(i, sessions=5) for i in range(40)]
+    with PartitionWriter(tmp_path, max_open=2) as w:
+        for start in range(0, 40, 10):
+            assert w.write_records(records[start:start + 10]) == []
+            assert len(w._handles) <= 2
+    for s in range(5):
+        assert _lines(tmp_path / DAY / f"s{s}.jsonl") == [f"m{i}" for i in range(s, 40, 5)]
+
+def test_each_batch_is_on_disk_when_write_records_returns(tmp_path, make_record):
+    with PartitionWriter(tmp_path, max_open=8) as w:
+        w.write_records([make_record(i) for i in range(6)])
+        # read through another handle while the writer still holds its own open
+        assert _lines(tmp_path / DAY / "s0.jsonl") == ["m0", "m3"]
+        w.write_records([make_record(6)])
+        assert _lines(tmp_path / DAY / "s0.jsonl") == ["m0", "m3", "m6"]
+
+def test_unpartitionable_record_is_reported_and_the_rest_written(tmp_path, make_record):
+    bad = make_record(1, timestamp="not a date")
+    with PartitionWriter(tmp_path) as w:
+        failed = w.write_records([make_record(0), bad, make_record(2)])
+    assert [r["message_id"] for r, _ in failed] == ["m1"]
+    assert sorted(p.name for p in (tmp_path / DAY).iterdir()) == ["s0.jsonl", "s2.jsonl"]
+
+class _Failing:
+    # a sink that fails every record it is given, optionally handing back its own row like Parquet does
+    def __init__(self, error, own_rows=False):
+        self.error, self.own_rows = error, own_rows
+
+    def write_records(self, records):
+        return [(dict(r) if self.own_rows else r, ValueError(self.error)) for r in records]
+
+def test_multi_writer_reports_a_record_failing_in_every_sink_once(make_record):
+    records = [make_record(i) for i in range(3)]
+    failed = MultiWriter([_Failing("jsonl down"), _Failing("parquet down", own_rows=True)]).write_records(records)
+    assert [r["message_id"] for r, _ in failed] == ["m0", "m1", "m2"]
+    assert str(failed[0][1]) == "jsonl down; parquet down"
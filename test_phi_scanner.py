@@ -0,0 +1,103 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import random
+import re
+import time
+from itertools import islice
+from types import SimpleNamespace
+import pytest
+from etl import redact
+from etl.phi_scanner import PhiScanner, ScanTimeout, rest_of_line_guard
+from etl.redact import RedactionTimeout, detect_phi_spans, detect_phi_spans_batch, fallback_redact
+
+DIGIT_RE = re.compile(r"\d")
+ALPHA_RE = re.compile(r"[A-Za-z]")
+
+# the lookahead forms the guarded patterns replaced; the scanner must agree with them exactly
+REFERENCE = [
+    ("EMAIL", re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")),
+    ("SSN", re.compile(r"\b\d{3}-\d{2}-\d{4}\b")),
+    ("PHONE", re.compile(r"\b(?=(?:.*\d){7,})[+\d\-\.\s()]{7,20}\b")),
+    ("ID", re.compile(r"(?<![@.])\b(?=.*\d)(?=.*[A-Za-z])[A-Za-z0-9\-]{6,}\b(?!@)", re.IGNORECASE)),
+    ("DATE", re.compile(r"\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}\s(?:jan|feb|mar))\b", re.IGNORECASE)),
+]
+GUARDED = [
+    REFERENCE[0],
+    REFERENCE[1],
+    ("PHONE", re.compile(r"\b[+\d\-\.\s()]{7,20}\b")),
+    ("ID", re.compile(r"(?<![@.])\b[A-Za-z0-9\-]{6,}\b(?!@)", re.IGNORECASE)),
+    REFERENCE[4],
+]
+SCANNER = PhiScanner(GUARDED, guards={
+    "PHONE": rest_of_line_guard((DIGIT_RE, 7)),
+    "ID": rest_of_line_guard((DIGIT_RE, 1), (ALPHA_RE, 1)),
+}, triggers={"ID": re.compile(r"(?<![@.])\b(?=[A-Za-z0-9\-]{6})", re.IGNORECASE)})
+
+FRAGMENTS = ["john", "test12@example.com", "(555) 010-1234", "123-45-6789", "AB12345", "2024-01-02",
+             "12 jan", "patient", "-", ".", "@", "555-0101", "a1b2c3d4", "+1 555 123 4567", "9", "x@y"]
+
+def _reference(text):
+    return sorted((typ, m.start(), m.end()) for typ, patt in REFERENCE for m in patt.finditer(text))
+
+def _texts(n, seed=7):
+    rng = random.Random(seed)
+    for _ in range(n):
+        parts = [rng.choice(FRAGMENTS) + rng.choice([" ", "", "\n", ",", "  "]) for _ in range(rng.randint(0, 25))]
+        yield "".join(parts)
+
+@pytest.mark.parametrize("text", list(_texts(300)))
+def test_finditer_matches_per_pattern_finditer(text):
+    got = sorted((typ, m.start(), m.end()) for typ, m in SCANNER.finditer(text))
+    assert got == _reference(text)
+
+@pytest.mark.parametrize("text", list(_texts(300, seed=11)))
+def test_types_present_matches_per_pattern_search(text):
+    expected = {typ for typ, patt in REFERENCE if patt.search(text)}
+    assert SCANNER.types_present(text) == expected
+
+def test_finditer_raises_once_deadline_passed():
+    with pytest.raises(ScanTimeout):
+        list(SCANNER.finditer("555-0101 " * 50, deadline=0.0))
+
+def test_detect_phi_spans_over_budget_raises_redaction_timeout():
+    text = "a1-" * 1300
+    with pytest.raises(RedactionTimeout) as exc:
+        detect_phi_spans(text, budget_ms=1e-6)
+    assert exc.value.text_len == len(text)
+
+def test_fallback_redact_masks_identifying_tokens():
+    out = fallback_redact("Call John at 555-0101 or john@example.com about the rash")
+    assert out == "[REDACTED] [REDACTED] at [REDACTED] or [REDACTED] about the rash"
+
+def test_detect_phi_spans_batch_matches_per_text():
+    texts = list(_texts(100, seed=13)) + ["", "a1-" * 1300]
+    got = detect_phi_spans_batch(texts, budget_ms=0)
+    assert got == [detect_phi_spans(t, budget_ms=0) for t in texts]
+
+def test_detect_phi_spans_batch_isolates_timeouts():
+    got = detect_phi_spans_batch(["call 555-0101", "a1-" * 1300], budget_ms=1e-6)
+    assert all(isinstance(r, RedactionTimeout) for r in got)
+    got = detect_phi_spans_batch(["", "call 555 0101 now"], budget_ms=0)
+    assert got[0] == [] and got[1][0]["type"] == "PHONE"
+
+class _MinibatchNlp:
+    # stands in for spaCy: the model runs over a whole minibatch (1 ms per character here) before its
+    # first doc is yielded
+    def pipe(self, texts, batch_size=64):
+        texts = iter(texts)
+        while True:
+            chunk = list(islice(texts, batch_size))
+            if not chunk:
+                return
+            time.sleep(sum(len(t) for t in chunk) / 1000.0)
+            yield from (SimpleNamespace(ents=[]) for _ in chunk)
+
+def test_detect_phi_spans_batch_charges_minibatch_ner_time_to_the_long_text(monkeypatch):
+    monkeypatch.setattr(redact, "_get_nlp", lambda: _MinibatchNlp())
+    texts = ["call 555-0101", "plain note", "x " * 300, "ok"]
+    got = detect_phi_spans_batch(texts, budget_ms=300, batch_size=4)
+    # the first text comes out after the whole minibatch ran, but only the long one is over budget
+    assert isinstance(got[2], RedactionTimeout) and got[2].elapsed_ms >= 300
+    assert got[0][0]["type"] == "PHONE" and got[1] == [] and got[3] == []
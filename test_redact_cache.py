@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import pytest
+
+import etl.redact as redact
+from etl.redact import RedactionTimeout, redact_text_batch, redaction_fingerprint
+from etl.redact_cache import RedactionCache
+
+SPANS = [{"type": "NAME", "start": 0, "end": 5, "source": "ner"}]
+TEXTS = ["call me at 555-010-1234", "mail a@b.io please", "no phi here", "call me at 555-010-1234"]
+
+@pytest.fixture
+def cache(monkeypatch):
+    fresh = RedactionCache(100, fingerprint=redaction_fingerprint)
+    monkeypatch.setattr(redact, "REDACT_CACHE", fresh)
+    return fresh
+
+def test_cached_results_match_uncached(cache, monkeypatch):
+    first = redact_text_batch(TEXTS, budget_ms=0)
+    # duplicates inside a batch are detected once
+    assert (cache.hits, cache.misses, len(cache)) == (0, 3, 3)
+    again = redact_text_batch(TEXTS, budget_ms=0)
+    assert again == first and cache.hits == 3
+    monkeypatch.setattr(redact, "REDACT_CACHE", RedactionCache(0))
+    assert redact_text_batch(TEXTS, budget_ms=0) == first
+    # callers may mutate their flags without touching the cached entry
+    again[0][0].append("X")
+    assert redact_text_batch(TEXTS[:1], budget_ms=0)[0] == first[0]
+
+def test_timeouts_are_not_cached(cache):
+    got = redact_text_batch(["call 555-0101 " + "a1-" * 1300], budget_ms=1e-6)
+    assert isinstance(got[0], RedactionTimeout) and len(cache) == 0
+
+def test_lru_is_bounded_by_entries_and_bytes():
+    c = RedactionCache(3, max_bytes=25)
+    c.put_many([(c.key(str(i)), ([], "x" * 10, [])) for i in range(3)])
+    assert len(c) == 2 and c.evictions == 1
+    c = RedactionCache(3)
+    c.put_many([(c.key(str(i)), ([], "x", [])) for i in range(5)])
+    assert len(c) == 3 and c.get_many([c.key("0"), c.key("4")]) == [None, ([], "x", [])]
+
+def test_shared_store_survives_processes_and_drops_other_fingerprints(tmp_path):
+    path = tmp_path / "redact.sqlite"
+    a = RedactionCache(10, fingerprint=lambda: b"v1")
+    a.attach(path)
+    a.put_many([(a.key("hello"), (["NAME"], "[REDACTED_NAME]", SPANS))])
+    a.close()
+    b = RedactionCache(10, fingerprint=lambda: b"v1")
+    b.attach(path)
+    assert b.get_many([b.key("hello")]) == [(["NAME"], "[REDACTED_NAME]", SPANS)] and b.shared_hits == 1
+    b.close()
+    # a pattern or model change means a new fingerprint: other keys, and the old rows are cleared
+    c = RedactionCache(10, fingerprint=lambda: b"v2")
+    c.attach(path)
+    assert c.key("hello") != b.key("hello")
+    assert c.get_many([b.key("hello")]) == [None]
+    c.close()
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from etl.resources import build_snapshot, load_wordset, parse_wordset
+
+def test_snapshot_round_trips_wordsets(tmp_path):
+    words = tmp_path / "words.txt"
+    words.write_text("# comment\nInsulin\n\nmetformin \nInsulin\n", encoding="utf-8")
+    stop = tmp_path / "stop.txt"
+    stop.write_text("the\nand\n", encoding="utf-8")
+    snap = tmp_path / "wordsets.snap"
+    build_snapshot({"wordlist": words, "stopwords": stop}, snap)
+    assert load_wordset("wordlist", words, snap) == parse_wordset(words) == {"insulin", "metformin"}
+    assert load_wordset("stopwords", stop, snap) == {"the", "and"}
+    # the snapshot alone is enough when the text source is not shipped
+    words.unlink()
+    assert load_wordset("wordlist", words, snap) == {"insulin", "metformin"}
+
+def test_stale_snapshot_falls_back_to_source(tmp_path):
+    words = tmp_path / "words.txt"
+    words.write_text("insulin\n", encoding="utf-8")
+    snap = tmp_path / "wordsets.snap"
+    build_snapshot({"wordlist": words}, snap)
+    words.write_text("insulin\nheparin\n", encoding="utf-8")
+    assert load_wordset("wordlist", words, snap) == {"insulin", "heparin"}
+    assert load_wordset("stopwords", tmp_path / "missing.txt", snap) == frozenset()
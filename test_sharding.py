@@ -0,0 +1,72 @@
+import json
+import multiprocessing
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+from cli.ingest_cli import run_messages
+from src.etl.checkpoint import FileMessageReader
+from src.etl.sharding import ShardedStore, merge_shards, parse_shard, shard_of, shard_path
+
+SHARDS = 3
+
+def _input(path, n, sessions=12):
+    with path.open("w", encoding="utf-8") as fh:
+        for i in range(n):
+            meta = {"session_id": f"sess-{i % sessions}", "message_id": f"m{i}",
+                    "timestamp": f"2025-01-0{6 + i % 2}T10:{i % 60:02d}:00Z"}
+            fh.write(json.dumps({"message": f"note {i} about dosage", "metadata": meta}) + "\n")
+    return path
+
+def _node(src, tmp_path, k):
+    # one process standing in for one ingestion node
+    run_messages(FileMessageReader(src), tmp_path / "raw.jsonl", tmp_path / "processed", batch_size=7,
+                 quarantine_path=tmp_path / "q.jsonl", reject_path=tmp_path / "rejects.jsonl",
+                 metrics_interval=0, shard=(k, SHARDS), checkpoint_path=tmp_path / "ckpt.json")
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for bad in ("4/4", "x", "1/0"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+    assert shard_path(Path("raw/all.jsonl"), 1, 4) == Path("raw/all.shard-01-of-04.jsonl")
+
+def test_nodes_own_disjoint_sessions_and_merge_into_one_manifest(tmp_path):
+    src = _input(tmp_path / "in.jsonl", 90)
+    ctx = multiprocessing.get_context("fork")
+    nodes = [ctx.Process(target=_node, args=(src, tmp_path, k)) for k in range(SHARDS)]
+    for p in nodes:
+        p.start()
+    for p in nodes:
+        p.join()
+    assert [p.exitcode for p in nodes] == [0] * SHARDS
+
+    owned = []
+    for k in range(SHARDS):
+        raw = tmp_path / f"raw.shard-{k:02d}-of-{SHARDS:02d}.jsonl"
+        sessions = {json.loads(line)["session_id"] for line in raw.read_text(encoding="utf-8").splitlines()}
+        assert all(shard_of(s, SHARDS) == k for s in sessions)
+        owned.append(sessions)
+    assert set().union(*owned) == {f"sess-{i}" for i in range(12)}
+    assert sum(len(s) for s in owned) == 12
+
+    manifest = merge_shards(tmp_path / "processed")
+    assert manifest["complete"] and manifest["missing"] == [] and manifest["records"] == 90
+    assert [p["partition"] for p in manifest["partitions"]] == ["2025/01/06", "2025/01/07"]
+    assert sum(p["records"] for p in manifest["partitions"]) == 90
+    assert json.loads((tmp_path / "processed" / "_shards.json").read_text())["records"] == 90
+
+    with ShardedStore(tmp_path / "processed") as store:
+        assert {r["message_id"] for r in store.get_session("sess-5")} == {f"m{i}" for i in range(5, 90, 12)}
+        assert store.get_message("m42")["session_id"] == "sess-6"
+        stamps = [r["timestamp"] for r in store.get_time_range()]
+        assert len(stamps) == 90 and stamps == sorted(stamps)
+
+def test_merge_reports_missing_and_unfinished_shards(tmp_path):
+    src = _input(tmp_path / "in.jsonl", 30)
+    _node(src, tmp_path, 0)
+    (tmp_path / "processed" / f"shard-02-of-{SHARDS:02d}").mkdir()
+    manifest = merge_shards(tmp_path / "processed")
+    assert not manifest["complete"] and manifest["missing"] == [1]
+    assert [m["finished"] for m in manifest["members"]] == [True, False]
@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from etl.spell_cache import SpellCache
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = SpellCache(maxsize=2)
+    cache.put("teh", "the")
+    cache.put("recieve", "receive")
+    assert cache.get("teh") == "the"
+    cache.put("diabtes", "diabetes")
+    # "recieve" was the least recently used once "teh" was read
+    assert cache.get("recieve") is None and cache.get("teh") == "the"
+    assert len(cache) == 2 and cache.evictions == 1
+    assert len(SpellCache(maxsize=0)) == 0
+
+def test_hit_and_miss_counters():
+    cache = SpellCache(maxsize=10)
+    cache.put("teh", "the")
+    cache.get("teh")
+    cache.get("teh")
+    assert cache.get("zzz", "fallback") == "fallback"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+    assert abs(stats["hit_rate"] - 2 / 3) < 1e-9
+
+def test_save_load_round_trip_keeps_lru_order(tmp_path):
+    path = tmp_path / "spell" / "cache.json"
+    cache = SpellCache(maxsize=3, namespace="symspell")
+    for token in ("a", "b", "c"):
+        cache.put(token, token.upper())
+    cache.get("a")
+    cache.save(path)
+    loaded = SpellCache(maxsize=3, namespace="symspell")
+    assert loaded.load(path) == 3
+    loaded.put("d", "D")
+    # "b" was the oldest entry when saved, so it is the one evicted after the reload
+    assert loaded.get("b") is None and loaded.get("a") == "A" and loaded.get("d") == "D"
+
+def test_namespaces_do_not_share_entries(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = SpellCache(namespace="symspell")
+    cache.put("teh", "the")
+    cache.save(path)
+    other = SpellCache(namespace="pyspellchecker")
+    assert other.load(path) == 0 and other.get("teh") is None
+    path.write_text("not json", encoding="utf-8")
+    assert SpellCache(namespace="symspell").load(path) == 0
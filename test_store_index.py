@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from etl.store_index import StoreIndex
+from etl.utils import PartitionWriter
+
+def _write(base, records, batches=3):
+    with PartitionWriter(base, max_open=2, index=StoreIndex(base)) as w:
+        step = max(1, len(records) // batches)
+        for start in range(0, len(records), step):
+            assert w.write_records(records[start:start + step]) == []
+
+def test_session_and_message_lookups_seek_to_the_right_lines(tmp_path, make_record):
+    records = [make_record(i, day=6 + i % 2) for i in range(30)]
+    _write(tmp_path, records)
+    with StoreIndex(tmp_path) as index:
+        session = index.get_session("s1")
+        assert [r["message_id"] for r in session] == [r["message_id"] for r in sorted(
+            (r for r in records if r["session_id"] == "s1"), key=lambda r: r["timestamp"])]
+        assert index.get_message("m17") == records[17]
+        assert index.get_message("missing") is None
+
+def test_time_range_and_partition_bounds(tmp_path, make_record):
+    records = [make_record(i, day=6 + i % 3, sessions=4) for i in range(24)]
+    _write(tmp_path, records)
+    with StoreIndex(tmp_path) as index:
+        window = list(index.get_time_range("2025-01-07T00:00:00Z", "2025-01-08T00:00:00Z"))
+        assert {r["message_id"] for r in window} == {r["message_id"] for r in records if "-07T" in r["timestamp"]}
+        parts = index.partitions("2025-01-07T00:00:00Z", "2025-01-08T00:00:00Z")
+        assert [p["partition"] for p in parts] == ["2025/01/07"]
+        assert parts[0]["records"] == 8
+
+def test_rebuild_matches_the_live_index(tmp_path, make_record):
+    records = [make_record(i, sessions=2) for i in range(10)]
+    _write(tmp_path, records)
+    with StoreIndex(tmp_path) as index:
+        live = index.session("s0")
+        assert index.rebuild() == 10
+        assert index.session("s0") == live
+
+def test_partition_counts_ignore_re_indexed_ids(tmp_path, make_record):
+    records = [make_record(i, day=6 + i % 2) for i in range(10)]
+    _write(tmp_path, records)
+    # a rerun without --overwrite appends the same ids again, one of them now on another day
+    _write(tmp_path, records[:4] + [make_record(4, day=8)])
+    with StoreIndex(tmp_path) as index:
+        counts = {p["partition"]: p["records"] for p in index.partitions()}
+        assert counts == {"2025/01/06": 4, "2025/01/07": 5, "2025/01/08": 1}
+        assert sum(counts.values()) == index._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import pytest
+from etl.symspell import SymSpell, osa_distance
+
+FREQS = {"the": 500, "receive": 40, "diabetes": 30, "hypertension": 20, "patient": 60, "tea": 5, "ten": 8}
+
+@pytest.fixture(scope="module")
+def index():
+    return SymSpell.build(FREQS)
+
+@pytest.mark.parametrize("token,expected", [
+    ("teh", "the"),
+    ("recieve", "receive"),
+    ("diabtes", "diabetes"),
+    ("hipertension", "hypertension"),
+    ("PaTient", "patient"),
+    ("patient", "patient"),
+])
+def test_correction(index, token, expected):
+    assert index.correction(token) == expected
+
+def test_equal_distance_tie_found_at_a_deeper_level_wins_on_frequency():
+    # "tech" shares the undeleted prefix with "teh"; "the" is only found after deleting from the input
+    assert SymSpell.build({"the": 500, "tech": 5}).correction("teh") == "the"
+
+def test_unknown_token_has_no_correction(index):
+    assert index.correction("zzzzzzzz") is None
+
+def test_save_load_roundtrip(index, tmp_path):
+    path = tmp_path / "symspell.idx"
+    index.save(path)
+    loaded = SymSpell.load(path)
+    assert loaded.words == index.words
+    for token in ("teh", "diabtes", "hipertension"):
+        assert loaded.correction(token) == index.correction(token)
+
+def test_osa_distance_counts_transposition_once():
+    assert osa_distance("teh", "the", 2) == 1
+    assert osa_distance("kitten", "sitting", 2) == 3
@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import pytest
+
+from etl.timestamps import TimestampEngine, TimestampError
+from etl.utils import partitioned_path
+
+def test_formats_normalize_to_canonical_utc():
+    engine = TimestampEngine()
+    assert engine.normalize("2025-01-06T08:00:00Z") == "2025-01-06T08:00:00Z"
+    assert engine.normalize("2025-01-06T23:30:00.250-05:00") == "2025-01-07T04:30:00Z"
+    assert engine.normalize("2025-01-06 08:00:00") == "2025-01-06T08:00:00Z"
+    assert engine.normalize("2025-01-06") == "2025-01-06T00:00:00Z"
+    assert engine.normalize("06/01/2025 08:00:00") == "2025-01-06T08:00:00Z"
+    assert engine.normalize(1736150400) == "2025-01-06T08:00:00Z"
+    assert engine.normalize("1736150400000") == "2025-01-06T08:00:00Z"
+
+@pytest.mark.parametrize("value", ["yesterday", "2025-13-01T00:00:00Z", "2025-01-06T25:00:00Z", True])
+def test_unparseable_values_raise(value):
+    with pytest.raises(TimestampError):
+        TimestampEngine().normalize(value)
+
+def test_batch_reports_bad_values_and_caches_formats_per_source():
+    engine = TimestampEngine(max_sources=2)
+    out, bad = engine.normalize_batch(
+        ["2025-01-06 08:00:00", "2025-01-06 09:00:00", None, "garbage", "06/01/2025 10:00:00"],
+        ["sms", "sms", "sms", "sms", "ivr"])
+    assert out == ["2025-01-06T08:00:00Z", "2025-01-06T09:00:00Z", None, None, "2025-01-06T10:00:00Z"]
+    assert bad == [3]
+    assert engine.format_of("sms") == "iso" and engine.format_of("ivr") == "dmy"
+    assert engine.cache_hits == 1
+    engine.normalize("2025-01-06", "web")
+    assert engine.format_of("sms") is None
+
+def test_partitioned_path_uses_the_utc_day(tmp_path):
+    assert partitioned_path(tmp_path, "2025-01-06T23:30:00-05:00", "s1") == tmp_path / "2025/01/07/s1.jsonl"
+    with pytest.raises(TimestampError):
+        partitioned_path(tmp_path, "not a date", "s1")
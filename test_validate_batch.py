@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import copy
+import pytest
+from etl.redact import _PLACEHOLDER
+from etl.validate import BatchValidator
+
+def _batch(make_record):
+    records = [make_record(i, uuid_ids=True, phi=False) for i in range(20)]
+    records[3]["channel"] = "ivr"
+    records[7]["audit_trail"][0]["timestamp"] = "2025-01-06T08:00:00.123456"
+    records[11]["phi_flags"] = ["PASSPORT"]
+    del records[15]["clean_text"]
+    return records
+
+@pytest.mark.parametrize("backend", ["pydantic", "jsonschema"])
+def test_batch_validation_splits_out_invalid_records(backend, make_record):
+    pytest.importorskip(backend)
+    validator = BatchValidator(backend)
+    records = _batch(make_record)
+    original = copy.deepcopy(records)
+    valid, rejected = validator.validate(records)
+    assert [r["message_id"] for r, _ in rejected] == [original[i]["message_id"] for i in (3, 7, 11, 15)]
+    assert len(valid) == 16 and all(errs for _, errs in rejected)
+    # records are passed through untouched, never replaced by coerced model output
+    assert valid == [r for i, r in enumerate(original) if i not in (3, 7, 11, 15)]
+
+@pytest.mark.parametrize("backend", ["pydantic", "jsonschema"])
+def test_batch_agrees_with_per_record_validation(backend, make_record):
+    pytest.importorskip(backend)
+    validator = BatchValidator(backend)
+    records = _batch(make_record)
+    _, rejected = validator.validate(records)
+    one_by_one = [r for r in records if validator.validate([r])[1]]
+    assert [r for r, _ in rejected] == one_by_one
+
+@pytest.mark.parametrize("backend", ["pydantic", "jsonschema"])
+def test_every_type_the_redactor_flags_is_accepted(backend, make_record):
+    pytest.importorskip(backend)
+    record = make_record(0, uuid_ids=True, phi_flags=sorted(_PLACEHOLDER))
+    assert BatchValidator(backend).validate([record])[1] == []
@@ -0,0 +1,154 @@
+# src/etl/timestamps.py
+import re
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+
+DEFAULT_MAX_SOURCES = 1024
+
+# One place that turns incoming timestamps into the canonical "YYYY-MM-DDTHH:MM:SSZ" (UTC) form.
+# Every accepted format is a compiled pattern plus a builder over its groups, so picking the format is
+# a regex match instead of a strptime call per candidate wrapped in try/except. Sources (channels,
+# input files) tend to send one format forever, so the engine remembers which format matched last for
+# each source in a bounded LRU and tries that one first; a miss falls back to sniffing all formats.
+# Naive times are taken as UTC. Values that match no format raise TimestampError (or are listed by
+# normalize_batch) and are never replaced with the current time.
+
+class TimestampError(ValueError):
+    pass
+
+_UTC = timezone.utc
+_EPOCH = datetime(1970, 1, 1, tzinfo=_UTC)
+
+def _iso(m) -> datetime:
+    # the pattern already decided the format; fromisoformat (3.11+: Z, fractions, offsets) is the fast builder
+    dt = datetime.fromisoformat(m[0])
+    return dt if dt.tzinfo else dt.replace(tzinfo=_UTC)
+
+def _dmy(m) -> datetime:
+    return datetime(int(m[3]), int(m[2]), int(m[1]), int(m[4]), int(m[5]), int(m[6]), tzinfo=_UTC)
+
+def _epoch_s(m) -> datetime:
+    return _EPOCH + timedelta(seconds=float(m[0]))
+
+def _epoch_ms(m) -> datetime:
+    return _EPOCH + timedelta(milliseconds=int(m[0]))
+
+# (name, pattern, builder); canonical comes first so already-canonical text is passed through as is
+FORMATS: List[Tuple[str, "re.Pattern", Callable[[Any], datetime]]] = [
+    ("canonical", re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z$"), _iso),
+    ("iso", re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?"
+                       r"(?:Z|[+-]\d{2}:?\d{2})?$"), _iso),
+    ("date", re.compile(r"^\d{4}-\d{2}-\d{2}$"), _iso),
+    ("dmy", re.compile(r"^(\d{2})/(\d{2})/(\d{4}) (\d{2}):(\d{2}):(\d{2})$"), _dmy),
+    ("epoch_ms", re.compile(r"^\d{12,13}$"), _epoch_ms),
+    ("epoch_s", re.compile(r"^\d{9,10}(?:\.\d+)?$"), _epoch_s),
+]
+
+_is_canonical = FORMATS[0][1].match
+_fromiso = datetime.fromisoformat
+
+def format_iso(dt: datetime) -> str:
+    dt = dt.astimezone(_UTC)
+    return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}T{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}Z"
+
+def utc_now_iso() -> str:
+    return format_iso(datetime.now(_UTC))
+
+class TimestampEngine:
+    def __init__(self, max_sources: int = DEFAULT_MAX_SOURCES) -> None:
+        self.max_sources = max(1, max_sources)
+        self._formats: "OrderedDict[Any, int]" = OrderedDict()
+        self.cache_hits = 0
+        self.sniffs = 0
+
+    def _match(self, text: str, source: Any):
+        cached = self._formats.get(source)
+        if cached is not None:
+            m = FORMATS[cached][1].match(text)
+            if m is not None:
+                self._formats.move_to_end(source)
+                self.cache_hits += 1
+                return cached, m
+        self.sniffs += 1
+        for i, (_, pattern, _) in enumerate(FORMATS):
+            if i == cached:
+                continue
+            m = pattern.match(text)
+            if m is not None:
+                self._formats[source] = i
+                self._formats.move_to_end(source)
+                while len(self._formats) > self.max_sources:
+                    self._formats.popitem(last=False)
+                return i, m
+        return None, None
+
+    def format_of(self, source: Any) -> Optional[str]:
+        i = self._formats.get(source)
+        return None if i is None else FORMATS[i][0]
+
+    def _parse(self, value: Any, source: Any) -> Tuple[datetime, bool]:
+        # (datetime, whether the input was already canonical text)
+        if isinstance(value, datetime):
+            return (value if value.tzinfo else value.replace(tzinfo=_UTC)), False
+        if isinstance(value, bool) or value is None:
+            raise TimestampError(f"unparseable timestamp: {value!r}")
+        text = value.strip() if isinstance(value, str) else str(value)
+        i, m = self._match(text, source)
+        if m is None:
+            raise TimestampError(f"unparseable timestamp: {value!r}")
+        try:
+            return FORMATS[i][2](m), i == 0 and text == value
+        except (ValueError, OverflowError):
+            # right shape, impossible value (month 13, hour 25); the format stays cached for the source
+            raise TimestampError(f"unparseable timestamp: {value!r}") from None
+
+    def parse(self, value: Union[str, int, float, datetime], source: Any = None) -> datetime:
+        return self._parse(value, source)[0]
+
+    def normalize(self, value: Union[str, int, float, datetime], source: Any = None) -> str:
+        if type(value) is str and _is_canonical(value) is not None:
+            # the target format: only the field ranges need checking, no format lookup or re-rendering
+            try:
+                _fromiso(value)
+                return value
+            except ValueError:
+                raise TimestampError(f"unparseable timestamp: {value!r}") from None
+        dt, canonical = self._parse(value, source)
+        return value if canonical else format_iso(dt)
+
+    def normalize_batch(self, values: Sequence[Any],
+                        sources: Union[Any, Sequence[Any]] = None) -> Tuple[List[Optional[str]], List[int]]:
+        # one call per batch; sources is a single key or one key per value. Missing values come back as
+        # None, unparseable ones as None with their index in the second list
+        per_value = isinstance(sources, (list, tuple))
+        out: List[Optional[str]] = []
+        bad: List[int] = []
+        seen = {}
+        for i, value in enumerate(values):
+            if value is None or value == "":
+                out.append(None)
+                continue
+            source = sources[i] if per_value else sources
+            key = (value, source) if isinstance(value, str) else None
+            if key is not None and key in seen:
+                out.append(seen[key])
+                if seen[key] is None:
+                    bad.append(i)
+                continue
+            try:
+                norm = self.normalize(value, source)
+            except TimestampError:
+                norm = None
+                bad.append(i)
+            if key is not None:
+                seen[key] = norm
+            out.append(norm)
+        return out, bad
+
+    def day_parts(self, value: Any, source: Any = None) -> Tuple[str, str, str]:
+        # (YYYY, MM, DD) of the UTC day, for partitioners
+        norm = self.normalize(value, source)
+        return norm[0:4], norm[5:7], norm[8:10]
+
+TIMESTAMPS = TimestampEngine()
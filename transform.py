@@ -1,26 +1,77 @@
 # src/etl/transform.py
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 import re
+from .message import Message
+from .phi_scanner import PhiScanner, rest_of_line_guard
 from .redact import redact_entities
 
-EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+EMAIL_RE = re.compile(r"(?<![a-zA-Z0-9_.+-])[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
 PHONE_RE = re.compile(r"(\+?\d{1,3}[-.\s]?)?(\(?\d{2,4}\)?[-.\s]?)?\d{3,4}[-.\s]?\d{3,4}")
 SSN_RE = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
-GENERIC_ID_RE = re.compile(r"\b(?=.*\d)(?=.*[A-Za-z])[A-Za-z0-9\-]{6,}\b", re.IGNORECASE)
+# the "a digit and a letter left on the line" lookaheads of this pattern are applied as a scanner guard;
+# EMAIL only starts at the beginning of a run and ID uses a bounded trigger, so long runs are not
+# rescanned from every position
+GENERIC_ID_RE = re.compile(r"\b[A-Za-z0-9\-]{6,}\b", re.IGNORECASE)
+_DIGIT_RE = re.compile(r"\d")
+_ALPHA_RE = re.compile(r"[A-Za-z]")
+
+_BASIC_SCANNER = PhiScanner([
+    ("EMAIL", EMAIL_RE),
+    ("PHONE", PHONE_RE),
+    ("SSN", SSN_RE),
+    ("ID", GENERIC_ID_RE),
+], guards={"ID": rest_of_line_guard((_DIGIT_RE, 1), (_ALPHA_RE, 1))},
+   triggers={"ID": re.compile(r"\b(?=[A-Za-z0-9\-]{6})")})
 
 def detect_phi_basic(clean_text: str) -> List[str]:
-    flags = set()
-    if EMAIL_RE.search(clean_text):
-        flags.add("EMAIL")
-    if PHONE_RE.search(clean_text):
-        flags.add("PHONE")
-    if SSN_RE.search(clean_text):
-        flags.add("SSN")
-    if GENERIC_ID_RE.search(clean_text):
-        flags.add("ID")
-    return sorted(flags)
+    return sorted(_BASIC_SCANNER.types_present(clean_text))
+
+def _ingest_event(record) -> Dict[str, Any]:
+    return {
+        "event_id": record["message_id"],
+        "actor": "ingestion-service",
+        "action": "ingest",
+        "timestamp": record["timestamp"],
+    }
 
-def transform(record: Dict[str, Any]) -> Dict[str, Any]:
+def phi_flags_from_spans(spans: List[Dict[str, Any]]) -> List[str]:
+    return sorted({s["type"] for s in spans if s.get("type")})
+
+def _transform_message(msg: Message) -> Message:
+    # the dict rules below, applied in place; raw values that change are kept for the raw view
+    clean_text = msg.clean_text or ""
+    entities = msg.entities or []
+    if msg.phi_spans is not None:
+        # ingest scanned the text and the entity values once; its spans are the flags
+        phi_flags = phi_flags_from_spans(msg.phi_spans)
+    else:
+        if msg.phi_flags is None:
+            phi_flags = detect_phi_basic(clean_text) if clean_text else []
+        else:
+            phi_flags = sorted(msg.phi_flags)
+        if entities:
+            entities, ent_flags = redact_entities(entities)
+            phi_flags = sorted(set(phi_flags + ent_flags))
+    audit_trail = msg.audit_trail or [_ingest_event(msg)]
+    if not msg.processed:
+        if phi_flags != msg.phi_flags:
+            msg.raw_phi_flags = msg.phi_flags
+        if entities is not msg.entities:
+            msg.raw_entities = msg.entities
+        if audit_trail is not msg.audit_trail:
+            msg.raw_audit_trail = msg.audit_trail
+    msg.raw_text = msg.raw_text or ""
+    msg.clean_text = clean_text
+    msg.language = msg.language or "en"
+    msg.phi_flags = phi_flags
+    msg.audit_trail = audit_trail
+    msg.entities = entities
+    msg.processed = True
+    return msg
+
+def transform(record: Union[Dict[str, Any], Message]) -> Union[Dict[str, Any], Message]:
+    if isinstance(record, Message):
+        return _transform_message(record)
     out: Dict[str, Any] = {
         "session_id": record["session_id"],
         "message_id": record["message_id"],
@@ -32,25 +83,26 @@ def transform(record: Dict[str, Any]) -> Dict[str, Any]:
         "language": record.get("language", "en") or "en",
     }
 
-    phi_flags = record.get("phi_flags")
-    if phi_flags is None:
-        phi_flags = detect_phi_basic(out["clean_text"]) if out["clean_text"] else []
-    out["phi_flags"] = sorted(phi_flags)
+    # records from ingest carry their detection result; only records without one are scanned here
+    phi_spans = record.get("phi_spans")
+    if phi_spans is not None:
+        out["phi_flags"] = phi_flags_from_spans(phi_spans)
+    else:
+        phi_flags = record.get("phi_flags")
+        if phi_flags is None:
+            phi_flags = detect_phi_basic(out["clean_text"]) if out["clean_text"] else []
+        out["phi_flags"] = sorted(phi_flags)
+    out["phi_spans"] = phi_spans
 
     if record.get("audit_trail"):
         out["audit_trail"] = record["audit_trail"]
     else:
-        out["audit_trail"] = [{
-            "event_id": record["message_id"],
-            "actor": "ingestion-service",
-            "action": "ingest",
-            "timestamp": out["timestamp"],
-        }]
+        out["audit_trail"] = [_ingest_event(out)]
 
     out["intent"] = record.get("intent") if "intent" in record else None
 
     out["entities"] = record.get("entities", []) or []
-    if out["entities"]:
+    if out["entities"] and phi_spans is None:
         new_entities, ent_flags = redact_entities(out["entities"])
         out["entities"] = new_entities
         out["phi_flags"] = sorted(set(out["phi_flags"] + ent_flags))
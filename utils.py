@@ -1,34 +1,212 @@
 # src/etl/utils.py
 from pathlib import Path
 import json
+import os
 import uuid
-from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from .codec import check_compression, compress, compression_of, dumps_line, with_suffix
+from .message import to_dict
+from .timestamps import TIMESTAMPS, utc_now_iso
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; compaction is then unavailable and writers skip locking
+    fcntl = None
 
 def make_uuid() -> str:
     return str(uuid.uuid4())
 
 def to_iso_utc(ts: Optional[str]) -> str:
+    # empty means "now"; anything else that does not parse raises TimestampError
     if not ts:
-        return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-    try:
-        parsed = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-        parsed_utc = parsed.astimezone(timezone.utc)
-        return parsed_utc.strftime("%Y-%m-%dT%H:%M:%SZ")
-    except Exception:
-        pass
-    patterns = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d/%m/%Y %H:%M:%S")
-    for p in patterns:
-        try:
-            parsed = datetime.strptime(ts, p)
-            parsed_utc = parsed.replace(tzinfo=timezone.utc)
-            return parsed_utc.strftime("%Y-%m-%dT%H:%M:%SZ")
-        except Exception:
-            continue
-    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-
-def write_jsonl(path: Path, records: List[Dict[str, Any]]) -> None:
+        return utc_now_iso()
+    return TIMESTAMPS.normalize(ts)
+
+def write_jsonl(path: Path, records: List[Dict[str, Any]], level: Optional[int] = None) -> None:
+    # one append per call, compressed as the file name says (.jsonl.gz / .jsonl.zst): then one gzip
+    # member / zstd frame per call, see codec.py
+    compression = check_compression(compression_of(path))
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("a", encoding="utf-8") as fh:
+    data = b"".join(dumps_line(to_dict(rec)) for rec in records)
+    with path.open("ab") as fh:
+        fh.write(compress(data, compression, level))
+
+def partitioned_path(base: Path, ts_iso: str, session_id: str) -> Path:
+    y, m, d = TIMESTAMPS.day_parts(ts_iso, "partition")
+    return base / y / m / d / f"{session_id}.jsonl"
+
+class PartitionWriter:
+    def __init__(self, base: Path, max_open: int = 256,
+                 path_fn: Callable[[Path, str, str], Path] = partitioned_path, index: Any = None,
+                 compression: str = "none", level: Optional[int] = None) -> None:
+        self.base = base
+        self.max_open = max(1, max_open)
+        self.path_fn = path_fn
+        # optional StoreIndex; gets (path, record, byte offset, length, line) for every record once it is
+        # flushed. Compressed, offset/length are the batch's member and line its position inside it
+        self.index = index
+        self.compression = check_compression(compression)
+        self.level = level
+        self._handles: "OrderedDict[Path, Any]" = OrderedDict()
+        self._known_dirs = set()
+
+    def _open(self, path: Path):
+        fh = self._handles.get(path)
+        if fh is not None:
+            self._handles.move_to_end(path)
+            return fh
+        parent = path.parent
+        if parent not in self._known_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            self._known_dirs.add(parent)
+        while len(self._handles) >= self.max_open:
+            _, old = self._handles.popitem(last=False)
+            old.close()
+        try:
+            fh = path.open("ab")
+        except FileNotFoundError:
+            # directory removed behind our back; forget it and recreate once
+            self._known_dirs.discard(parent)
+            parent.mkdir(parents=True, exist_ok=True)
+            self._known_dirs.add(parent)
+            fh = path.open("ab")
+        self._handles[path] = fh
+        return fh
+
+    def _discard(self, path: Path) -> None:
+        fh = self._handles.pop(path, None)
+        if fh is not None:
+            try:
+                fh.close()
+            except Exception:
+                pass
+
+    def _open_locked(self, path: Path):
+        # session files are flock'ed while appended to, so the compactor never moves a half-written
+        # batch; if it unlinked the file while we held a stale handle, reopen a fresh one
+        fh = self._open(path)
+        if fcntl is None:
+            return fh
+        while True:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            if os.fstat(fh.fileno()).st_nlink:
+                return fh
+            self._discard(path)
+            fh = self._open(path)
+
+    def _write_groups(self, groups: List[Tuple[Path, List[Dict[str, Any]]]]) -> List[Tuple[Dict[str, Any], Exception]]:
+        failed = []
+        written = []
+        locked = []
+        try:
+            for p, recs in groups:
+                try:
+                    fh = self._open_locked(p)
+                    locked.append(fh)
+                    lines = [dumps_line(to_dict(rec)) for rec in recs]
+                    data = compress(b"".join(lines), self.compression, self.level)
+                    offset = fh.seek(0, os.SEEK_END)
+                    fh.write(data)
+                    fh.flush()
+                except Exception as e:
+                    self._discard(p)
+                    failed.extend((rec, e) for rec in recs)
+                    continue
+                if self.index is not None and self.compression != "none":
+                    written.extend((p, rec, offset, len(data), i) for i, rec in enumerate(recs))
+                elif self.index is not None:
+                    for rec, line in zip(recs, lines):
+                        written.append((p, rec, offset, len(line), 0))
+                        offset += len(line)
+            if written:
+                try:
+                    self.index.add(written)
+                except Exception as e:
+                    # the lines are on disk; a rebuild can recover the index, so this is not a record failure
+                    print(json.dumps({"level": "warning", "msg": "index_update_failed", "error": str(e), "count": len(written)}))
+        finally:
+            # held until the index has the new lines, so a compaction cannot relocate them before they exist
+            if fcntl is not None:
+                for fh in locked:
+                    try:
+                        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+                    except (OSError, ValueError):
+                        pass
+        return failed
+
+    def write_records(self, records: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Exception]]:
+        failed = []
+        groups: Dict[Path, List[Dict[str, Any]]] = {}
         for rec in records:
-            fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            try:
+                p = with_suffix(self.path_fn(self.base, rec["timestamp"], rec["session_id"]), self.compression)
+            except Exception as e:
+                failed.append((rec, e))
+                continue
+            groups.setdefault(p, []).append(rec)
+        # locks are held until the index has the new lines, and closing an fd drops its lock, so a chunk
+        # never has more files than the pool keeps open: opening one cannot evict a locked handle
+        items = list(groups.items())
+        for start in range(0, len(items), self.max_open):
+            failed.extend(self._write_groups(items[start:start + self.max_open]))
+        return failed
+
+    def flush(self) -> None:
+        for p, fh in list(self._handles.items()):
+            try:
+                fh.flush()
+            except Exception:
+                self._discard(p)
+
+    def close(self) -> None:
+        while self._handles:
+            _, fh = self._handles.popitem(last=False)
+            try:
+                fh.close()
+            except Exception:
+                pass
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def __enter__(self) -> "PartitionWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class MultiWriter:
+    # fans one batch out to several sinks (e.g. JSONL and Parquet); failures from every sink are reported
+    def __init__(self, writers: List[Any]) -> None:
+        self.writers = list(writers)
+
+    def write_records(self, records: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Exception]]:
+        # a record that fails in several sinks is reported once, with their errors joined; keyed by
+        # message_id since a sink may hand back its own row (e.g. Parquet's) rather than the record
+        failed: Dict[Any, Tuple[Dict[str, Any], List[Exception]]] = {}
+        for w in self.writers:
+            for rec, e in w.write_records(records):
+                failed.setdefault(rec.get("message_id") or id(rec), (rec, []))[1].append(e)
+        return [(rec, errs[0] if len(errs) == 1 else RuntimeError("; ".join(str(e) for e in errs)))
+                for rec, errs in failed.values()]
+
+    def flush(self) -> None:
+        for w in self.writers:
+            w.flush()
+
+    def close(self) -> None:
+        errors = []
+        for w in self.writers:
+            try:
+                w.close()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def __enter__(self) -> "MultiWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,102 @@
+# src/etl/validate.py
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .message import to_dict
+
+SCHEMA_PATH = Path("schemas/chat_message.schema.json")
+BACKENDS = ("pydantic", "jsonschema")
+
+# Batch validation of processed records against the ChatMessage contract. The pydantic backend runs
+# the whole batch through one TypeAdapter(List[ChatMessage]) call, so the common all-valid batch
+# costs a single pass in pydantic-core; errors carry the list index, which splits out the rejects.
+# The jsonschema backend builds its validator once and only walks the errors of records that fail
+# the cheap is_valid() check. Records are never replaced by coerced model output.
+
+def _load_chat_message():
+    try:
+        from ..models.chat import ChatMessage
+    except (ImportError, ValueError):
+        from models.chat import ChatMessage
+    return ChatMessage
+
+class BatchValidator:
+    def __init__(self, backend: str = "auto", schema_path: Path = SCHEMA_PATH) -> None:
+        self.backend = None
+        self._adapter = None
+        self._validator = None
+        errors = []
+        for name in (BACKENDS if backend == "auto" else (backend,)):
+            try:
+                if name == "pydantic":
+                    from pydantic import TypeAdapter
+                    self._adapter = TypeAdapter(List[_load_chat_message()])
+                elif name == "jsonschema":
+                    from jsonschema.validators import validator_for
+                    with Path(schema_path).open(encoding="utf-8") as fh:
+                        schema = json.load(fh)
+                    cls = validator_for(schema)
+                    cls.check_schema(schema)
+                    self._validator = cls(schema)
+                else:
+                    raise ValueError(f"unknown validation backend: {name}")
+                self.backend = name
+                break
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+        if self.backend is None:
+            raise RuntimeError("no validation backend available (" + "; ".join(errors) + ")")
+
+    def validate(self, records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], List[str]]]]:
+        if not records:
+            return [], []
+        if self.backend == "pydantic":
+            failures = self._pydantic_failures(records)
+        else:
+            failures = self._jsonschema_failures(records)
+        if not failures:
+            return records, []
+        valid = [rec for i, rec in enumerate(records) if i not in failures]
+        return valid, [(records[i], failures[i]) for i in sorted(failures)]
+
+    def _pydantic_failures(self, records: List[Dict[str, Any]]) -> Dict[int, List[str]]:
+        from pydantic import ValidationError
+        try:
+            # from_attributes lets Message records through without building a dict per record
+            self._adapter.validate_python(records, from_attributes=True)
+            return {}
+        except ValidationError as e:
+            failures: Dict[int, List[str]] = {}
+            for err in e.errors(include_url=False, include_input=False):
+                loc = err.get("loc") or ()
+                if not loc or not isinstance(loc[0], int):
+                    continue
+                path = ".".join(str(p) for p in loc[1:])
+                failures.setdefault(loc[0], []).append(f"{path}: {err.get('msg')}" if path else str(err.get("msg")))
+            return failures
+
+    def _jsonschema_failures(self, records: List[Dict[str, Any]]) -> Dict[int, List[str]]:
+        failures: Dict[int, List[str]] = {}
+        is_valid = self._validator.is_valid
+        for i, rec in enumerate(records):
+            rec = to_dict(rec)
+            if is_valid(rec):
+                continue
+            msgs = []
+            for err in self._validator.iter_errors(rec):
+                path = ".".join(str(p) for p in err.absolute_path)
+                msgs.append(f"{path}: {err.message}" if path else err.message)
+            failures[i] = msgs
+        return failures
+
+def reject_record(rec: Dict[str, Any], errors: List[str], backend: Optional[str], rejected_at: str) -> Dict[str, Any]:
+    return {
+        "message_id": rec.get("message_id"),
+        "session_id": rec.get("session_id"),
+        "reason": "schema_validation",
+        "validator": backend,
+        "errors": errors[:20],
+        "rejected_at": rejected_at,
+        "record": to_dict(rec),
+    }